@@ -0,0 +1,41 @@
+"""The series processing behind plot_cards: normalizing, gap insertion, UMM overlays and the UMM table."""
+
+from datetime import timedelta
+
+import pytest
+import pytz
+
+from fixtures import SERIES_START, umm_description_html, reactor_series
+
+STOCKHOLM = pytz.timezone("Europe/Stockholm")
+
+# The ranges of the page presets, and a multi-year range
+SPANS = [timedelta(weeks=2), timedelta(days=90), timedelta(days=365), timedelta(days=3 * 365)]
+
+
+@pytest.fixture(scope="module")
+def umm_index():
+    import umm
+    from umm_index import UmmIntervalIndex
+
+    events = [ev for i in range(2000) for ev in umm._extract_event_from_description_html(umm_description_html(i))]
+    return UmmIntervalIndex(events)
+
+
+@pytest.mark.parametrize("span", SPANS, ids=lambda span: f"{span.days}d")
+def bench_build_dashboard_payload(benchmark, reactors, umm_index, span):
+    from dashboard import AGGREGATE_EVERY_MINUTES, aggregate_every_for_span, build_dashboard_payload
+
+    aggregate_every = aggregate_every_for_span(span)
+    series_by_block = reactor_series(
+        [reactor.reactor_label for reactor in reactors],
+        span.days,
+        every=timedelta(minutes=AGGREGATE_EVERY_MINUTES[aggregate_every]),
+    )
+    start = SERIES_START.astimezone(STOCKHOLM)
+    stop = start + span
+
+    payload = benchmark(
+        build_dashboard_payload, reactors, series_by_block, umm_index, start, stop, STOCKHOLM, aggregate_every
+    )
+    assert all(panel.y is not None for panel in payload.panels)
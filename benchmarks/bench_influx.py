@@ -0,0 +1,38 @@
+"""Reading multi-year series from InfluxDB into arrays, against a local stand-in serving the raw CSV."""
+
+from datetime import timedelta
+
+import pytest
+
+from fixtures import SERIES_START, InfluxStandIn, reactor_series
+
+YEARS = [1, 3]
+
+
+@pytest.fixture(scope="module", params=YEARS, ids=lambda years: f"{years}y")
+def stand_in(request, reactors):
+    series = reactor_series([reactor.reactor_label for reactor in reactors], request.param * 365)
+    return InfluxStandIn(series), sum(len(times) for times, _ in series.values())
+
+
+def bench_read_many_from_influx(benchmark, monkeypatch, reactors, stand_in):
+    import influxdb
+    from models.reactor import REACTOR_OPERATING_DATA_BUCKET, REACTOR_OPERATING_DATA_MEASUREMENT
+
+    client, rows = stand_in
+    monkeypatch.setattr(influxdb, "get_influx_client", lambda: client)
+    monkeypatch.setattr(influxdb, "ensure_bucket_exists", lambda client, bucket: None)
+
+    blocks = [reactor.reactor_label for reactor in reactors]
+    series = benchmark(
+        influxdb.read_many_from_influx,
+        REACTOR_OPERATING_DATA_BUCKET,
+        REACTOR_OPERATING_DATA_MEASUREMENT,
+        "MW",
+        tag_key="block",
+        tag_values=blocks,
+        start=SERIES_START,
+        stop=SERIES_START + timedelta(days=3 * 365),
+        columnar=True,
+    )
+    assert sum(len(s) for s in series.values()) == rows
@@ -0,0 +1,99 @@
+"""The Lekstuga burnup analysis, run on every click in the page."""
+
+import numpy as np
+import pytest
+from scipy.signal import convolve2d
+
+from fixtures import REPO_ROOT
+
+
+def calculate_analysis_data_convolve2d(
+    fuel_age_map: np.ndarray,
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray, float]]:
+    """The burnup steps as calculated before, with a convolve2d per step. Returns (burnup, kinf, power, leakage)
+    per step."""
+
+    from lekstuga_engine import BURNUP_STEP_SIZE, NUMBER_OF_STEPS, kinf_curve, power_kernel
+
+    steps = []
+    burnup_map = np.array(fuel_age_map, dtype=float)
+    for _ in range(NUMBER_OF_STEPS):
+        if steps:
+            burnup_map = steps[-1][0] + BURNUP_STEP_SIZE * steps[-1][2]
+        kinf_map = kinf_curve(burnup_map)
+        kinf_map_filled = np.where(np.isnan(kinf_map), 0, kinf_map)
+        power_map = convolve2d(kinf_map_filled, power_kernel, mode="same", boundary="fill", fillvalue=0)
+        power_map = np.where(np.isnan(burnup_map), np.nan, power_map)
+        power_map = power_map / np.nanmean(power_map)
+
+        total_power = np.nansum(power_map)
+        outer_ring_power = np.nansum(
+            np.concatenate([power_map[0, :], power_map[-1, :], power_map[1:-1, 0], power_map[1:-1, -1]])
+        )
+        leakage = (outer_ring_power / total_power) * 100 if total_power > 0 else 0.0
+        steps.append((burnup_map, kinf_map, power_map, leakage))
+    return steps
+
+
+def _fuel_age_maps():
+    from models.lekstuga.scenarios import LekstugaScenario
+
+    scenarios = LekstugaScenario.load_many_from_file(REPO_ROOT / "data/lekstuga/scenarios.yaml")
+    for scenario in scenarios:
+        # Built like the page does, with a mix of fuel ages
+        fuel_age_map = np.full((len(scenario.layout.map), len(scenario.layout.map[0])), None)
+        for row_idx, row in enumerate(scenario.layout.map):
+            for col_idx, col in enumerate(row):
+                if col != "_":
+                    fuel_age_map[row_idx, col_idx] = (row_idx + col_idx) % 5
+        yield pytest.param(fuel_age_map, id=f"{fuel_age_map.shape[0]}x{fuel_age_map.shape[1]}")
+
+
+@pytest.mark.parametrize("backend", ["numpy", "numba"])
+@pytest.mark.parametrize("fuel_age_map", list(_fuel_age_maps()))
+def bench_calculate_analysis_data(benchmark, monkeypatch, fuel_age_map, backend):
+    import lekstuga_engine
+
+    if backend not in lekstuga_engine._DEPLETION_BACKENDS:
+        pytest.skip(f"{backend} is not installed")
+    monkeypatch.setattr(lekstuga_engine, "LEKSTUGA_DEPLETION_BACKEND", backend)
+    # Compile outside of the timing
+    lekstuga_engine.calculate_analysis_data(fuel_age_map)
+
+    analysis_data = benchmark(lekstuga_engine.calculate_analysis_data, fuel_age_map)
+
+    for step, (burnup_map, kinf_map, power_map, leakage) in zip(
+        analysis_data.burnup_step_data, calculate_analysis_data_convolve2d(fuel_age_map), strict=True
+    ):
+        np.testing.assert_allclose(step.burnup_map, burnup_map, rtol=1e-12)
+        np.testing.assert_allclose(step.kinf_map, kinf_map, rtol=1e-12)
+        np.testing.assert_allclose(step.power_map, power_map, rtol=1e-12)
+        np.testing.assert_allclose(step.leakage, leakage, rtol=1e-12)
+
+    ages = [age for row in fuel_age_map for age in row if age is not None]
+    assert analysis_data.total_fuel_elements == len(ages)
+    assert [(c.age, c.count) for c in analysis_data.age_counts] == [
+        (age, ages.count(age)) for age in range(lekstuga_engine.MAX_AGE + 1)
+    ]
+
+
+@pytest.mark.parametrize("fuel_age_map", list(_fuel_age_maps()))
+def bench_calculate_analysis_data_convolve2d(benchmark, fuel_age_map):
+    """The previous implementation, as a baseline."""
+
+    steps = benchmark(calculate_analysis_data_convolve2d, fuel_age_map)
+    assert len(steps) == 20
+
+
+@pytest.mark.parametrize("fuel_age_map", list(_fuel_age_maps()))
+def bench_get_analysis_data(benchmark, fuel_age_map):
+    """A click on a loading pattern seen before, in another orientation."""
+
+    from lekstuga_engine import get_analysis_data
+
+    original = get_analysis_data(fuel_age_map)
+    rotated = np.rot90(fuel_age_map).copy()
+
+    analysis_data = benchmark(get_analysis_data, rotated)
+    for step, original_step in zip(analysis_data.burnup_step_data, original.burnup_step_data, strict=True):
+        np.testing.assert_array_equal(step.power_map, np.rot90(original_step.power_map))
@@ -0,0 +1,79 @@
+"""Parsing of the Nord Pool UMM feed, from the whole feed down to a single message description."""
+
+import io
+
+import pytest
+
+from fixtures import umm_description_html, umm_feed
+
+FEED_SIZES = [10, 200, 2000]
+
+
+class _FeedResponse:
+    def __init__(self, body: bytes):
+        self.raw = io.BytesIO(body)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+
+def _clear_umm_caches():
+    import umm
+
+    umm._description_cache.clear()
+
+
+@pytest.mark.parametrize("feed_format", ["atom", "rss"])
+@pytest.mark.parametrize("entries", FEED_SIZES)
+def bench_fetch_umm_events(benchmark, monkeypatch, entries, feed_format):
+    """A cold fetch: every description is parsed."""
+
+    import umm
+
+    body = umm_feed(entries, feed_format)
+    monkeypatch.setattr(umm.requests, "get", lambda url, **kwargs: _FeedResponse(body))
+
+    events, _ = benchmark.pedantic(
+        umm.fetch_umm_events,
+        kwargs={"event_stop_utc": umm.STOCKHOLM_TZ.localize(umm.datetime(2027, 1, 1))},
+        setup=_clear_umm_caches,
+        rounds=5 if entries > 200 else 20,
+    )
+    assert len(events) > entries
+
+
+def bench_fetch_umm_events_repeated(benchmark, monkeypatch):
+    """A fetch of a mostly unchanged feed, with the descriptions already parsed."""
+
+    import umm
+
+    body = umm_feed(FEED_SIZES[-1])
+    monkeypatch.setattr(umm.requests, "get", lambda url, **kwargs: _FeedResponse(body))
+    _clear_umm_caches()
+
+    events, _ = benchmark(umm.fetch_umm_events, event_stop_utc=umm.STOCKHOLM_TZ.localize(umm.datetime(2027, 1, 1)))
+    assert len(events) > FEED_SIZES[-1]
+
+
+@pytest.mark.parametrize("parser", ["bs4", "lxml"])
+def bench_extract_event_from_description_html(benchmark, parser):
+    import umm
+
+    if parser not in umm._HTML_PARSER_BACKENDS:
+        pytest.skip(f"{parser} is not installed")
+
+    descriptions = [umm_description_html(i) for i in range(100)]
+
+    def extract_all():
+        return [tuple(umm._extract_event_from_description_html(d, parser=parser)) for d in descriptions]
+
+    result = benchmark.pedantic(extract_all, setup=_clear_umm_caches, rounds=20)
+
+    _clear_umm_caches()
+    assert result == [tuple(umm._extract_event_from_description_html(d, parser="bs4")) for d in descriptions]
@@ -0,0 +1,73 @@
+"""Extraction of the production data from the Vattenfall page, and the whole fetch of get_reactor_operating_data."""
+
+import json
+from contextlib import contextmanager
+
+import pytest
+from bs4 import BeautifulSoup
+
+from fixtures import vattenfall_page
+
+
+def extract_power_plant_data_bs4(page: bytes):
+    """The extraction as done before, building the full soup of the page."""
+
+    from models.reactor_operating_data import PowerPlantData
+
+    soup = BeautifulSoup(page, "html.parser")
+    script_tags_with_json = soup.find_all("script", {"type": "application/json"})
+    json_contents = [tag.get_text() for tag in script_tags_with_json]
+
+    power_plant_data_list: list[PowerPlantData] = []
+    for json_content in json_contents:
+        if not json_content:
+            continue
+
+        parsed_json = json.loads(json_content)
+        if isinstance(parsed_json, list):
+            power_plant_data_list.extend(PowerPlantData.from_dict(item) for item in parsed_json)
+        else:
+            power_plant_data_list.append(PowerPlantData.from_dict(parsed_json))
+
+    return power_plant_data_list
+
+
+@pytest.fixture(scope="module")
+def page() -> bytes:
+    return vattenfall_page()
+
+
+def bench_extract_power_plant_data(benchmark, page):
+    from vattenfall_page import extract_power_plant_data
+
+    result = benchmark(extract_power_plant_data, page)
+    assert result == extract_power_plant_data_bs4(page)
+
+
+def bench_extract_power_plant_data_bs4(benchmark, page):
+    """The previous implementation, as a baseline."""
+
+    result = benchmark(extract_power_plant_data_bs4, page)
+    assert len(result) == 2
+
+
+def bench_get_reactor_operating_data(benchmark, monkeypatch, tmp_path, page):
+    from http_cache import CachedResponse
+    from jobs import reactor_operating_data_job
+
+    body_path = tmp_path / "page.body"
+    body_path.write_bytes(page)
+
+    @contextmanager
+    def fetch(url, **kwargs):
+        yield CachedResponse(body_path, changed=True)
+
+    monkeypatch.setattr(reactor_operating_data_job.http_cache, "fetch", fetch)
+
+    def get_reactor_operating_data():
+        with reactor_operating_data_job.get_reactor_operating_data() as (power_plant_data_list, page):
+            page.commit()
+            return power_plant_data_list
+
+    result = benchmark(get_reactor_operating_data)
+    assert [plant.powerPlant for plant in result] == ["Forsmark", "Ringhals"]
@@ -0,0 +1,34 @@
+import sys
+
+import pytest
+
+from fixtures import REPO_ROOT, SRC_DIR
+
+# The application modules live in src/ and import each other as top-level modules
+sys.path.insert(0, str(SRC_DIR))
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch, tmp_path):
+    """Keep every benchmark off the network and out of data_cache/."""
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("Benchmarks must not touch the network")
+
+    import requests
+
+    monkeypatch.setattr(requests.Session, "request", no_network)
+    monkeypatch.setattr(requests, "get", no_network)
+    monkeypatch.chdir(REPO_ROOT)
+
+    import http_cache
+
+    monkeypatch.setattr(http_cache.http_cache, "directory", tmp_path / "http")
+
+
+@pytest.fixture(scope="session")
+def reactors():
+    from models.reactor import Reactor
+
+    return Reactor.load_many_from_file(REPO_ROOT / "data/reactor_operating_data/reactors.yaml")
+
@@ -0,0 +1,161 @@
+"""Synthetic inputs for the benchmarks, shaped like what the jobs and pages see in production."""
+
+import io
+import json
+from datetime import datetime, timedelta, timezone
+from html import escape
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SRC_DIR = REPO_ROOT / "src"
+
+VATTENFALL_BLOCKS = {
+    "Forsmark": [("F1", 1010.0), ("F2", 1120.0), ("F3", 1170.0)],
+    "Ringhals": [("R3", 1070.0), ("R4", 1130.0)],
+}
+
+# Unit names as they appear in the "Production Units" table of a UMM message
+UMM_UNIT_NAMES = ["Forsmark Block 1", "Forsmark Block 2", "Forsmark Block 3", "G31", "G32", "Ringhals Block 4"]
+
+# The first rated power in reactors.yaml starts here, series cannot begin earlier
+SERIES_START = datetime(2025, 4, 1, tzinfo=timezone.utc)
+
+
+def vattenfall_page(filler_sections: int = 400) -> bytes:
+    """A page like the Vattenfall production page: a large HTML document with the production data
+    in <script type="application/json"> tags among unrelated markup and scripts."""
+
+    power_plants = [
+        {
+            "timestamp": "2024-05-01T12:03:00+02:00",
+            "powerPlant": power_plant,
+            "blockProductionDataList": [
+                {"name": name, "production": rated * 0.97, "unit": "MW", "percent": 97.0} for name, rated in blocks
+            ],
+        }
+        for power_plant, blocks in VATTENFALL_BLOCKS.items()
+    ]
+
+    filler = "".join(
+        f'<section class="teaser teaser--{i}"><div class="teaser__inner"><h2 class="teaser__title">Rubrik {i}</h2>'
+        f'<p class="teaser__text">Lorem ipsum dolor sit amet, consectetur adipiscing elit &amp; mer.</p>'
+        f'<a href="/se/sida-{i}" class="teaser__link">Läs mer</a></div></section>'
+        for i in range(filler_sections)
+    )
+    page = (
+        "<!DOCTYPE html><html lang=\"sv\"><head><meta charset=\"utf-8\"><title>Aktuell kärnkraftsproduktion</title>"
+        '<script>window.dataLayer = window.dataLayer || []; if (1 < 2) { dataLayer.push({"page": "x"}); }</script>'
+        '<script type="application/ld+json">{"@context": "https://schema.org", "@type": "Organization"}</script>'
+        "</head><body><header><nav>"
+        + "".join(f'<a href="/se/meny-{i}">Meny {i}</a>' for i in range(50))
+        + "</nav></header><main>"
+        + filler
+        + "".join(f'<script type="application/json">{json.dumps([plant])}</script>' for plant in power_plants)
+        + '<script type="application/json"></script>'
+        + filler
+        + "</main><footer>Vattenfall AB</footer></body></html>"
+    )
+    return page.encode("utf-8")
+
+
+def umm_description_html(i: int, units: int = 2) -> str:
+    """The HTML description of a UMM message: a metadata table, then the "Production Units" table."""
+
+    start = datetime(2025, 1, 1) + timedelta(days=i % 700, hours=i % 24)
+    stop = start + timedelta(days=1 + i % 30)
+    unit_rows = "".join(
+        f"<tr><td>{UMM_UNIT_NAMES[(i + u) % len(UMM_UNIT_NAMES)]}</td><td>10YSE-1--------K</td>"
+        f"<td>{(i * 37 + u) % 1100} MW</td><td>{1100 - (i * 37 + u) % 1100} MW</td><td>1100 MW</td>"
+        f"<td>{start:%d.%m.%Y %H:%M}</td><td>{stop:%d.%m.%Y %H:%M}</td></tr>"
+        for u in range(units)
+    )
+    return (
+        "<table><tr><th>Message ID:</th><td>message</td></tr>"
+        "<tr><th>Status:</th><td>Active</td></tr>"
+        "<tr><th>Event type:</th><td>Production unavailability</td></tr>"
+        "<tr><th>Remarks:</th><td>Planned maintenance &amp; refuelling outage</td></tr></table>"
+        "<h3>Market participants</h3><table><tr><th>Name</th><th>Code</th></tr>"
+        "<tr><td>Vattenfall AB</td><td>N02101</td></tr></table>"
+        "<h3>Production Units</h3><table><tr><th>Unit Name</th><th>Area</th><th>Available Capacity</th>"
+        "<th>Unavailable Capacity</th><th>Installed Capacity</th><th>From</th><th>To</th></tr>"
+        f"{unit_rows}</table>"
+    )
+
+
+def umm_feed(entries: int, feed_format: str = "atom") -> bytes:
+    """A Nord Pool UMM feed with `entries` messages, as Atom (<feed><entry>) or RSS (<rss><item>).
+
+    Every message lists its events in the description, so parsing never falls back to the UMM API.
+    """
+
+    items = []
+    for i in range(entries):
+        message_id = f"{i:08x}-0000-4000-8000-{i:012x}"
+        link = f"https://umm.nordpoolgroup.com/#/messages/{message_id}/{1 + i % 3}"
+        content = escape(umm_description_html(i))
+        if feed_format == "atom":
+            items.append(
+                f"<entry><id>{message_id}</id><title>Unavailability {i}</title>"
+                f'<link rel="alternate" href="{link}" /><updated>2025-01-01T00:00:00Z</updated>'
+                f'<content type="html">{content}</content></entry>'
+            )
+        else:
+            items.append(
+                f"<item><guid>{message_id}</guid><title>Unavailability {i}</title><link>{link}</link>"
+                f"<description>{content}</description></item>"
+            )
+
+    if feed_format == "atom":
+        feed = '<?xml version="1.0" encoding="utf-8"?><feed xmlns="http://www.w3.org/2005/Atom"><title>UMM</title>'
+        return (feed + "".join(items) + "</feed>").encode("utf-8")
+    feed = '<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel><title>UMM</title>'
+    return (feed + "".join(items) + "</channel></rss>").encode("utf-8")
+
+
+def reactor_series(
+    blocks: list[str], days: int, every: timedelta = timedelta(minutes=10), seed: int = 0
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """(times in epoch ns, MW) per block from SERIES_START, with outages and the odd missing update."""
+
+    rng = np.random.default_rng(seed)
+    step_ns = every // timedelta(microseconds=1) * 1000
+    start_ns = (SERIES_START - datetime.fromtimestamp(0, tz=timezone.utc)) // timedelta(microseconds=1) * 1000
+    count = int(timedelta(days=days) / every)
+
+    series = {}
+    for block in blocks:
+        times_ns = start_ns + np.arange(count, dtype=np.int64) * step_ns
+        mw = 1100 + rng.normal(0, 5, count)
+        # A few weeks long outage every year
+        mw[(np.arange(count) * step_ns // (365 * 86400 * 10**9 // 52)) % 52 < 4] = 0
+        keep = rng.random(count) > 0.01
+        series[block] = (times_ns[keep], mw[keep])
+    return series
+
+
+class _InfluxResponse(io.BytesIO):
+    def release_conn(self):
+        pass
+
+
+class InfluxStandIn:
+    """Answers the raw CSV queries of influxdb._query_columnar from in-memory series, like a local InfluxDB.
+
+    Only the response format is faked, every query gets the full series of every block.
+    """
+
+    def __init__(self, series: dict[str, tuple[np.ndarray, np.ndarray]], tag_key: str = "block"):
+        lines = [f",result,table,_time_ns,_value,{tag_key}"]
+        for block, (times_ns, values) in series.items():
+            lines.extend(f",_result,0,{t},{v!r},{block}" for t, v in zip(times_ns.tolist(), values.tolist()))
+        self.body = ("\r\n".join(lines) + "\r\n").encode("utf-8")
+        self.queries: list[str] = []
+
+    def query_api(self):
+        return self
+
+    def query_raw(self, query: str, dialect=None):
+        self.queries.append(query)
+        return _InfluxResponse(self.body)
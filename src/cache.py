@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+from metrics import cache_requests
+
+
+class LRUCache:
+    """Thread-safe, process-wide LRU cache.
+
+    - Entries are evicted least-recently-used first once the summed `size_of(value)`
+      exceeds `max_size`.
+    - Each entry may have its own TTL (seconds). Entries without TTL are kept until evicted.
+    - `get_or_compute` is single-flight: concurrent callers asking for the same missing key
+      share one computation instead of all running it.
+    """
+
+    def __init__(self, name: str, max_size: int, size_of: Callable[[Any], int] | None = None):
+        self.name = name
+        self.max_size = max_size
+        self._size_of = size_of or (lambda value: 1)
+        self._entries: OrderedDict[Hashable, tuple[Any, int, float | None]] = OrderedDict()
+        self._inflight: dict[Hashable, Future] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _pop(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def _get_locked(self, key: Hashable) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, _, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._pop(key)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _put_locked(self, key: Hashable, value: Any, ttl: float | None):
+        if key in self._entries:
+            self._pop(key)
+        size = self._size_of(value)
+        if size > self.max_size:
+            # Never let a single oversized value flush the whole cache
+            return
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (value, size, expires_at)
+        self._size += size
+        while self._size > self.max_size:
+            oldest_key = next(iter(self._entries))
+            self._pop(oldest_key)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            found, value = self._get_locked(key)
+            if found:
+                self.hits += 1
+                cache_requests.inc(cache=self.name, result="hit")
+                return value
+            self.misses += 1
+            cache_requests.inc(cache=self.name, result="miss")
+            return default
+
+    def put(self, key: Hashable, value: Any, ttl: float | None = None):
+        with self._lock:
+            self._put_locked(key, value, ttl)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: float | None = None) -> Any:
+        with self._lock:
+            found, value = self._get_locked(key)
+            if found:
+                self.hits += 1
+                cache_requests.inc(cache=self.name, result="hit")
+                return value
+            self.misses += 1
+            cache_requests.inc(cache=self.name, result="miss")
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            # Someone else is already computing this key, wait for their result
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._put_locked(key, value, ttl)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -0,0 +1,290 @@
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta, tzinfo
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from cache import LRUCache
+from high_water_marks import ingest_high_water_marks
+from influxdb import get_datetime_of_extreme, read_many_from_influx_cached
+from models.reactor import (
+    REACTOR_OPERATING_DATA_BUCKET,
+    REACTOR_OPERATING_DATA_MEASUREMENT,
+    Reactor,
+)
+from series_processing import insert_gaps, normalize_to_rated_power
+from series_store import series_store
+from umm_index import UmmIntervalIndex
+from umm_store import get_umm_snapshot
+
+REACTORS_PATH = "data/reactor_operating_data/reactors.yaml"
+
+# Ranges precomputed after every ingestion tick, ending today
+DASHBOARD_PRESETS = [timedelta(weeks=2), timedelta(days=90), timedelta(days=365)]
+DASHBOARD_TIMEZONES = ["UTC", "Europe/Stockholm"]
+# Precomputed payloads are replaced every tick, this only drops them if the job stops running
+DASHBOARD_PAYLOAD_TTL = 10 * 60  # seconds
+
+AGGREGATE_EVERY_MINUTES = {
+    None: 10,
+    "30m": 30,
+    "1h": 60,
+    "3h": 180,
+    "6h": 360,
+}
+
+
+@dataclass(frozen=True)
+class UmmOverlay:
+    start: datetime  # Local time
+    stop: datetime
+    fill: str
+    hover: str
+
+
+@dataclass(frozen=True)
+class ReactorPanel:
+    reactor_name: str
+    reactor_type: str
+    x: pd.DatetimeIndex | None  # Local time, None if there is no data in the range
+    y: np.ndarray | None  # Percent of rated power, NaN where the line is broken
+    max_y_axis: float
+    overlays: tuple[UmmOverlay, ...]
+
+
+@dataclass(frozen=True)
+class DashboardPayload:
+    """Everything plot_cards renders for one range, independent of the UI."""
+
+    start: datetime  # Start of the first local day
+    stop: datetime  # End of the last local day
+    panels: tuple[ReactorPanel, ...]
+    umm_rows: tuple[dict, ...]
+    umm_table_error: str | None
+    # First and last point of all reactor data, set on precomputed payloads for the date picker
+    data_range: tuple[datetime, datetime] | None = None
+
+
+dashboard_payloads = LRUCache("dashboard_payloads", max_size=64)
+# The first point of the reactor data, queried once per process
+_data_first = LRUCache("dashboard_data_first", max_size=1)
+
+
+def dashboard_payload_key(tz: tzinfo, start: datetime, stop: datetime) -> tuple[str, date, date]:
+    return str(tz), start.date(), stop.date()
+
+
+def local_day_bounds(start_local: datetime, stop_local: datetime, tz: tzinfo) -> tuple[datetime, datetime]:
+    """Start of the first and end of the last local day. Naive datetimes (from the date picker) are in `tz`."""
+
+    def localize(dt: datetime) -> datetime:
+        if dt.tzinfo is not None:
+            return dt
+        return tz.localize(dt) if hasattr(tz, "localize") else dt.replace(tzinfo=tz)
+
+    start = localize(start_local.replace(hour=0, minute=0, second=0, microsecond=0))
+    stop = localize(stop_local.replace(hour=23, minute=59, second=59, microsecond=999999))
+    return start, stop
+
+
+def aggregate_every_for_span(span: timedelta) -> str | None:
+    # Downsample for long intervals to avoid huge Plotly payloads (browser can crash/hang)
+    if span > timedelta(days=365):
+        return "6h"
+    elif span > timedelta(days=180):
+        return "3h"
+    elif span > timedelta(days=90):
+        return "1h"
+    elif span > timedelta(days=30):
+        return "30m"
+    return None
+
+
+def can_serve_from_memory(start: datetime, aggregate_every: str | None) -> bool:
+    """Recent, non-aggregated windows are served straight from the in-memory series store."""
+    return aggregate_every is None and series_store.covers(start)
+
+
+def read_series_from_memory(
+    reactors: list[Reactor], start: datetime, stop: datetime
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    series_by_block = {}
+    for reactor in reactors:
+        times_ns, mw, _ = series_store.read(reactor.reactor_label, start, stop)
+        series_by_block[reactor.reactor_label] = (times_ns, mw)
+    return series_by_block
+
+
+def read_series_from_influx(
+    reactors: list[Reactor], start: datetime, stop: datetime, aggregate_every: str | None
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    series = read_many_from_influx_cached(
+        REACTOR_OPERATING_DATA_BUCKET,
+        REACTOR_OPERATING_DATA_MEASUREMENT,
+        "MW",
+        tag_key="block",
+        tag_values=[reactor.reactor_label for reactor in reactors],
+        start=start,
+        stop=stop,
+        aggregate_every=aggregate_every,
+        aggregate_fn="last",
+        columnar=True,
+    )
+    return {block: (s.times, s.values) for block, s in series.items()}
+
+
+def _umm_overlays(umm_index: UmmIntervalIndex, reactor: Reactor, start: datetime, stop: datetime, tz: tzinfo):
+    overlays = []
+    for ev in umm_index.overlapping(start, stop, reactor.reactor_label):
+        ev_start = ev.start.astimezone(tz)
+        ev_stop = ev.stop.astimezone(tz)
+
+        # Orange for partial reductions, red for full outage (available == 0)
+        fill = "orange"
+        if ev.available_mw is not None and float(ev.available_mw) == 0.0:
+            # Only apply this if there is no suffix (eg G31, G42, etc... which would mean that its only a partial outage)
+            if ev.unit_suffix is None:
+                fill = "red"
+
+        hover = "UMM"
+        if ev.unavailable_mw is not None:
+            hover = f"Unavailable: {int(round(ev.unavailable_mw))} MW"
+        if ev.available_mw is not None:
+            hover += f"<br>Available: {int(round(ev.available_mw))} MW"
+        hover += f"<br>{ev_start.strftime('%Y-%m-%d %H:%M')} → {ev_stop.strftime('%Y-%m-%d %H:%M')}"
+
+        overlays.append(UmmOverlay(start=ev_start, stop=ev_stop, fill=fill, hover=hover))
+    return tuple(overlays)
+
+
+def _umm_rows(umm_index: UmmIntervalIndex, reactors: list[Reactor], start: datetime, stop: datetime, tz: tzinfo):
+    # Map unit label -> human readable name
+    name_by_label = {r.reactor_label: r.reactor_name for r in reactors}
+
+    rows = []
+    for ev in umm_index.overlapping(start, stop):
+        ev_start = ev.start.astimezone(tz)
+        ev_stop = ev.stop.astimezone(tz)
+
+        rows.append(
+            {
+                "block": name_by_label.get(ev.unit_label, ev.unit_label),
+                "suffix": ev.unit_suffix or "",
+                "start": ev_start.strftime("%Y-%m-%d %H:%M"),
+                "stop": ev_stop.strftime("%Y-%m-%d %H:%M"),
+                "available_mw": "" if ev.available_mw is None else int(round(ev.available_mw)),
+                "unavailable_mw": "" if ev.unavailable_mw is None else int(round(ev.unavailable_mw)),
+                "link": ev.link or "",
+                "_id": f"{ev.unit_label}-{ev.start.isoformat()}-{ev.stop.isoformat()}",
+            }
+        )
+
+    rows.sort(key=lambda r: (r["block"], r["start"]))
+    return tuple(rows)
+
+
+def build_dashboard_payload(
+    reactors: list[Reactor],
+    series_by_block: dict[str, tuple[np.ndarray, np.ndarray]],
+    umm_index: UmmIntervalIndex,
+    start: datetime,
+    stop: datetime,
+    tz: tzinfo,
+    aggregate_every: str | None,
+) -> DashboardPayload:
+    """Turn the raw MW series of every reactor into what the page plots, from `start` to `stop`."""
+
+    panels = []
+    for reactor in reactors:
+        times_ns, mw = series_by_block.get(reactor.reactor_label, ([], []))
+
+        if len(times_ns) == 0:
+            panels.append(ReactorPanel(reactor.reactor_name, reactor.reactor_type, None, None, 0, ()))
+            continue
+
+        # Normalize each value using the rated reactor power in effect at its timestamp
+        y = normalize_to_rated_power(reactor, times_ns, mw)
+
+        # Break the plot line if data is missing for longer than the time window.
+        # Updates are expected every 10 minutes.
+        time_window_minutes = max(180, AGGREGATE_EVERY_MINUTES[aggregate_every])
+        times_ns, y = insert_gaps(times_ns, y, timedelta(minutes=time_window_minutes))
+        y.setflags(write=False)
+
+        x = pd.to_datetime(times_ns, utc=True).tz_convert(tz)
+
+        # As we might have NaN values
+        max_y_axis = max(100, np.nanmax(y, initial=0)) + 10
+
+        try:
+            overlays = _umm_overlays(umm_index, reactor, start, stop, tz)
+        except Exception:
+            # Never break plotting because of UMM parsing/overlay issues
+            overlays = ()
+
+        panels.append(ReactorPanel(reactor.reactor_name, reactor.reactor_type, x, y, max_y_axis, overlays))
+
+    umm_rows, umm_table_error = (), None
+    try:
+        umm_rows = _umm_rows(umm_index, reactors, start, stop, tz)
+    except Exception as e:
+        umm_table_error = str(e)
+
+    return DashboardPayload(
+        start=start, stop=stop, panels=tuple(panels), umm_rows=umm_rows, umm_table_error=umm_table_error
+    )
+
+
+def compute_dashboard_payload(tz: tzinfo, start_local: datetime, stop_local: datetime) -> DashboardPayload:
+    """Blocking: read the series (from memory or InfluxDB) and build the payload for a local date range."""
+
+    start, stop = local_day_bounds(start_local, stop_local, tz)
+    aggregate_every = aggregate_every_for_span(stop - start)
+    reactors = Reactor.load_many_from_file(REACTORS_PATH)
+
+    if can_serve_from_memory(start, aggregate_every):
+        series_by_block = read_series_from_memory(reactors, start, stop)
+    else:
+        series_by_block = read_series_from_influx(reactors, start, stop, aggregate_every)
+
+    return build_dashboard_payload(
+        reactors, series_by_block, get_umm_snapshot().index, start, stop, tz, aggregate_every
+    )
+
+
+def get_data_range() -> tuple[datetime, datetime] | None:
+    """First and last point of all reactor data, the last from the ingestion high-water marks."""
+
+    marks = ingest_high_water_marks.all() if ingest_high_water_marks.is_loaded else {}
+    if not marks:
+        return None
+
+    first = _data_first.get("first")
+    if first is None:
+        first = get_datetime_of_extreme(REACTOR_OPERATING_DATA_BUCKET, REACTOR_OPERATING_DATA_MEASUREMENT, "first")
+        if first is None:
+            return None
+        _data_first.put("first", first)
+    return first, max(marks.values())
+
+
+def precompute_dashboard_payloads():
+    """Build the payloads of every preset range in every common timezone, ending today."""
+
+    data_range = get_data_range()
+    for tz_name in DASHBOARD_TIMEZONES:
+        tz = pytz.timezone(tz_name)
+        stop_local = datetime.now(tz=tz)
+        for preset in DASHBOARD_PRESETS:
+            try:
+                payload = compute_dashboard_payload(tz, stop_local - preset, stop_local)
+            except Exception as e:
+                # The page builds this range itself (and shows the error) instead
+                print(f"Could not precompute the {preset.days} day dashboard in {tz_name} 🔴: {e}")
+                continue
+            dashboard_payloads.put(
+                dashboard_payload_key(tz, payload.start, payload.stop),
+                replace(payload, data_range=data_range),
+                ttl=DASHBOARD_PAYLOAD_TTL,
+            )
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable
+
+HIGH_WATER_MARKS_PATH = Path(os.getenv("HIGH_WATER_MARKS_PATH", "data_cache/high_water_marks.json"))
+
+
+def _as_utc_seconds(time: datetime) -> datetime:
+    # Points are written with second precision, and naive timestamps are stored as UTC
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return time.astimezone(timezone.utc).replace(microsecond=0)
+
+
+class HighWaterMarks:
+    """Newest ingested timestamp per key (block), kept in memory and persisted to a small JSON file.
+
+    Loaded from the file, or seeded once (e.g. from InfluxDB) if there is none, so ingestion can
+    tell new points from already written ones without querying the database.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._marks: dict[str, datetime] | None = None  # None until loaded
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._marks is not None
+
+    def load(self, seed: Callable[[], dict[str, datetime]]):
+        with self._lock:
+            if self.path.exists():
+                marks = {key: datetime.fromisoformat(value) for key, value in json.loads(self.path.read_text()).items()}
+            else:
+                marks = {key: _as_utc_seconds(value) for key, value in seed().items()}
+                self._save(marks)
+            self._marks = marks
+
+    def _save(self, marks: dict[str, datetime]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({key: value.isoformat() for key, value in marks.items()}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str) -> datetime | None:
+        assert self._marks is not None, "High-water marks are not loaded"
+        return self._marks.get(key)
+
+    def all(self) -> dict[str, datetime]:
+        assert self._marks is not None, "High-water marks are not loaded"
+        return dict(self._marks)
+
+    def is_new(self, key: str, time: datetime) -> bool:
+        mark = self.get(key)
+        return mark is None or _as_utc_seconds(time) > mark
+
+    def advance(self, times: Iterable[tuple[str, datetime]]):
+        """Raise the marks to the given (key, time) pairs (never lowers one) and persist them."""
+
+        with self._lock:
+            assert self._marks is not None, "High-water marks are not loaded"
+            marks = dict(self._marks)
+            for key, time in times:
+                time = _as_utc_seconds(time)
+                if key not in marks or time > marks[key]:
+                    marks[key] = time
+            self._save(marks)
+            self._marks = marks
+
+
+ingest_high_water_marks = HighWaterMarks(HIGH_WATER_MARKS_PATH)
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Callable, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR", "data_cache/http"))
+HTTP_CACHE_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Body of a fetch through the HTTP cache, stored on disk."""
+
+    path: Path
+    changed: bool  # False on 304 Not Modified or when the body is identical to the cached one
+    _commit: Callable[[], None] = field(default=lambda: None, repr=False, compare=False)
+
+    def commit(self):
+        """Store the body and its validators, once whatever was made of the body is stored too."""
+        self._commit()
+
+    def open(self) -> IO[bytes]:
+        return self.path.open("rb")
+
+    def read_bytes(self) -> bytes:
+        return self.path.read_bytes()
+
+
+class HttpCache:
+    """Conditional GETs over a persistent session, with validators and bodies cached on disk.
+
+    Every cache key (the URL unless given) keeps the last body together with its ETag,
+    Last-Modified and SHA-256. A fetch sends If-None-Match / If-Modified-Since, and reports
+    the response as unchanged on 304 or when the downloaded body hashes to the cached one,
+    so callers can skip parsing altogether.
+    """
+
+    def __init__(self, directory: Path, session: requests.Session | None = None):
+        self.directory = directory
+        self.session = session or requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.directory / f"{name}.body", self.directory / f"{name}.json"
+
+    def _write_meta(self, meta_path: Path, meta: dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    @contextmanager
+    def fetch(
+        self,
+        url: str,
+        *,
+        cache_key: str | None = None,
+        headers: dict[str, str] | None = None,
+        timeout: float = 20,
+    ) -> Iterator[CachedResponse]:
+        """GET `url` and yield the response body on disk.
+
+        The body and its validators only replace the cached ones when `commit()` is called on
+        the response inside the `with` block. Callers commit once they have stored what they
+        made of the body, so if parsing or storing fails the next fetch sees it as changed again.
+        """
+
+        key = cache_key or url
+        body_path, meta_path = self._paths(key)
+
+        with self._lock(key):
+            self.directory.mkdir(parents=True, exist_ok=True)
+            meta = {}
+            if body_path.exists() and meta_path.exists():
+                meta = json.loads(meta_path.read_text())
+
+            request_headers = dict(headers or {})
+            if meta.get("etag"):
+                request_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request_headers["If-Modified-Since"] = meta["last_modified"]
+
+            tmp_path = None
+            try:
+                with self.session.get(url, headers=request_headers, timeout=timeout, stream=True) as resp:
+                    if resp.status_code == 304:
+                        new_meta = None
+                    else:
+                        resp.raise_for_status()
+                        resp.raw.decode_content = True
+
+                        # Stream the body to a temporary file next to the cache, hashing on the way
+                        digest = hashlib.sha256()
+                        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                        with os.fdopen(fd, "wb") as f:
+                            for chunk in iter(lambda: resp.raw.read(HTTP_CACHE_CHUNK_SIZE), b""):
+                                digest.update(chunk)
+                                f.write(chunk)
+
+                        new_meta = {
+                            "url": url,
+                            "etag": resp.headers.get("ETag"),
+                            "last_modified": resp.headers.get("Last-Modified"),
+                            "sha256": digest.hexdigest(),
+                        }
+
+                if new_meta is None:
+                    yield CachedResponse(body_path, changed=False)
+                    return
+
+                if new_meta["sha256"] == meta.get("sha256"):
+                    # Same body, but the server may have sent new validators
+                    yield CachedResponse(
+                        body_path, changed=False, _commit=lambda: self._write_meta(meta_path, new_meta)
+                    )
+                    return
+
+                def commit():
+                    nonlocal tmp_path
+                    if tmp_path is not None:
+                        os.replace(tmp_path, body_path)
+                        tmp_path = None
+                        self._write_meta(meta_path, new_meta)
+
+                yield CachedResponse(Path(tmp_path), changed=True, _commit=commit)
+            finally:
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+
+http_cache = HttpCache(HTTP_CACHE_DIR)
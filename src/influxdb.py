@@ -1,10 +1,27 @@
+import asyncio
+import atexit
+import csv
+import functools
+import json
 import os
-from datetime import datetime, timezone
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Literal
 
-from influxdb_client import InfluxDBClient, Point
+import numpy as np
+import pandas as pd
+from influxdb_client import Dialect, InfluxDBClient, Point, WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client.rest import ApiException
+
+from cache import LRUCache
+from metrics import influx_points_queued, influx_points_spilled, influx_points_written, influx_query_seconds
+from timestamps import datetime_to_ns, ns_to_datetime
 
 
 def get_secret(key: str) -> str:
@@ -17,6 +34,10 @@ def get_secret(key: str) -> str:
     return os.environ.get(key)
 
 
+# Milliseconds per request. Bounds the database calls of the background jobs, which the
+# scheduler cannot interrupt.
+INFLUX_TIMEOUT = int(os.getenv("INFLUX_TIMEOUT", "10000"))
+
 _client = None
 _verified_buckets = set()
 
@@ -33,7 +54,7 @@ def get_influx_client():
 
     print(f"Connecting to InfluxDB at '{url}' with org '{org}'")
 
-    _client = InfluxDBClient(url=url, token=token, org=org)
+    _client = InfluxDBClient(url=url, token=token, org=org, timeout=INFLUX_TIMEOUT)
 
     # Ensure organization exists
     try:
@@ -77,6 +98,426 @@ def write_to_influx(data: Point | list[Point], bucket: str):
     ensure_bucket_exists(client, bucket)
     with client.write_api(write_options=SYNCHRONOUS) as write_api:
         write_api.write(bucket=get_influx_bucket(bucket), record=data)
+    influx_points_written.inc(len(data) if isinstance(data, list) else 1, bucket=bucket)
+
+
+INFLUX_WRITE_BATCH_SIZE = int(os.getenv("INFLUX_WRITE_BATCH_SIZE", "500"))  # Lines per write request
+INFLUX_WRITE_FLUSH_INTERVAL = float(os.getenv("INFLUX_WRITE_FLUSH_INTERVAL", "5"))  # seconds
+INFLUX_WRITE_MAX_BACKOFF = 5 * 60  # seconds
+INFLUX_SPILL_DIR = Path(os.getenv("INFLUX_SPILL_DIR", "data_cache/influx_spill"))
+
+
+class BatchingWriter:
+    """Long-lived, batching InfluxDB writer that never drops points when the database is down.
+
+    `write` appends the points (as nanosecond line protocol) to a queue file per bucket
+    ("<bucket>.lp") and fsyncs it before returning, so callers can treat them as stored. A
+    background thread writes the queued lines in batches every `flush_interval` seconds, or as
+    soon as `batch_size` lines are queued, and only then removes them from the queue file. While
+    writes fail the lines stay queued, retrying with exponential backoff. Writing lines again
+    after a crash is harmless, as InfluxDB overwrites points with the same series and timestamp.
+    Lines InfluxDB rejects as malformed are set aside in "<bucket>.<time>.rejected" files.
+    Queue files left by a previous run are written by a writer built over the same directory.
+    """
+
+    def __init__(self, spill_dir: Path, batch_size: int, flush_interval: float, max_backoff: float):
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        # Lines queued per bucket since the last flush, counted as spilled if that flush fails
+        self._pending: dict[str, int] = {}
+        self._pending_count = 0
+        # Lines in the queue file per bucket, recounted from the file on every flush
+        self._queued: dict[str, int] = {}
+        self._closed = False
+        # Held while a queue file is appended to or shortened
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._write_api = None
+        # Lines left queued by a previous run are written without waiting for a new write
+        if any(spill_dir.glob("*.lp")):
+            with self._condition:
+                self._start()
+
+    def _queue_path(self, bucket: str) -> Path:
+        return self.spill_dir / f"{bucket}.lp"
+
+    def write(self, data: Point | list[Point], bucket: str):
+        points = data if isinstance(data, list) else [data]
+        content = "".join(point.to_line_protocol(precision=WritePrecision.NS) + "\n" for point in points)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Writer is closed")
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            with open(self._queue_path(bucket), "a+b") as f:
+                end = f.seek(0, os.SEEK_END)
+                if end:
+                    f.seek(end - 1)
+                    if f.read(1) != b"\n":
+                        # The last append was cut short by a crash, keep its remains on a line of their own
+                        content = "\n" + content
+                f.write(content.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._start()
+            self._pending[bucket] = self._pending.get(bucket, 0) + len(points)
+            self._pending_count += len(points)
+            self._set_queued(bucket, self._queued.get(bucket, 0) + len(points))
+            self._condition.notify()
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="influx-writer", daemon=True)
+            self._thread.start()
+
+    def queued_lines(self, bucket: str) -> list[str]:
+        """Line protocol of the points not yet written to the bucket, oldest write first."""
+
+        with self._condition:
+            queue_path = self._queue_path(bucket)
+            if not queue_path.exists():
+                return []
+            return [line for line in queue_path.read_text().splitlines() if line]
+
+    def oldest_queued_ns(self, bucket: str) -> int | None:
+        """Timestamp of the oldest point not yet written to the bucket, None if all are written."""
+
+        # The timestamp ends every line, lines cut short by a crash may not have one
+        timestamps = (line.rpartition(" ")[2] for line in self.queued_lines(bucket))
+        return min((int(timestamp) for timestamp in timestamps if timestamp.isdigit()), default=None)
+
+    def close(self):
+        """Write everything still queued, if InfluxDB is up, and stop the background thread."""
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        backoff = 0.0
+        closed = False
+        while not closed:
+            with self._condition:
+                if backoff:
+                    # Wait out the backoff, however much is queued meanwhile
+                    self._condition.wait_for(lambda: self._closed, timeout=backoff)
+                else:
+                    self._condition.wait_for(
+                        lambda: self._closed or self._pending_count >= self.batch_size,
+                        timeout=self.flush_interval,
+                    )
+                closed = self._closed
+
+            if self.flush():
+                backoff = 0.0
+            else:
+                backoff = min(self.max_backoff, backoff * 2 or self.flush_interval)
+                print(f"InfluxDB: Write failed, retrying in {backoff:g} s")
+
+    def _write_lines(self, bucket: str, lines: list[str]):
+        if self._write_api is None:
+            self._write_api = get_influx_client().write_api(write_options=SYNCHRONOUS)
+        ensure_bucket_exists(get_influx_client(), bucket)
+        for i in range(0, len(lines), self.batch_size):
+            batch = lines[i : i + self.batch_size]
+            self._write_api.write(bucket=get_influx_bucket(bucket), record=batch, write_precision=WritePrecision.NS)
+            influx_points_written.inc(len(batch), bucket=bucket)
+
+    def _write_or_reject(self, bucket: str, lines: list[str], rejected: list[str]):
+        """Write the lines, bisecting a batch InfluxDB rejects as malformed down to the bad lines."""
+
+        try:
+            self._write_lines(bucket, lines)
+        except ApiException as e:
+            # Malformed (e.g. a line cut short by a crash), retrying would never succeed
+            if e.status not in (400, 422):
+                raise
+            if len(lines) == 1:
+                print(f"InfluxDB: Line for bucket '{bucket}' was rejected: {e}")
+                rejected.extend(lines)
+                return
+            middle = len(lines) // 2
+            self._write_or_reject(bucket, lines[:middle], rejected)
+            self._write_or_reject(bucket, lines[middle:], rejected)
+
+    def _set_aside(self, bucket: str, lines: list[str]):
+        # Named after the time, so earlier rejected lines are never overwritten
+        path = self.spill_dir / f"{bucket}.{datetime.now(timezone.utc):%Y%m%dT%H%M%S%fZ}.rejected"
+        with open(path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"InfluxDB: Set {len(lines)} rejected lines for bucket '{bucket}' aside in {path}")
+
+    def _set_queued(self, bucket: str, count: int):
+        self._queued[bucket] = count
+        influx_points_queued.set(count, bucket=bucket)
+
+    def _dequeue(self, queue_path: Path, size: int, count: int):
+        """Remove the first `size` bytes, the `count` lines now written, from the queue file."""
+
+        with self._condition:
+            self._set_queued(queue_path.stem, max(0, self._queued.get(queue_path.stem, 0) - count))
+            if queue_path.stat().st_size == size:
+                queue_path.unlink()
+                return
+            # Lines queued while writing stay queued
+            with open(queue_path, "rb") as f:
+                f.seek(size)
+                rest = f.read()
+            fd, tmp_path = tempfile.mkstemp(dir=self.spill_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(rest)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, queue_path)
+
+    def flush(self) -> bool:
+        """Write the queued lines, oldest first. Returns False if anything failed."""
+
+        with self._flush_lock:
+            with self._condition:
+                pending, self._pending = self._pending, {}
+                self._pending_count = 0
+                queued = {}
+                for queue_path in sorted(self.spill_dir.glob("*.lp")) if self.spill_dir.exists() else []:
+                    content = queue_path.read_bytes()
+                    lines = [line for line in content.decode("utf-8").splitlines() if line]
+                    queued[queue_path] = (len(content), lines)
+                    self._set_queued(queue_path.stem, len(lines))
+
+            ok = True
+            for queue_path, (size, lines) in queued.items():
+                bucket = queue_path.stem
+                rejected: list[str] = []
+                try:
+                    self._write_or_reject(bucket, lines, rejected)
+                except Exception as e:
+                    print(f"InfluxDB: Could not write queued lines to bucket '{get_influx_bucket(bucket)}': {e}")
+                    ok = False
+                    break
+                if rejected:
+                    self._set_aside(bucket, rejected)
+                self._dequeue(queue_path, size, len(lines))
+                pending.pop(bucket, None)
+
+            # Lines queued by this process that are left on disk for a later flush
+            for bucket, count in pending.items():
+                influx_points_spilled.inc(count, bucket=bucket)
+                print(f"InfluxDB: Kept {count} lines for bucket '{bucket}' queued in {self.spill_dir}")
+
+            return ok
+
+
+influx_writer = BatchingWriter(
+    INFLUX_SPILL_DIR,
+    batch_size=INFLUX_WRITE_BATCH_SIZE,
+    flush_interval=INFLUX_WRITE_FLUSH_INTERVAL,
+    max_backoff=INFLUX_WRITE_MAX_BACKOFF,
+)
+# Queued points are written on a clean shutdown if InfluxDB is up, and stay on disk if not
+atexit.register(influx_writer.close)
+
+
+# Downsampled copies of a bucket ("rollups"), maintained incrementally by the ingestion jobs.
+# A rollup bucket is named "<bucket>_<every>", e.g. "reactor_operating_data_1h-<env>".
+ROLLUP_EVERY = ["30m", "1h", "3h", "6h"]
+ROLLUP_FN = "last"
+
+# (bucket, every) -> time up to which the rollup is complete. Only windows ending at or before
+# this time are in the rollup bucket, newer data has to be aggregated from the raw bucket.
+_rollup_boundaries: dict[tuple[str, str], datetime] = {}
+
+
+def get_rollup_bucket(bucket: str, every: str) -> str:
+    return f"{bucket}_{every}"
+
+
+def _measurement_field_filters(measurement: str, field: str) -> str:
+    return f"""
+      {f'|> filter(fn: (r) => r._measurement == "{measurement}")' if measurement else ''}
+      {f'|> filter(fn: (r) => r._field == "{field}")' if field else ''}"""
+
+
+def _build_read_flux(
+    bucket: str,
+    measurement: str,
+    field: str,
+    start: datetime | None,
+    stop: datetime | None,
+    filters: list[str],
+    aggregate_every: str | None,
+    aggregate_fn: str,
+) -> str:
+    start_range = start.astimezone(timezone.utc).isoformat() if start else 0
+    stop_range = stop.astimezone(timezone.utc).isoformat() if stop else "now()"
+
+    aggregate_window = ""
+    if aggregate_every:
+        # Downsample to avoid huge payloads in the UI for long time ranges
+        aggregate_window = (
+            f"|> aggregateWindow(every: {aggregate_every}, fn: {aggregate_fn}, createEmpty: false)"
+        )
+
+    filters = "\n".join(filters)
+
+    rollup_boundary = None
+    if aggregate_every and aggregate_fn == ROLLUP_FN and start is not None:
+        rollup_boundary = _rollup_boundaries.get((bucket, aggregate_every))
+
+    if rollup_boundary is None or start.astimezone(timezone.utc) >= rollup_boundary:
+        return f"""
+    from(bucket: "{get_influx_bucket(bucket)}")
+      |> range(start: {start_range}, stop: {stop_range})
+      {_measurement_field_filters(measurement, field)}
+      {filters}
+      {aggregate_window}
+    """
+
+    # Serve the already aggregated part from the rollup bucket. aggregateWindow stamps each window
+    # with its stop time, so the windows in [start, boundary) are the rollup points in (start, boundary].
+    one_tick = timedelta(microseconds=1)
+    rollup_stop = min(stop.astimezone(timezone.utc), rollup_boundary) if stop else rollup_boundary
+    rollup_start_range = (start.astimezone(timezone.utc) + one_tick).isoformat()
+    rollup_stop_range = (rollup_stop + one_tick).isoformat()
+    rollup = f"""
+    from(bucket: "{get_influx_bucket(get_rollup_bucket(bucket, aggregate_every))}")
+      |> range(start: {rollup_start_range}, stop: {rollup_stop_range})
+      {_measurement_field_filters(measurement, field)}
+      {filters}
+    """
+    if stop is not None and stop.astimezone(timezone.utc) <= rollup_boundary:
+        return rollup
+
+    # ...and aggregate whatever is newer than the rollup from the raw bucket
+    return f"""
+    rollup = {rollup.strip()}
+      |> drop(columns: ["_start", "_stop"])
+
+    raw = from(bucket: "{get_influx_bucket(bucket)}")
+      |> range(start: {rollup_boundary.isoformat()}, stop: {stop_range})
+      {_measurement_field_filters(measurement, field)}
+      {filters}
+      {aggregate_window}
+      |> drop(columns: ["_start", "_stop"])
+
+    union(tables: [rollup, raw])
+      |> group(columns: ["_time", "_value"], mode: "except")
+      |> sort(columns: ["_time"])
+    """
+
+
+def update_rollup(bucket: str, measurement: str, every: str) -> datetime:
+    """Bring the rollup bucket for `every` up to date with the raw bucket.
+
+    Only complete windows are rolled up. The last window of the previous run is recomputed,
+    which is idempotent since rewriting a point with the same time overwrites it.
+    Returns the new rollup boundary.
+    """
+
+    rollup_bucket = get_rollup_bucket(bucket, every)
+    print(f"InfluxDB: Updating rollup bucket '{get_influx_bucket(rollup_bucket)}' from '{get_influx_bucket(bucket)}'")
+    client = get_influx_client()
+    ensure_bucket_exists(client, bucket)
+    ensure_bucket_exists(client, rollup_bucket)
+    query_api = client.query_api()
+
+    previous_boundary = _rollup_boundaries.get((bucket, every))
+    if previous_boundary is None:
+        # Points are stamped with their window stop, so the last point is the previous boundary
+        previous_boundary = get_datetime_of_extreme(rollup_bucket, measurement, "last")
+
+    step = _duration_to_timedelta(every)
+    boundary, _, _ = _align_window(datetime.now(timezone.utc), None, every)
+    oldest_queued_ns = influx_writer.oldest_queued_ns(bucket)
+    if oldest_queued_ns is not None:
+        # Windows with points still queued in the writer are not complete, and are rolled up
+        # again once the points are written, also after a restart
+        queued_boundary, _, _ = _align_window(ns_to_datetime(oldest_queued_ns), None, every)
+        boundary = min(boundary, queued_boundary)
+        if previous_boundary is not None:
+            previous_boundary = min(previous_boundary, boundary)
+    start_range = (previous_boundary.astimezone(timezone.utc) - step).isoformat() if previous_boundary else 0
+
+    flux = f"""
+    from(bucket: "{get_influx_bucket(bucket)}")
+      |> range(start: {start_range}, stop: {boundary.isoformat()})
+      {_measurement_field_filters(measurement, None)}
+      |> aggregateWindow(every: {every}, fn: {ROLLUP_FN}, createEmpty: false)
+      |> to(bucket: "{get_influx_bucket(rollup_bucket)}")
+    """
+
+    with influx_query_seconds.time(query="update_rollup", window=every):
+        query_api.query(flux)
+
+    _rollup_boundaries[(bucket, every)] = boundary
+    return boundary
+
+
+@dataclass(frozen=True)
+class ColumnarSeries:
+    """Query result as contiguous arrays instead of one FluxRecord per row."""
+
+    times: np.ndarray  # int64, epoch nanoseconds (UTC)
+    values: np.ndarray  # float64
+    tags: dict[str, np.ndarray]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def select(self, mask: np.ndarray) -> "ColumnarSeries":
+        return ColumnarSeries(
+            times=self.times[mask],
+            values=self.values[mask],
+            tags={key: values[mask] for key, values in self.tags.items()},
+        )
+
+
+def _query_columnar(query_api, flux: str, tag_keys: list[str]) -> ColumnarSeries:
+    """Run the query and parse the CSV response straight into arrays.
+
+    Times are converted to integers by Flux and everything is merged into a single table, so
+    the response is plain CSV with one header which pandas' C parser reads in one go.
+    """
+
+    tag_columns = "".join(f', "{key}"' for key in tag_keys)
+    flux += f"""
+      |> map(fn: (r) => ({{r with _time_ns: int(v: r._time)}}))
+      |> keep(columns: ["_time_ns", "_value"{tag_columns}])
+      |> group()
+    """
+
+    response = query_api.query_raw(flux, dialect=Dialect(header=True, annotations=[], delimiter=","))
+    try:
+        frame = pd.read_csv(
+            response,
+            usecols=["_time_ns", "_value", *tag_keys],
+            dtype={"_time_ns": np.int64, "_value": np.float64, **{key: "category" for key in tag_keys}},
+            engine="c",
+        )
+    except pd.errors.EmptyDataError:
+        # No rows at all means InfluxDB returns an empty body
+        frame = pd.DataFrame(
+            {
+                "_time_ns": np.zeros(0, dtype=np.int64),
+                "_value": np.zeros(0, dtype=np.float64),
+                **{key: np.zeros(0, dtype=object) for key in tag_keys},
+            }
+        )
+    finally:
+        response.release_conn()
+
+    return ColumnarSeries(
+        times=frame["_time_ns"].to_numpy(dtype=np.int64),
+        values=frame["_value"].to_numpy(dtype=np.float64),
+        tags={key: frame[key].to_numpy(dtype=object) for key in tag_keys},
+    )
 
 
 def read_from_influx(
@@ -88,7 +529,13 @@ def read_from_influx(
     tags: dict = None,
     aggregate_every: str | None = None,
     aggregate_fn: str = "last",
+    columnar: bool = False,
 ):
+    """Read a series from InfluxDB.
+
+    Returns a list of FluxRecord, or a ColumnarSeries if `columnar` is set.
+    """
+
     print(
         f"InfluxDB: Reading data from bucket '{get_influx_bucket(bucket)}', measurement '{measurement}', field '{field}'"
     )
@@ -100,58 +547,290 @@ def read_from_influx(
     if tags:
         for key, value in tags.items():
             tag_filters.append(f'|> filter(fn: (r) => r.{key} == "{value}")')
-    tag_filters = "\n".join(tag_filters)
 
-    start_range = start.astimezone(timezone.utc).isoformat() if start else 0
-    stop_range = stop.astimezone(timezone.utc).isoformat() if stop else "now()"
+    flux = _build_read_flux(bucket, measurement, field, start, stop, tag_filters, aggregate_every, aggregate_fn)
 
-    aggregate_window = ""
-    if aggregate_every:
-        # Downsample to avoid huge payloads in the UI for long time ranges
-        aggregate_window = (
-            f"|> aggregateWindow(every: {aggregate_every}, fn: {aggregate_fn}, createEmpty: false)"
-        )
+    with influx_query_seconds.time(query="read_from_influx", window=aggregate_every or "raw"):
+        if columnar:
+            return _query_columnar(query_api, flux, list(tags or {}))
 
-    flux = f"""
-    from(bucket: "{get_influx_bucket(bucket)}")
-      |> range(start: {start_range}, stop: {stop_range})
-      {f'|> filter(fn: (r) => r._measurement == "{measurement}")' if measurement else ''}
-      {f'|> filter(fn: (r) => r._field == "{field}")' if field else ''}
-      {tag_filters}
-      {aggregate_window}
+        result = query_api.query(flux)
+
+        return [record for table in result for record in table.records]
+
+
+def read_many_from_influx(
+    bucket: str,
+    measurement: str,
+    field: str,
+    tag_key: str,
+    tag_values: list[str],
+    start: datetime | None = None,
+    stop: datetime | None = None,
+    aggregate_every: str | None = None,
+    aggregate_fn: str = "last",
+    columnar: bool = False,
+) -> dict[str, list] | dict[str, ColumnarSeries]:
+    """Read one series per tag value (e.g. every block) in a single Flux query.
+
+    Returns the records (or a ColumnarSeries if `columnar` is set) split per tag value,
+    in the order of `tag_values`.
     """
 
-    result = query_api.query(flux)
+    print(
+        f"InfluxDB: Reading data from bucket '{get_influx_bucket(bucket)}', measurement '{measurement}', field '{field}' for {tag_key} in {tag_values}"
+    )
+    client = get_influx_client()
+    ensure_bucket_exists(client, bucket)
+    query_api = client.query_api()
 
-    return [record for table in result for record in table.records]
+    tag_set = ", ".join(f'"{value}"' for value in tag_values)
+    tag_filters = [f"|> filter(fn: (r) => contains(value: r.{tag_key}, set: [{tag_set}]))"]
 
+    flux = _build_read_flux(bucket, measurement, field, start, stop, tag_filters, aggregate_every, aggregate_fn)
+
+    with influx_query_seconds.time(query="read_many_from_influx", window=aggregate_every or "raw"):
+        if columnar:
+            series = _query_columnar(query_api, flux, [tag_key])
+            return {value: series.select(series.tags[tag_key] == value) for value in tag_values}
+
+        result = query_api.query(flux)
+
+    # Each series (and so each tag value) comes back as its own table
+    records_by_tag_value: dict[str, list] = {value: [] for value in tag_values}
+    for table in result:
+        for record in table.records:
+            records_by_tag_value.setdefault(record.values.get(tag_key), []).append(record)
+
+    return records_by_tag_value
+
+
+# Process-wide cache in front of the read functions, shared by all page visitors.
+# The size is counted in records, so a few long ranges cannot push out everything else.
+QUERY_CACHE_MAX_RECORDS = 2_000_000
+# Windows touching "now" are still receiving data, keep them just long enough for
+# concurrent viewers to share one query
+QUERY_CACHE_OPEN_WINDOW_TTL = 60  # seconds
+
+
+def _result_size(result) -> int:
+    if isinstance(result, dict):
+        return sum(len(value) for value in result.values())
+    return len(result)
+
+
+_query_cache = LRUCache("influx_query", QUERY_CACHE_MAX_RECORDS, size_of=_result_size)
+
+
+def _duration_to_timedelta(duration: str) -> timedelta:
+    match = re.fullmatch(r"(\d+)(s|m|h|d|w)", duration)
+    if not match:
+        raise ValueError(f"Unsupported Flux duration '{duration}'")
+    amount, unit = int(match.group(1)), match.group(2)
+    return {
+        "s": timedelta(seconds=amount),
+        "m": timedelta(minutes=amount),
+        "h": timedelta(hours=amount),
+        "d": timedelta(days=amount),
+        "w": timedelta(weeks=amount),
+    }[unit]
+
+
+def _align_window(
+    start: datetime | None, stop: datetime | None, aggregate_every: str | None
+) -> tuple[datetime | None, datetime | None, bool]:
+    """Align start down and stop up to the aggregation window (1 minute for raw data).
+
+    Returns (start, stop, is_open) where is_open is True when the window reaches "now"
+    and may still receive new data.
+    """
+
+    step = _duration_to_timedelta(aggregate_every) if aggregate_every else timedelta(minutes=1)
+    epoch = datetime.fromtimestamp(0, tz=timezone.utc)
+    now = datetime.now(timezone.utc)
+
+    def floor(dt: datetime) -> datetime:
+        dt = dt.astimezone(timezone.utc)
+        return epoch + (dt - epoch) // step * step
+
+    aligned_start = floor(start) if start else None
+    aligned_stop = None
+    if stop:
+        aligned_stop = floor(stop)
+        if aligned_stop < stop.astimezone(timezone.utc):
+            aligned_stop += step
+
+    is_open = aligned_stop is None or aligned_stop > now
+    return aligned_start, aligned_stop, is_open
+
+
+def _read_cached(
+    read_fn, key: tuple, start: datetime | None, stop: datetime | None, aggregate_every: str | None, **kwargs
+):
+    aligned_start, aligned_stop, is_open = _align_window(start, stop, aggregate_every)
+    return _query_cache.get_or_compute(
+        (read_fn.__name__, *key, aligned_start, aligned_stop, aggregate_every),
+        lambda: read_fn(start=aligned_start, stop=aligned_stop, aggregate_every=aggregate_every, **kwargs),
+        ttl=QUERY_CACHE_OPEN_WINDOW_TTL if is_open else None,
+    )
+
+
+def read_from_influx_cached(
+    bucket: str,
+    measurement: str,
+    field: str,
+    start: datetime | None = None,
+    stop: datetime | None = None,
+    tags: dict = None,
+    aggregate_every: str | None = None,
+    aggregate_fn: str = "last",
+    columnar: bool = False,
+):
+    """Same as read_from_influx, but served from the process-wide query cache.
+
+    Closed historical windows are cached until evicted, windows reaching "now" get a short TTL.
+    """
+
+    return _read_cached(
+        read_from_influx,
+        (get_influx_bucket(bucket), measurement, field, tuple(sorted((tags or {}).items())), aggregate_fn, columnar),
+        start,
+        stop,
+        aggregate_every,
+        bucket=bucket,
+        measurement=measurement,
+        field=field,
+        tags=tags,
+        aggregate_fn=aggregate_fn,
+        columnar=columnar,
+    )
+
+
+def read_many_from_influx_cached(
+    bucket: str,
+    measurement: str,
+    field: str,
+    tag_key: str,
+    tag_values: list[str],
+    start: datetime | None = None,
+    stop: datetime | None = None,
+    aggregate_every: str | None = None,
+    aggregate_fn: str = "last",
+    columnar: bool = False,
+) -> dict[str, list] | dict[str, ColumnarSeries]:
+    """Same as read_many_from_influx, but served from the process-wide query cache."""
+
+    return _read_cached(
+        read_many_from_influx,
+        (get_influx_bucket(bucket), measurement, field, tag_key, tuple(tag_values), aggregate_fn, columnar),
+        start,
+        stop,
+        aggregate_every,
+        bucket=bucket,
+        measurement=measurement,
+        field=field,
+        tag_key=tag_key,
+        tag_values=tag_values,
+        aggregate_fn=aggregate_fn,
+        columnar=columnar,
+    )
+
+
+# Only export data older than this, so points that arrive a little late are not skipped
+CSV_EXPORT_SETTLE = timedelta(hours=1)
+# Columns of the Flux CSV that are not part of the export
+_CSV_EXPORT_SKIP_COLUMNS = {"", "result", "table", "_start", "_stop"}
+
+
+def _export_state_path(filename: Path) -> Path:
+    return filename.with_name(filename.name + ".state.json")
+
+
+@influx_query_seconds.time(query="export_influx_data_to_csv", window="raw")
+def export_influx_data_to_csv(bucket: str, measurement: str, field: str, filename: str | Path) -> int:
+    """Append the points written since the previous export to a CSV file. Returns the number of new rows.
+
+    The export covers everything up to CSV_EXPORT_SETTLE ago, but never past the oldest point
+    still queued in the writer, so points written late (e.g. after InfluxDB was down) are
+    exported with the next run. The end of the exported range, the size of the file and its
+    number of rows are kept in a sidecar state file ("<filename>.state.json"), written after
+    the appended rows are fsynced. Rows appended by an export that did not get to save its state
+    are cut off again by the next one. Without a state file, the whole bucket is exported again.
+    """
+
+    if not isinstance(filename, Path):
+        filename = Path(filename)
+    state_path = _export_state_path(filename)
+
+    state = None
+    if filename.exists() and state_path.exists():
+        state = json.loads(state_path.read_text())
+        if "size" not in state or filename.stat().st_size < state["size"]:
+            # From before sizes were kept, or the file was changed by something else
+            state = None
+    exported_until_ns = state["exported_until_ns"] if state else None
+
+    stop_ns = datetime_to_ns(datetime.now(timezone.utc) - CSV_EXPORT_SETTLE)
+    oldest_queued_ns = influx_writer.oldest_queued_ns(bucket)
+    if oldest_queued_ns is not None:
+        stop_ns = min(stop_ns, oldest_queued_ns)
 
-def write_all_influx_data_to_csv(bucket: str, measurement: str, field: str, filename: str | Path):
     print(
         f"InfluxDB: Exporting data from bucket '{get_influx_bucket(bucket)}', measurement '{measurement}', field '{field}' to '{filename}'"
+        + (" (full export)" if exported_until_ns is None else "")
     )
+    if exported_until_ns is not None and exported_until_ns >= stop_ns:
+        return 0
+
     client = get_influx_client()
     ensure_bucket_exists(client, bucket)
     query_api = client.query_api()
 
+    # range() is [start, stop), so consecutive exports neither overlap nor leave gaps
     flux = f"""
     from(bucket: "{get_influx_bucket(bucket)}")
-      |> range(start: 0)
+      |> range(start: time(v: {exported_until_ns if exported_until_ns is not None else 0}), stop: time(v: {stop_ns}))
       {f'|> filter(fn: (r) => r._measurement == "{measurement}")' if measurement else ''}
       {f'|> filter(fn: (r) => r._field == "{field}")' if field else ''}
+      |> group()
     """
 
-    result = query_api.query_csv(flux)
+    rows = query_api.query_csv(flux, dialect=Dialect(header=True, annotations=[]))
 
-    if not isinstance(filename, Path):
-        filename = Path(filename)
+    columns = None
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    if state:
+        with open(filename, newline="") as f:
+            columns = next(csv.reader(f), None)
+        os.truncate(filename, state["size"])
 
-    results_as_values = result.to_values()
+    count = 0
+    with open(filename, "a" if state else "w", newline="") as f:
+        writer = csv.writer(f)
 
-    filename.parent.mkdir(parents=True, exist_ok=True)
-    filename.write_text("\n".join([",".join(x) for x in results_as_values]))
+        column_idx = None
+        for row in rows:
+            if len(row) > 1 and row[1] == "result":
+                # Header row, repeated by InfluxDB whenever the table schema changes
+                if columns is None:
+                    columns = [column for column in row if column not in _CSV_EXPORT_SKIP_COLUMNS]
+                    writer.writerow(columns)
+                column_idx = [row.index(column) if column in row else None for column in columns]
+                continue
+
+            writer.writerow(["" if i is None else row[i] for i in column_idx])
+            count += 1
+
+        f.flush()
+        os.fsync(f.fileno())
+        size = os.fstat(f.fileno()).st_size
 
-    return len(results_as_values)  # Return the count
+    fd, tmp_path = tempfile.mkstemp(dir=filename.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"exported_until_ns": stop_ns, "size": size, "rows": (state["rows"] if state else 0) + count}, f)
+    os.replace(tmp_path, state_path)
+
+    return count
 
 
 def get_datetime_of_extreme(bucket: str, measurement: str, extreme: Literal["first", "last"]) -> datetime | None:
@@ -169,10 +848,87 @@ def get_datetime_of_extreme(bucket: str, measurement: str, extreme: Literal["fir
       |> {extreme}()
     """
 
-    result = query_api.query(flux)
+    with influx_query_seconds.time(query=f"get_datetime_of_extreme_{extreme}", window="all"):
+        result = query_api.query(flux)
 
     if result:
         # Extract the last timestamp from the result
         for table in result:
             for record in table.records:
                 return record.get_time()
+
+
+def get_datetime_of_extreme_per_tag(
+    bucket: str, measurement: str, tag_key: str, extreme: Literal["first", "last"]
+) -> dict[str, datetime]:
+    """Timestamp of the oldest or newest point of every value of `tag_key`, e.g. per block."""
+
+    client = get_influx_client()
+    ensure_bucket_exists(client, bucket)
+    query_api = client.query_api()
+
+    # first()/last() runs per series (tag set and field), then the extreme of those is kept per tag value
+    flux = f"""
+    from(bucket: "{get_influx_bucket(bucket)}")
+      |> range(start: 0)
+      |> filter(fn: (r) => r._measurement == "{measurement}")
+      |> {extreme}()
+      |> group(columns: ["{tag_key}"])
+      |> {"min" if extreme == "first" else "max"}(column: "_time")
+    """
+
+    with influx_query_seconds.time(query=f"get_datetime_of_extreme_per_tag_{extreme}", window="all"):
+        tables = query_api.query(flux)
+
+    extreme_by_tag: dict[str, datetime] = {}
+    for table in tables:
+        for record in table.records:
+            tag_value = record.values.get(tag_key)
+            if tag_value is not None:
+                extreme_by_tag[tag_value] = record.get_time()
+    return extreme_by_tag
+
+
+def get_last_datetime_per_tag(bucket: str, measurement: str, tag_key: str) -> dict[str, datetime]:
+    """Timestamp of the newest point of every value of `tag_key`, e.g. per block."""
+    return get_datetime_of_extreme_per_tag(bucket, measurement, tag_key, "last")
+
+
+# Bounded pool for running the blocking InfluxDB client from async page handlers, so a slow
+# query never blocks the event loop and concurrent users do not serialize on each other
+QUERY_POOL_MAX_WORKERS = 4
+QUERY_TIMEOUT = 30  # seconds
+
+_query_pool = ThreadPoolExecutor(max_workers=QUERY_POOL_MAX_WORKERS, thread_name_prefix="influx-query")
+
+
+async def _run_in_query_pool(fn, *args, timeout: float | None = QUERY_TIMEOUT, **kwargs):
+    """Run a blocking read in the query pool.
+
+    Raises asyncio.TimeoutError after `timeout` seconds. When the awaiting task is cancelled
+    (e.g. the browser disconnected), a query that has not started yet is dropped from the pool
+    queue, and the result of one already running is discarded.
+    """
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_query_pool, functools.partial(fn, *args, **kwargs))
+    return await asyncio.wait_for(future, timeout)
+
+
+async def read_from_influx_async(*args, timeout: float | None = QUERY_TIMEOUT, **kwargs):
+    """Async variant of read_from_influx_cached."""
+    return await _run_in_query_pool(read_from_influx_cached, *args, timeout=timeout, **kwargs)
+
+
+async def read_many_from_influx_async(
+    *args, timeout: float | None = QUERY_TIMEOUT, **kwargs
+) -> dict[str, list] | dict[str, ColumnarSeries]:
+    """Async variant of read_many_from_influx_cached."""
+    return await _run_in_query_pool(read_many_from_influx_cached, *args, timeout=timeout, **kwargs)
+
+
+async def get_datetime_of_extreme_async(
+    bucket: str, measurement: str, extreme: Literal["first", "last"], timeout: float | None = QUERY_TIMEOUT
+) -> datetime | None:
+    """Async variant of get_datetime_of_extreme."""
+    return await _run_in_query_pool(get_datetime_of_extreme, bucket, measurement, extreme, timeout=timeout)
@@ -1 +1,7 @@
-from . import reactor_operating_data_job
+from . import reactor_operating_data_job, umm_job
+from .scheduler import scheduler
+
+
+def start():
+    """Start running the scheduled jobs in the background."""
+    scheduler.start()
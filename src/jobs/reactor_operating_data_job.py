@@ -1,30 +1,55 @@
 import http.client
-import json
 import os
-import threading
 import time
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterator
 
-from bs4 import BeautifulSoup
+import numpy as np
 from influxdb_client.client.write.point import Point
-from requests import Session
 
+from dashboard import precompute_dashboard_payloads
+from high_water_marks import ingest_high_water_marks
+from http_cache import CachedResponse, http_cache
 from influxdb import (
-    get_datetime_of_extreme,
-    write_all_influx_data_to_csv,
-    write_to_influx,
+    ROLLUP_EVERY,
+    export_influx_data_to_csv,
+    get_datetime_of_extreme_per_tag,
+    get_last_datetime_per_tag,
+    influx_writer,
+    read_from_influx,
+    read_many_from_influx,
+    update_rollup,
 )
 from models.reactor import (
     REACTOR_OPERATING_DATA_BUCKET,
     REACTOR_OPERATING_DATA_MEASUREMENT,
 )
 from models.reactor_operating_data import PowerPlantData
+from parquet_export import (
+    PARQUET_EXPORT_SETTLE,
+    ParquetExportState,
+    align_fields,
+    iter_months,
+    month_start_of,
+    partition_path,
+    write_partition,
+)
+from timestamps import datetime_to_ns
+from series_store import SERIES_STORE_RETENTION, series_store
+from vattenfall_page import extract_power_plant_data
+
+from .scheduler import scheduler
 
-from .every import every
 
+@contextmanager
+def get_reactor_operating_data() -> Iterator[tuple[list[PowerPlantData] | None, CachedResponse]]:
+    """Fetch and parse the current production of all blocks. Yields None if the page is unchanged.
+
+    Commit the yielded page once the data is stored, until then the next fetch parses it again.
+    """
 
-def get_reactor_operating_data() -> list[PowerPlantData]:
     DATA_URL = "https://group.vattenfall.com/se/var-verksamhet/vara-energislag/karnkraft/aktuell-karnkraftsproduktion"
     headers = {
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4.1 Safari/605.1.15",
@@ -34,46 +59,110 @@ def get_reactor_operating_data() -> list[PowerPlantData]:
         "Upgrade-Insecure-Requests": "1",
     }
 
-    session = Session()
-    page = session.get(DATA_URL, headers=headers)
-    soup = BeautifulSoup(page.content, "html.parser")
-    script_tags_with_json = soup.find_all("script", {"type": "application/json"})
-    json_contents = [tag.get_text() for tag in script_tags_with_json]
+    with http_cache.fetch(DATA_URL, headers=headers) as page:
+        if not page.changed:
+            yield None, page
+            return
+        yield extract_power_plant_data(page.read_bytes()), page
+
 
-    power_plant_data_list: list[PowerPlantData] = []
-    for json_content in json_contents:
-        if not json_content:
+def _parse_queued_points(lines: list[str]) -> Iterator[tuple[str, int, float, float]]:
+    """(block, time_ns, MW, percent) of the queued line protocol written by store_power_plant_data."""
+
+    for line in lines:
+        series, _, rest = line.partition(" ")
+        field_set, _, timestamp = rest.rpartition(" ")
+        tags = dict(tag.split("=", 1) for tag in series.split(",")[1:] if "=" in tag)
+        fields = dict(field.split("=", 1) for field in field_set.split(",") if "=" in field)
+        # Lines cut short by a crash are left out
+        if "block" not in tags or "MW" not in fields or not timestamp.isdigit():
             continue
+        yield (
+            tags["block"],
+            int(timestamp),
+            float(fields["MW"].rstrip("i")),
+            float(fields.get("percent", "nan").rstrip("i")),
+        )
 
-        parsed_json = json.loads(json_content)
-        if isinstance(parsed_json, list):
-            power_plant_data_list.extend(PowerPlantData.from_dict(item) for item in parsed_json)
-        else:
-            power_plant_data_list.append(PowerPlantData.from_dict(parsed_json))
 
-    return power_plant_data_list
+def warm_series_store():
+    print("Warming in-memory series store from InfluxDB 🕒")
+    covered_from = datetime.now(timezone.utc) - SERIES_STORE_RETENTION
 
+    values_by_field: dict[str, dict[tuple[str, datetime], float]] = {}
+    for field in ("MW", "percent"):
+        records = read_from_influx(
+            REACTOR_OPERATING_DATA_BUCKET,
+            REACTOR_OPERATING_DATA_MEASUREMENT,
+            field,
+            start=covered_from,
+        )
+        values_by_field[field] = {
+            (record.values.get("block"), record.get_time()): record.get_value() for record in records
+        }
+
+    points_by_block: dict[str, list[tuple[int, float, float]]] = {}
+    for (block, point_time), mw in values_by_field["MW"].items():
+        percent = values_by_field["percent"].get((block, point_time), float("nan"))
+        points_by_block.setdefault(block, []).append((datetime_to_ns(point_time), mw, percent))
+
+    # Points still queued for InfluxDB are not in the bucket yet, nor ever appended again
+    queued_lines = influx_writer.queued_lines(REACTOR_OPERATING_DATA_BUCKET)
+    for block, time_ns, mw, percent in _parse_queued_points(queued_lines):
+        points_by_block.setdefault(block, []).append((time_ns, mw, percent))
+
+    count = series_store.warm(
+        {
+            block: (
+                np.array([time_ns for time_ns, _, _ in points], dtype=np.int64),
+                np.array([mw for _, mw, _ in points], dtype=np.float64),
+                np.array([percent for _, _, percent in points], dtype=np.float64),
+            )
+            for block, points in points_by_block.items()
+        },
+        covered_from,
+    )
+    print(f"Warmed in-memory series store with {count} datapoints 🟢")
+
+
+def ingest_reactor_operating_data():
+    if not series_store.is_warm:
+        try:
+            warm_series_store()
+        except Exception as e:
+            print(f"Could not warm in-memory series store 🔴: {e}")
 
-def reactor_operating_data_job():
     print("Fetching reactor operating data 🕒")
     try:
-        power_plant_data_list = get_reactor_operating_data()
+        with get_reactor_operating_data() as (power_plant_data_list, page):
+            if power_plant_data_list is None:
+                print("Reactor operating data unchanged since the previous fetch 🔵")
+                return
+            store_power_plant_data(power_plant_data_list)
+            # The page is only cached as seen once its points are stored
+            page.commit()
 
     except http.client.RemoteDisconnected as e:
         print(f"Datapoint not added 🔴")
         print(f"Error: {e}")
-        return
 
-    points: list[Point] = []
 
-    datetime_of_last = get_datetime_of_extreme(
-        REACTOR_OPERATING_DATA_BUCKET,
-        REACTOR_OPERATING_DATA_MEASUREMENT,
-        "last",
-    )
-    if datetime_of_last is None:
-        datetime_of_last = datetime.fromtimestamp(0)
-    print(f"Latest data in InfluxDB: {datetime_of_last} (from '{REACTOR_OPERATING_DATA_BUCKET}')")
+def load_high_water_marks():
+    if not ingest_high_water_marks.is_loaded:
+        ingest_high_water_marks.load(
+            lambda: get_last_datetime_per_tag(
+                REACTOR_OPERATING_DATA_BUCKET,
+                REACTOR_OPERATING_DATA_MEASUREMENT,
+                "block",
+            )
+        )
+
+
+def store_power_plant_data(power_plant_data_list: list[PowerPlantData]):
+    load_high_water_marks()
+
+    points: list[Point] = []
+    new_block_values: list[tuple[str, datetime, float, float]] = []
 
     for power_plant_data in power_plant_data_list:
         for block in power_plant_data.blockProductionDataList:
@@ -90,14 +179,10 @@ def reactor_operating_data_job():
                 )
             )
 
-            # if datetime_of_last has no timezone, set it to the same as point_datetime
-            if datetime_of_last.tzinfo is None:
-                datetime_of_last = datetime_of_last.replace(tzinfo=point_datetime.tzinfo)
-                print(f"Warning: datetime_of_last had no timezone, setting to {datetime_of_last.tzinfo}")
-
-            # Check if the point already exists in InfluxDB
-            if point_datetime.replace(microsecond=0) > datetime_of_last.replace(microsecond=0):
+            # Check against the newest point already written for this block
+            if ingest_high_water_marks.is_new(block.name, point_datetime):
                 points.append(point)
+                new_block_values.append((block.name, point_datetime, block.production, block.percent))
                 print(
                     f"Adding datapoint 🟢 {block.name}: {power_plant_data.timestamp}, {block.production:.0f} {block.unit}, {block.percent:.1f} %"
                 )
@@ -110,20 +195,130 @@ def reactor_operating_data_job():
     if len(points) == 0:
         print("No new data to write to InfluxDB 🔵")
         return
-    print(f"Writing {len(points)} new datapoints to InfluxDB 🟢")
-    write_to_influx(points, REACTOR_OPERATING_DATA_BUCKET)
+    # Queued for the batching writer, which keeps the points on disk until InfluxDB accepts them
+    print(f"Queueing {len(points)} new datapoints for InfluxDB 🟢")
+    influx_writer.write(points, REACTOR_OPERATING_DATA_BUCKET)
+    ingest_high_water_marks.advance(
+        (block_name, point_datetime) for block_name, point_datetime, _, _ in new_block_values
+    )
 
+    # Keep the in-memory series store in sync with what was just written
+    for block_name, point_datetime, production, percent in new_block_values:
+        series_store.append(block_name, point_datetime, production, percent)
 
-def export_all_data_job():
-    print("Export all data 🕒")
 
+def reactor_operating_data_job():
+    ingest_reactor_operating_data()
+
+    # Have the common dashboard ranges ready before anyone asks for them
+    try:
+        precompute_dashboard_payloads()
+    except Exception as e:
+        print(f"Could not precompute dashboard payloads 🔴: {e}")
+
+
+def rollup_job():
+    print("Updating reactor operating data rollups 🕒")
+    for rollup_every in ROLLUP_EVERY:
+        boundary = update_rollup(REACTOR_OPERATING_DATA_BUCKET, REACTOR_OPERATING_DATA_MEASUREMENT, rollup_every)
+        print(f"Rollup '{rollup_every}' complete up to {boundary} 🟢")
+
+
+def export_csv():
     filepath = Path("data_export/reactor_operating_data_export.csv")
 
-    count = write_all_influx_data_to_csv(
+    count = export_influx_data_to_csv(
         REACTOR_OPERATING_DATA_BUCKET, REACTOR_OPERATING_DATA_MEASUREMENT, "MW", filepath
     )
 
-    print(f"Exported data {count} data points to file {filepath} 🟢")
+    print(f"Exported {count} new data points to file {filepath} 🟢")
+
+
+def export_parquet():
+    root = Path("data_export/reactor_operating_data_parquet")
+
+    state = ParquetExportState.load(root)
+
+    # The newest point per block, as ingested
+    load_high_water_marks()
+    last_per_block = ingest_high_water_marks.all()
+
+    new_blocks = [block for block in last_per_block if state is None or block not in state.final_until]
+    if new_blocks:
+        # Once per block, its export starts at the month of its first point
+        first_per_block = get_datetime_of_extreme_per_tag(
+            REACTOR_OPERATING_DATA_BUCKET, REACTOR_OPERATING_DATA_MEASUREMENT, "block", "first"
+        )
+        if state is None and first_per_block:
+            state = ParquetExportState(first=min(first_per_block.values()))
+        for block in new_blocks:
+            # Not in the bucket yet while all its points are queued, picked up by a later export
+            if state is not None and block in first_per_block:
+                state.first = min(state.first, first_per_block[block])
+                state.final_until[block] = month_start_of(first_per_block[block])
+    if state is None:
+        print("No data to export to Parquet 🔵")
+        return
+
+    now = datetime.now(timezone.utc)
+    oldest_queued_ns = influx_writer.oldest_queued_ns(REACTOR_OPERATING_DATA_BUCKET)
+
+    count = 0
+    for month_start, month_stop in iter_months(state.first, now):
+        # Each block from its first month that can still change, up to its newest point, so a
+        # new block does not rewrite the closed months of the others
+        blocks = sorted(
+            block
+            for block, last in last_per_block.items()
+            if block in state.final_until and state.final_until[block] <= month_start <= last
+        )
+        if not blocks:
+            continue
+
+        series_by_field = {
+            field: read_many_from_influx(
+                REACTOR_OPERATING_DATA_BUCKET,
+                REACTOR_OPERATING_DATA_MEASUREMENT,
+                field,
+                tag_key="block",
+                tag_values=blocks,
+                start=month_start,
+                stop=month_stop,
+                columnar=True,
+            )
+            for field in ("MW", "percent")
+        }
+        for block in blocks:
+            mw, percent = series_by_field["MW"][block], series_by_field["percent"][block]
+            # Blocks without data in a month get an empty partition, so the month can be closed
+            write_partition(
+                partition_path(root, block, month_start),
+                *align_fields((mw.times, mw.values), (percent.times, percent.values)),
+            )
+            count += 1
+
+        # Closed once the month is over, late data has settled and none is still queued for it
+        if now >= month_stop + PARQUET_EXPORT_SETTLE and (
+            oldest_queued_ns is None or oldest_queued_ns >= datetime_to_ns(month_stop)
+        ):
+            for block in blocks:
+                state.final_until[block] = month_stop
+
+    state.save(root)
+    print(f"Exported {count} Parquet partitions to {root} 🟢")
+
+
+# Comma separated, "csv" and/or "parquet"
+EXPORT_FORMATS = os.getenv("EXPORT_FORMATS", "csv,parquet").split(",")
+
+
+def export_all_data_job():
+    print("Export all data 🕒")
+
+    if "csv" in EXPORT_FORMATS:
+        export_csv()
+    if "parquet" in EXPORT_FORMATS:
+        export_parquet()
 
 
 # Check if the NO_FETCH_REACTOR_DATA=1 environment variable is set.
@@ -131,13 +326,10 @@ if os.getenv("NO_FETCH_REACTOR_DATA") == "1":
     print("Skipping reactor operating data fetch 🔴")
 else:
     REFRESH_INTERVAL_FETCH_DATA = 3 * 60  # Every 3 minutes
-    threading.Thread(
-        target=lambda: every(REFRESH_INTERVAL_FETCH_DATA, reactor_operating_data_job),
-        daemon=True,
-    ).start()
+    scheduler.add("reactor_operating_data", reactor_operating_data_job, REFRESH_INTERVAL_FETCH_DATA, timeout=2 * 60)
+
+    REFRESH_INTERVAL_ROLLUP_DATA = 10 * 60  # Every 10 minutes
+    scheduler.add("rollup", rollup_job, REFRESH_INTERVAL_ROLLUP_DATA, timeout=5 * 60)
 
     REFRESH_INTERVAL_EXPORT_DATA = 1 * 60 * 60  # Every 1 hour
-    threading.Thread(
-        target=lambda: every(REFRESH_INTERVAL_EXPORT_DATA, export_all_data_job),
-        daemon=True,
-    ).start()
+    scheduler.add("export_all_data", export_all_data_job, REFRESH_INTERVAL_EXPORT_DATA, timeout=30 * 60)
@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Literal
+
+from metrics import job_last_success, job_runs, job_seconds
+
+# Every job runs on at most one worker at a time, and the pool has a worker per job scheduled
+# when it starts, so a hung job can never hold up another one. The spare workers are for jobs
+# scheduled later.
+SCHEDULER_SPARE_WORKERS = 2
+
+JobState = Literal["pending", "running", "ok", "failed", "timeout"]
+
+
+@dataclass(frozen=True)
+class JobStatus:
+    name: str
+    interval: float  # seconds
+    state: JobState
+    running: bool
+    last_started: datetime | None
+    last_duration: float | None  # seconds, of the last finished run
+    last_error: str | None
+    next_run: datetime | None  # None while running, the next run is planned once it finishes
+    runs: int
+    failures: int
+
+
+class _Job:
+    def __init__(self, name: str, task: Callable[[], None], interval: float, timeout: float | None, jitter: float):
+        self.name = name
+        self.task = task
+        self.interval = interval
+        self.timeout = timeout
+        self.jitter = jitter
+
+        self.scheduled_at = 0.0  # Monotonic time of the next run, without jitter
+        self.next_run = 0.0  # Monotonic time of the next run
+        self.running = False
+        self.started_at: float | None = None  # Monotonic
+        self.last_started: datetime | None = None
+        self.last_duration: float | None = None
+        self.last_error: str | None = None
+        self.state: JobState = "pending"
+        self.runs = 0
+        self.failures = 0
+
+    def plan(self, scheduled_at: float):
+        self.scheduled_at = scheduled_at
+        self.next_run = scheduled_at + random.uniform(0, self.jitter)
+
+
+class Scheduler:
+    """Runs periodic jobs from one dispatcher thread on a bounded worker pool.
+
+    - A job is never started again while its previous run is still going.
+    - Runs are spread by a random jitter, and missed runs are skipped rather than run back to back.
+    - Timeouts are not enforced. A run exceeding its timeout is only reported as "timeout", as
+      Python threads cannot be killed, and the job is started again once that run returns. Job
+      bodies bound their own network and database calls with request timeouts instead.
+    """
+
+    def __init__(self, spare_workers: int = SCHEDULER_SPARE_WORKERS):
+        self.spare_workers = spare_workers
+        self._jobs: dict[str, _Job] = {}
+        self._condition = threading.Condition()
+        self._pool: ThreadPoolExecutor | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+
+    def add(
+        self,
+        name: str,
+        task: Callable[[], None],
+        interval: float,
+        timeout: float | None = None,
+        jitter: float | None = None,
+    ):
+        """Run `task` every `interval` seconds, starting as soon as the scheduler is started.
+
+        The jitter defaults to 5 % of the interval.
+        """
+
+        with self._condition:
+            assert name not in self._jobs, f"Job '{name}' is already scheduled"
+            job = _Job(name, task, interval, timeout, 0.05 * interval if jitter is None else jitter)
+            job.plan(time.monotonic())
+            self._jobs[name] = job
+            self._condition.notify()
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._pool = ThreadPoolExecutor(
+                max_workers=len(self._jobs) + self.spare_workers, thread_name_prefix="job"
+            )
+            self._thread = threading.Thread(target=self._dispatch, name="job-scheduler", daemon=True)
+            self._thread.start()
+        print(f"Started job scheduler with {len(self._jobs)} jobs 🟢")
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch(self):
+        with self._condition:
+            while not self._stopped:
+                now = time.monotonic()
+                wait = None
+                for job in self._jobs.values():
+                    if job.running:
+                        if job.timeout is not None and job.state == "running" and now - job.started_at > job.timeout:
+                            job.state = "timeout"
+                            job_runs.inc(job=job.name, status="timeout")
+                            print(f"Job '{job.name}' has been running for more than {job.timeout:g} s 🔴")
+                        continue
+
+                    if job.next_run <= now:
+                        job.running = True
+                        job.state = "running"
+                        job.started_at = now
+                        job.last_started = datetime.now(timezone.utc)
+                        self._pool.submit(self._run, job)
+                        continue
+
+                    wait = job.next_run - now if wait is None else min(wait, job.next_run - now)
+
+                # Wake up in time for the next run, and now and then to check for timeouts
+                self._condition.wait(timeout=min(wait, 1.0) if wait is not None else 1.0)
+
+    def _run(self, job: _Job):
+        error = None
+        try:
+            job.task()
+        except Exception as e:
+            traceback.print_exc()
+            error = f"{type(e).__name__}: {e}"
+
+        with self._condition:
+            finished_at = time.monotonic()
+            job.last_duration = finished_at - job.started_at
+            job_seconds.observe(job.last_duration, job=job.name)
+            job.last_error = error
+            job.runs += 1
+            if error is not None:
+                job.failures += 1
+            else:
+                job_last_success.set(time.time(), job=job.name)
+            # A run that timed out stays reported (and counted) as such, even if it eventually succeeded
+            if job.state != "timeout":
+                job.state = "failed" if error is not None else "ok"
+                job_runs.inc(job=job.name, status=job.state)
+            job.running = False
+
+            # Skip runs missed while this one was running
+            behind = max(0.0, finished_at - job.scheduled_at)
+            job.plan(job.scheduled_at + (behind // job.interval + 1) * job.interval)
+            self._condition.notify()
+
+    def status(self) -> list[JobStatus]:
+        with self._condition:
+            now_monotonic = time.monotonic()
+            now = datetime.now(timezone.utc)
+            return [
+                JobStatus(
+                    name=job.name,
+                    interval=job.interval,
+                    state=job.state,
+                    running=job.running,
+                    last_started=job.last_started,
+                    last_duration=job.last_duration,
+                    last_error=job.last_error,
+                    next_run=(
+                        None
+                        if job.running
+                        else datetime.fromtimestamp(now.timestamp() + job.next_run - now_monotonic, tz=timezone.utc)
+                    ),
+                    runs=job.runs,
+                    failures=job.failures,
+                )
+                for job in self._jobs.values()
+            ]
+
+
+scheduler = Scheduler()
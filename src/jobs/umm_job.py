@@ -0,0 +1,34 @@
+import os
+from dataclasses import replace
+from datetime import datetime, timezone
+
+from umm_store import UmmSnapshot, get_umm_snapshot, publish_umm_snapshot, umm_store
+
+from .scheduler import scheduler
+
+
+def umm_refresh_job():
+    snapshot = get_umm_snapshot()
+    if snapshot.last_success is None and not snapshot.events:
+        # Serve what the local store already has while the first sync runs
+        publish_umm_snapshot(UmmSnapshot.from_events(umm_store.load_events(), last_success=umm_store.last_sync))
+
+    print("Refreshing UMM messages 🕒")
+    try:
+        count = umm_store.sync()
+        events = umm_store.load_events()
+    except Exception as e:
+        print(f"UMM refresh failed 🔴: {e}")
+        publish_umm_snapshot(replace(get_umm_snapshot(), error=str(e)))
+        raise
+
+    publish_umm_snapshot(UmmSnapshot.from_events(events, last_success=datetime.now(timezone.utc)))
+    print(f"Fetched {count} UMM messages, {len(events)} UMM events available 🟢")
+
+
+# Check if the NO_FETCH_UMM_DATA=1 environment variable is set.
+if os.getenv("NO_FETCH_UMM_DATA") == "1":
+    print("Skipping UMM fetch 🔴")
+else:
+    REFRESH_INTERVAL_UMM = 5 * 60  # Every 5 minutes
+    scheduler.add("umm_refresh", umm_refresh_job, REFRESH_INTERVAL_UMM, timeout=4 * 60)
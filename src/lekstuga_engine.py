@@ -0,0 +1,313 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from cache import LRUCache
+
+try:
+    import numba
+except ImportError:  # Optional (requirements-optional.txt), the NumPy step loop gives the same result up to float rounding
+    numba = None
+
+MAX_AGE = 4  # years
+CYCLE_LENGTH = 1  # years
+NUMBER_OF_STEPS = 20
+BURNUP_STEP_SIZE = CYCLE_LENGTH / NUMBER_OF_STEPS
+
+
+def kinf_curve(burnup: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    # Burnup is given in years. First it should go up until the first year, then down, roughly.
+    # The only definition of the curve: -0.4 * sqrt(exp(-burnup / 0.4)) + 1.45 - burnup * 0.15,
+    # evaluated step by step into `out` (not `burnup` itself), so the step loops allocate nothing.
+    # Outputs are passed positionally, which numba compiles too.
+    if out is None:
+        out = np.empty(np.shape(burnup))
+    np.divide(burnup, -0.4, out)
+    np.exp(out, out)
+    np.sqrt(out, out)
+    # -0.4 * sqrt(...) - 0.15 * burnup, without a second buffer for 0.15 * burnup
+    np.multiply(out, 0.4 / 0.15, out)
+    np.add(out, burnup, out)
+    np.multiply(out, -0.15, out)
+    np.add(out, 1.45, out)
+    return out
+
+
+# import matplotlib.pyplot as plt
+
+# plt.plot(np.linspace(0, MAX_AGE, 100), [kinf_curve(bu) for bu in np.linspace(0, MAX_AGE, 100)])
+# plt.savefig("kinf_curve.png")
+# plt.close()
+
+power_kernel = np.array([[0.04, 0.08, 0.04], [0.08, 0.36, 0.08], [0.04, 0.08, 0.04]])
+power_kernel = power_kernel / np.sum(power_kernel)  # Normalize
+
+
+@dataclass(frozen=True)
+class AgeCount:
+    age: int
+    count: int
+
+
+@dataclass(frozen=True)
+class BurnupStepData:
+    burnup: float
+    burnup_map: np.ndarray
+    kinf_map: np.ndarray
+    power_map: np.ndarray
+    leakage: float
+    # sdm_map: np.ndarray
+
+
+@dataclass(frozen=True)
+class AnalysisData:
+    """Shared between all visitors through the analysis cache, the maps are read-only."""
+
+    age_counts: tuple[AgeCount, ...]
+    total_fuel_elements: int
+    burnup_step_data: tuple[BurnupStepData, ...]
+
+
+@dataclass(frozen=True)
+class CoreGeometry:
+    """Where the fuel is, worked out once per core instead of on every burnup step.
+
+    The step loop only works on the fuel positions, as flat vectors in row-major order.
+    """
+
+    fuel: np.ndarray  # bool (rows, cols)
+    fuel_count: int
+    # (fuel_count, fuel_count): power = stencil @ kinf. The 3x3 power kernel around every
+    # position, with empty positions contributing nothing, like the zero-filled convolve2d.
+    stencil: np.ndarray
+    # Times every position is counted in the outer ring of the map. Positions of a map one
+    # position wide are counted twice, as the leakage has always been summed over the rows and
+    # columns of the ring.
+    ring_weights: np.ndarray
+
+    @classmethod
+    def from_fuel_mask(cls, fuel: np.ndarray) -> "CoreGeometry":
+        fuel = np.array(fuel, dtype=bool)
+        rows, cols = fuel.shape
+        fuel_rows, fuel_cols = np.nonzero(fuel)
+
+        # Position number of every fuel position, -1 where there is no fuel
+        number = np.full((rows + 2, cols + 2), -1)
+        number[1:-1, 1:-1][fuel] = np.arange(len(fuel_rows))
+
+        stencil = np.zeros((len(fuel_rows), len(fuel_rows)))
+        for i in range(3):
+            for j in range(3):
+                # convolve2d flips the kernel: kernel[i, j] weighs the neighbour at (r + 1 - i, c + 1 - j)
+                neighbours = number[fuel_rows + 2 - i, fuel_cols + 2 - j]
+                has_fuel = neighbours >= 0
+                stencil[np.nonzero(has_fuel)[0], neighbours[has_fuel]] += power_kernel[i, j]
+
+        ring = np.zeros(fuel.shape)
+        ring[0, :] += 1
+        ring[-1, :] += 1
+        ring[1:-1, 0] += 1
+        ring[1:-1, -1] += 1
+
+        geometry = cls(fuel=fuel, fuel_count=len(fuel_rows), stencil=stencil, ring_weights=ring[fuel])
+        # Shared between all analyses of the core
+        for array in (geometry.fuel, geometry.stencil, geometry.ring_weights):
+            array.setflags(write=False)
+        return geometry
+
+
+# The layout of a scenario never changes, only the fuel ages do
+_core_geometries = LRUCache("lekstuga_core_geometry", 32)
+
+
+def get_core_geometry(fuel: np.ndarray) -> CoreGeometry:
+    fuel = np.asarray(fuel, dtype=bool)
+    return _core_geometries.get_or_compute((fuel.shape, fuel.tobytes()), lambda: CoreGeometry.from_fuel_mask(fuel))
+
+
+@dataclass(frozen=True)
+class DepletionResult:
+    burnup: np.ndarray  # (steps, rows, cols), NaN where there is no fuel
+    kinf: np.ndarray
+    power: np.ndarray  # Normalized to a core average of 1
+    leakage: np.ndarray  # (steps,), percent of the power produced on the outer ring
+
+
+def _deplete_numpy(burnup, kinf, power, stencil, step_size):
+    """Fill the (steps, fuel_count) stacks in place."""
+
+    steps, fuel_count = burnup.shape
+    term = np.empty(fuel_count)
+
+    for s in range(steps):
+        b = burnup[s]
+        if s > 0:
+            # Increase burnup based on previous power map
+            np.multiply(power[s - 1], step_size, out=term)
+            np.add(burnup[s - 1], term, out=b)
+
+        kinf_curve(b, kinf[s])
+
+        p = power[s]
+        np.matmul(stencil, kinf[s], out=p)
+        # Normalize power map
+        np.divide(p, p.sum() / fuel_count, out=p)
+
+
+# kinf_curve compiled for the numba step loop
+_kinf_curve = numba.njit(cache=True)(kinf_curve) if numba is not None else kinf_curve
+
+
+def _deplete_loops(burnup, kinf, power, stencil, step_size):
+    """Same as _deplete_numpy as explicit loops, for numba to compile."""
+
+    steps, fuel_count = burnup.shape
+    for s in range(steps):
+        if s > 0:
+            for a in range(fuel_count):
+                burnup[s, a] = burnup[s - 1, a] + step_size * power[s - 1, a]
+        _kinf_curve(burnup[s], kinf[s])
+
+        total = 0.0
+        for a in range(fuel_count):
+            value = 0.0
+            for n in range(fuel_count):
+                value += stencil[a, n] * kinf[s, n]
+            power[s, a] = value
+            total += value
+
+        mean = total / fuel_count
+        for a in range(fuel_count):
+            power[s, a] /= mean
+
+
+_DEPLETION_BACKENDS = {"numpy": _deplete_numpy}
+if numba is not None:
+    # Cached on disk for the next process
+    _DEPLETION_BACKENDS["numba"] = numba.njit(cache=True)(_deplete_loops)
+    # Compile (or load from the cache) at import, while the app starts, instead of on the first
+    # click, where it would block the event loop
+    _DEPLETION_BACKENDS["numba"](np.zeros((1, 1)), np.empty((1, 1)), np.empty((1, 1)), np.ones((1, 1)), 0.05)
+
+# Use numba when it is installed, it skips the per-operation overhead that dominates on maps this small
+LEKSTUGA_DEPLETION_BACKEND = "numba" if "numba" in _DEPLETION_BACKENDS else "numpy"
+
+
+def deplete(
+    burnup_boc: np.ndarray,
+    geometry: CoreGeometry,
+    steps: int = NUMBER_OF_STEPS,
+    step_size: float = BURNUP_STEP_SIZE,
+    backend: str | None = None,
+) -> DepletionResult:
+    """Run the burnup cycle from the BOC burnup map (in years, NaN where there is no fuel).
+
+    Each step derives kinf from burnup and the power from kinf smeared over the neighbouring
+    positions, then burns every position in proportion to its power.
+    """
+
+    burnup = np.empty((steps, geometry.fuel_count))
+    kinf = np.empty((steps, geometry.fuel_count))
+    power = np.empty((steps, geometry.fuel_count))
+    burnup[0] = burnup_boc[geometry.fuel]
+
+    if geometry.fuel_count > 0:
+        _DEPLETION_BACKENDS[backend or LEKSTUGA_DEPLETION_BACKEND](burnup, kinf, power, geometry.stencil, step_size)
+
+    # Leakage by summing power in outer ring vs total power, for all steps at once
+    total_power = power.sum(axis=1)
+    outer_ring_power = power @ geometry.ring_weights
+    leakage = np.zeros(steps)
+    np.divide(outer_ring_power, total_power, out=leakage, where=total_power > 0)
+    leakage *= 100
+
+    def unpack(values: np.ndarray) -> np.ndarray:
+        maps = np.full((steps, *geometry.fuel.shape), np.nan)
+        maps[:, geometry.fuel] = values
+        return maps
+
+    return DepletionResult(burnup=unpack(burnup), kinf=unpack(kinf), power=unpack(power), leakage=leakage)
+
+
+def calculate_analysis_data(fuel_age_map: np.ndarray) -> AnalysisData:
+    burnup_map_boc = np.array(fuel_age_map, dtype=float)  # Convert so that None gets NaN
+    fuel = ~np.isnan(burnup_map_boc)
+
+    # Add to age counts even ages with 0 count
+    counts = np.bincount(burnup_map_boc[fuel].astype(int), minlength=MAX_AGE + 1)
+    age_counts = tuple(AgeCount(age=age, count=int(counts[age])) for age in range(MAX_AGE + 1))
+
+    result = deplete(burnup_map_boc, get_core_geometry(fuel))
+    # The step maps are views of these
+    for maps in (result.burnup, result.kinf, result.power):
+        maps.setflags(write=False)
+
+    burnups = np.linspace(0, CYCLE_LENGTH, NUMBER_OF_STEPS)
+    burnup_step_data = tuple(
+        BurnupStepData(
+            burnup=float(burnups[s]),
+            burnup_map=result.burnup[s],
+            kinf_map=result.kinf[s],
+            power_map=result.power[s],
+            leakage=float(result.leakage[s]),
+        )
+        for s in range(NUMBER_OF_STEPS)
+    )
+
+    return AnalysisData(
+        age_counts=age_counts, total_fuel_elements=int(fuel.sum()), burnup_step_data=burnup_step_data
+    )
+
+
+# Every loading pattern is simulated at most once per process, for all visitors
+_analysis_cache = LRUCache("lekstuga_analysis", 1024)
+
+
+def canonical_fuel_age_map(fuel_age_map: np.ndarray) -> tuple[tuple, int]:
+    """Key of the loading pattern, the same for all four quarter-core rotations of a square map.
+
+    Returns (key, k), where the key describes np.rot90(fuel_age_map, k).
+    """
+
+    ages = np.array(fuel_age_map, dtype=float)
+    codes = np.where(np.isnan(ages), -1, ages).astype(np.int8)  # -1 where there is no fuel
+
+    # The power kernel and the outer ring look the same from all four sides of a square map,
+    # so rotating the map only rotates the results
+    rotations = range(4) if codes.shape[0] == codes.shape[1] else range(1)
+    return min(((codes.shape, np.rot90(codes, k).tobytes()), k) for k in rotations)
+
+
+def _rotate_analysis_data(analysis_data: AnalysisData, k: int) -> AnalysisData:
+    return AnalysisData(
+        age_counts=analysis_data.age_counts,
+        total_fuel_elements=analysis_data.total_fuel_elements,
+        burnup_step_data=tuple(
+            BurnupStepData(
+                burnup=step.burnup,
+                burnup_map=np.rot90(step.burnup_map, k),
+                kinf_map=np.rot90(step.kinf_map, k),
+                power_map=np.rot90(step.power_map, k),
+                leakage=step.leakage,
+            )
+            for step in analysis_data.burnup_step_data
+        ),
+    )
+
+
+def get_analysis_data(fuel_age_map: np.ndarray) -> AnalysisData:
+    """calculate_analysis_data, memoized per loading pattern up to quarter-core rotation.
+
+    The page keeps its maps quarter-core symmetric, so they are the same in every orientation
+    and always found as they are. Sharing results between rotations only matters for
+    asymmetric maps, which get rotated views of the cached result.
+    """
+
+    key, k = canonical_fuel_age_map(fuel_age_map)
+    analysis_data = _analysis_cache.get_or_compute(
+        key, lambda: calculate_analysis_data(np.rot90(np.asarray(fuel_age_map), k))
+    )
+    if k == 0:
+        return analysis_data
+    # Results are for the canonical orientation, turn them back
+    return _rotate_analysis_data(analysis_data, -k)
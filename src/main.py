@@ -3,4 +3,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import jobs
+
+jobs.start()
+
 import pages
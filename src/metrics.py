@@ -0,0 +1,187 @@
+import abc
+import threading
+import time
+from contextlib import ContextDecorator
+from typing import Iterable, Iterator
+
+# Seconds, from a cache hit to a slow full-history query or export
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class _Metric(abc.ABC):
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), registry: "Registry | None" = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        assert set(labels) == set(self.labelnames), f"Metric {self.name} takes labels {self.labelnames}, got {labels}"
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abc.abstractmethod
+    def _samples(self) -> Iterator[tuple[str, tuple[tuple[str, str], ...], float]]:
+        """(name suffix, labels, value) of every sample."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. of points written or cache hits."""
+
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield "", tuple(zip(self.labelnames, key)), value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. the length of a queue."""
+
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield "", tuple(zip(self.labelnames, key)), value
+
+
+class _Timer(ContextDecorator):
+    def __init__(self, histogram: "Histogram", labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def _recreate_cm(self):
+        # Used as a decorator, every call gets its own timer so concurrent calls do not mix up
+        return _Timer(self.histogram, self.labels)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self._start, **self.labels)
+        return False
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (durations in seconds) over fixed buckets."""
+
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: (count per bucket, sum, count)
+        self._values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            bucket_counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    bucket_counts[i] += 1
+                    break
+            self._values[key] = (bucket_counts, total + value, count + 1)
+
+    def time(self, **labels) -> _Timer:
+        """Time a block (`with histogram.time(...)`) or every call of a function (`@histogram.time(...)`)."""
+        return _Timer(self, labels)
+
+    def _samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (bucket_counts, total, count) in values.items():
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                yield "_bucket", labels + (("le", _format_value(upper)),), cumulative
+            yield "_bucket", labels + (("le", "+Inf"),), count
+            yield "_sum", labels, total
+            yield "_count", labels, count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            assert metric.name not in self._metrics, f"Metric {metric.name} is already registered"
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# Shared metrics, used across modules
+influx_query_seconds = Histogram("ekorre_influx_query_seconds", "Duration of InfluxDB queries.", ["query", "window"])
+influx_points_written = Counter("ekorre_influx_points_written_total", "Points written to InfluxDB.", ["bucket"])
+influx_points_spilled = Counter(
+    "ekorre_influx_points_spilled_total", "Points spilled to disk because InfluxDB could not be written.", ["bucket"]
+)
+influx_points_queued = Gauge(
+    "ekorre_influx_points_queued", "Points queued on disk, not yet written to InfluxDB.", ["bucket"]
+)
+cache_requests = Counter("ekorre_cache_requests_total", "Cache lookups.", ["cache", "result"])
+umm_fetch_seconds = Histogram("ekorre_umm_fetch_seconds", "Duration of UMM feed fetches.", ["kind"])
+page_render_seconds = Histogram("ekorre_page_render_seconds", "Duration of page renders.", ["page", "source"])
+job_seconds = Histogram("ekorre_job_seconds", "Duration of background job runs.", ["job"])
+job_runs = Counter("ekorre_job_runs_total", "Background job runs.", ["job", "status"])
+job_last_success = Gauge(
+    "ekorre_job_last_success_timestamp_seconds", "Unix time the last successful run of a job finished.", ["job"]
+)
@@ -1,34 +1,12 @@
-from dataclasses import dataclass
 from enum import Enum, auto
 
 import numpy as np
 import plotly.graph_objects as go
 from nicegui import ui
-from scipy.signal import convolve2d
 
+from lekstuga_engine import MAX_AGE, get_analysis_data
 from models.lekstuga.scenarios import LekstugaScenario
 
-MAX_AGE = 4  # years
-CYCLE_LENGTH = 1  # years
-NUMBER_OF_STEPS = 20
-BURNUP_STEP_SIZE = CYCLE_LENGTH / NUMBER_OF_STEPS
-
-
-def kinf_curve(burnup: np.ndarray) -> np.ndarray:
-    # Burnup is given in years. First it should go up until the first year, then down, roughly.
-    kinf_map = -0.4 * np.sqrt((np.exp(-burnup / 0.4))) + 1.45 - burnup * 0.15
-    return kinf_map
-
-
-# import matplotlib.pyplot as plt
-
-# plt.plot(np.linspace(0, MAX_AGE, 100), [kinf_curve(bu) for bu in np.linspace(0, MAX_AGE, 100)])
-# plt.savefig("kinf_curve.png")
-# plt.close()
-
-power_kernel = np.array([[0.04, 0.08, 0.04], [0.08, 0.36, 0.08], [0.04, 0.08, 0.04]])
-power_kernel = power_kernel / np.sum(power_kernel)  # Normalize
-
 
 class Parameter(Enum):
     BURNUP = "Utbränning (år)"
@@ -38,108 +16,9 @@ class Parameter(Enum):
     # SDM = "Avstängningsmarginal (ASM, SDM)"
 
 
-@dataclass
-class AgeCount:
-    age: int
-    count: int
-
-
-@dataclass
-class BurnupStepData:
-    burnup: float
-    burnup_map: np.ndarray
-    kinf_map: np.ndarray
-    power_map: np.ndarray
-    leakage: float
-    # sdm_map: np.ndarray
-
-
-@dataclass
-class AnalysisData:
-    age_counts: list[AgeCount]
-    total_fuel_elements: int
-    burnup_step_data: list[BurnupStepData]
-
-
-def calculate_analysis_data(fuel_age_map: np.ndarray) -> AnalysisData:
-    unique, counts = np.unique(fuel_age_map[fuel_age_map != None], return_counts=True)
-    # Add to age counts even ages with 0 count
-    full_unique = np.arange(0, MAX_AGE + 1)
-    full_counts = [counts[unique.tolist().index(u)] if u in unique else 0 for u in full_unique]
-    age_counts = [AgeCount(age=int(u), count=int(c)) for u, c in zip(full_unique, full_counts)]
-
-    total_fuel_elements = np.sum(counts)
-
-    burnup_step_data = []  # Placeholder for actual burnup step data calculation
-
-    # Initialize first burnup step data (BOC)
-    burnup_map_boc = np.array(fuel_age_map, dtype=float)  # Convert so that None gets np.naa
-    kinf_map_boc = kinf_curve(burnup_map_boc)
-    kinf_map_filled_boc = np.where(np.isnan(kinf_map_boc), 0, kinf_map_boc)  # Fill NaNs with 0 for convolution
-    power_map_boc = convolve2d(kinf_map_filled_boc, power_kernel, mode="same", boundary="fill", fillvalue=0)
-    power_map_boc = np.where(
-        np.isnan(burnup_map_boc), np.nan, power_map_boc
-    )  # Make power_map NaN where there is no fuel
-    power_map_boc = power_map_boc / np.nanmean(power_map_boc)  # Normalize power map
-
-    # sdm_map_boc
-
-    # Calcualte leakage by summing power in outer ring vs total power
-    total_power = np.nansum(power_map_boc)
-    outer_ring_power = np.nansum(
-        np.concatenate(
-            [
-                power_map_boc[0, :],
-                power_map_boc[-1, :],
-                power_map_boc[1:-1, 0],
-                power_map_boc[1:-1, -1],
-            ]
-        )
-    )
-    leakage_boc = (outer_ring_power / total_power) * 100 if total_power > 0 else 0.0
-
-    burnup_step_data.append(
-        BurnupStepData(
-            burnup=0.0, burnup_map=burnup_map_boc, kinf_map=kinf_map_boc, power_map=power_map_boc, leakage=leakage_boc
-        )
-    )
-
-    for step in np.linspace(0, CYCLE_LENGTH, NUMBER_OF_STEPS)[1:]:
-        # Increase burnup based on previous power map
-        burnup_map = burnup_step_data[-1].burnup_map + BURNUP_STEP_SIZE * burnup_step_data[-1].power_map
-        kinf_map = kinf_curve(burnup_map)
-        kinf_map_filled = np.where(np.isnan(kinf_map), 0, kinf_map)  # Fill NaNs with 0 for convolution
-        power_map = convolve2d(kinf_map_filled, power_kernel, mode="same", boundary="fill", fillvalue=0)
-        power_map = np.where(np.isnan(burnup_map), np.nan, power_map)  # Make power_map NaN where there is no fuel
-        power_map = power_map / np.nanmean(power_map)  # Normalize power map
-        # sdm_map
-
-        # Calculate leakage by summing power in outer ring vs total power
-        total_power = np.nansum(power_map)
-        outer_ring_power = np.nansum(
-            np.concatenate(
-                [
-                    power_map[0, :],
-                    power_map[-1, :],
-                    power_map[1:-1, 0],
-                    power_map[1:-1, -1],
-                ]
-            )
-        )
-        leakage = (outer_ring_power / total_power) * 100 if total_power > 0 else 0.0
-
-        burnup_step_data.append(
-            BurnupStepData(burnup=step, burnup_map=burnup_map, kinf_map=kinf_map, power_map=power_map, leakage=leakage)
-        )
-
-    return AnalysisData(
-        age_counts=age_counts, total_fuel_elements=total_fuel_elements, burnup_step_data=burnup_step_data
-    )
-
-
 @ui.refreshable
 def fint_peak_plot(fuel_age_map: np.ndarray = None):
-    analysis_data = calculate_analysis_data(fuel_age_map)
+    analysis_data = get_analysis_data(fuel_age_map)
 
     x = [x.burnup for x in analysis_data.burnup_step_data]
     y = [np.nanmax(x.power_map) for x in analysis_data.burnup_step_data]
@@ -179,7 +58,7 @@ def fint_peak_plot(fuel_age_map: np.ndarray = None):
 
 @ui.refreshable
 def analysis_data_presenter(fuel_age_map: np.ndarray = None):
-    analysis_data = calculate_analysis_data(fuel_age_map)
+    analysis_data = get_analysis_data(fuel_age_map)
 
     with ui.column():
         with ui.card().classes("w-108"):
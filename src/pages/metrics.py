@@ -0,0 +1,10 @@
+from fastapi.responses import PlainTextResponse
+from nicegui import app
+
+from metrics import REGISTRY
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
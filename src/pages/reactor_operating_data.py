@@ -1,4 +1,5 @@
 import asyncio
+import time
 from datetime import datetime, timedelta, timezone
 
 import plotly.graph_objects as go
@@ -6,13 +7,24 @@ import pytz
 from nicegui import events, ui
 from nicegui.events import ValueChangeEventArguments
 
-from influxdb import get_datetime_of_extreme, read_from_influx
+from dashboard import (
+    REACTORS_PATH,
+    aggregate_every_for_span,
+    build_dashboard_payload,
+    can_serve_from_memory,
+    dashboard_payload_key,
+    dashboard_payloads,
+    local_day_bounds,
+    read_series_from_memory,
+)
+from influxdb import get_datetime_of_extreme_async, read_many_from_influx_async
+from metrics import page_render_seconds
 from models.reactor import (
     REACTOR_OPERATING_DATA_BUCKET,
     REACTOR_OPERATING_DATA_MEASUREMENT,
     Reactor,
 )
-from umm import fetch_umm_events
+from umm_store import get_umm_snapshot
 
 # from pages import theme
 
@@ -47,43 +59,79 @@ async def reactor_operating_data():
 
         return start, stop
 
-    # Fetch UMM once per page load (not on each date-range change)
-    start_interval_utc = get_datetime_of_extreme(
-        REACTOR_OPERATING_DATA_BUCKET,
-        REACTOR_OPERATING_DATA_MEASUREMENT,
-        "first",
-    )
-    stop_interval_utc = get_datetime_of_extreme(
-        REACTOR_OPERATING_DATA_BUCKET,
-        REACTOR_OPERATING_DATA_MEASUREMENT,
-        "last",
+    # Queries still running when the browser disconnects are cancelled
+    pending_queries: set[asyncio.Task] = set()
+
+    async def run_query(coro):
+        task = asyncio.ensure_future(coro)
+        pending_queries.add(task)
+        try:
+            return await task
+        finally:
+            pending_queries.discard(task)
+
+    def cancel_pending_queries():
+        for task in list(pending_queries):
+            task.cancel()
+
+    ui.context.client.on_disconnect(cancel_pending_queries)
+
+    # The date picker spans all data. The range comes with the precomputed default two weeks,
+    # and is only queried when those are not precomputed for the browser's timezone.
+    now_local = datetime.now(tz=browser_timezone)
+    default_payload = dashboard_payloads.get(
+        dashboard_payload_key(
+            browser_timezone, *local_day_bounds(now_local - timedelta(weeks=2), now_local, browser_timezone)
+        )
     )
+    if default_payload is not None and default_payload.data_range is not None:
+        start_interval_utc, stop_interval_utc = default_payload.data_range
+    else:
+        start_interval_utc, stop_interval_utc = await asyncio.gather(
+            run_query(
+                get_datetime_of_extreme_async(
+                    REACTOR_OPERATING_DATA_BUCKET,
+                    REACTOR_OPERATING_DATA_MEASUREMENT,
+                    "first",
+                )
+            ),
+            run_query(
+                get_datetime_of_extreme_async(
+                    REACTOR_OPERATING_DATA_BUCKET,
+                    REACTOR_OPERATING_DATA_MEASUREMENT,
+                    "last",
+                )
+            ),
+        )
 
-    umm_events = []
+    # Read UMM once per page load (not on each date-range change). The events are refreshed
+    # in the background by the UMM job, which publishes a shared snapshot.
+    umm_snapshot = get_umm_snapshot()
+    umm_index = umm_snapshot.index
     umm_error: str | None = None
-    try:
-        umm_events, umm_url = await asyncio.to_thread(
-            fetch_umm_events,
-            event_stop_utc=datetime.now(timezone.utc),
-            limit=10000,
-        )
-        print(f"UMM RSS URL: {umm_url}")
-        print(f"Fetched {len(umm_events)} UMM events")
-    except Exception as e:
-        umm_error = str(e)
-        print(f"Error fetching UMM: {umm_error}")
+    if umm_snapshot.error:
+        umm_error = umm_snapshot.error
+        if umm_snapshot.last_success:
+            last_success_local = utc_to_local(umm_snapshot.last_success, browser_timezone)
+            umm_error += f" (showing UMM as of {last_success_local:%Y-%m-%d %H:%M})"
+    elif umm_snapshot.last_success is None:
+        umm_error = "UMM messages have not been fetched yet"
 
     @ui.refreshable
-    def plot_cards(start_local: datetime | None = None, stop_local: datetime | None = None):
+    async def plot_cards(start_local: datetime | None = None, stop_local: datetime | None = None):
+        render_started = time.perf_counter()
+        source = await render_plot_cards(start_local, stop_local)
+        page_render_seconds.observe(time.perf_counter() - render_started, page="reactor_operating_data", source=source)
+
+    async def render_plot_cards(start_local: datetime | None, stop_local: datetime | None) -> str:
+        """Render the cards and UMM table. Returns where the data came from, for the metrics."""
+
         if start_local is None:
             stop_local = datetime.now(tz=browser_timezone)
             start_local = stop_local - timedelta(weeks=2)
         if stop_local is None:
             stop_local = datetime.now(tz=browser_timezone)
 
-        start_earliest_on_local_day = start_local.replace(hour=0, minute=0, second=0, microsecond=0)
-        stop_latest_on_local_day = stop_local.replace(hour=23, minute=59, second=59, microsecond=999999)
-
         with ui.row().classes("items-center"):
             ui.icon("edit_calendar", size="md", color="primary").on("click", date_range_menu.open).classes(
                 "cursor-pointer ml-2 bg-slate-800 hover:bg-slate-700 rounded-full h-12 w-12"
@@ -98,187 +146,113 @@ async def reactor_operating_data():
         if umm_error:
             ui.label(f"UMM unavailable: {umm_error}").classes("text-xs text-red-400 font-mono")
 
-        with ui.row():
-            for reactor in Reactor.load_many_from_file("data/reactor_operating_data/reactors.yaml"):
-
-                # Get data from InfluxDB
-                # Downsample for long intervals to avoid huge Plotly payloads (browser can crash/hang)
-                span = stop_latest_on_local_day - start_earliest_on_local_day
-                aggregate_every = None
-                if span > timedelta(days=365):
-                    aggregate_every = "6h"
-                elif span > timedelta(days=180):
-                    aggregate_every = "3h"
-                elif span > timedelta(days=90):
-                    aggregate_every = "1h"
-                elif span > timedelta(days=30):
-                    aggregate_every = "30m"
-
-                aggregate_every_minutes = {
-                    None: 10,
-                    "30m": 30,
-                    "1h": 60,
-                    "3h": 180,
-                    "6h": 360,
-                }[aggregate_every]
-
-                records = read_from_influx(
-                    REACTOR_OPERATING_DATA_BUCKET,
-                    REACTOR_OPERATING_DATA_MEASUREMENT,
-                    "MW",
-                    tags={"block": reactor.reactor_label},
-                    start=start_earliest_on_local_day,
-                    stop=stop_latest_on_local_day,
-                    aggregate_every=aggregate_every,
-                    aggregate_fn="last",
-                )
+        # The preset ranges are precomputed after every ingestion tick, anything else is built here
+        start, stop = local_day_bounds(start_local, stop_local, browser_timezone)
+        payload = dashboard_payloads.get(dashboard_payload_key(browser_timezone, start, stop))
+        source = "precomputed"
+        if payload is None:
+            aggregate_every = aggregate_every_for_span(stop - start)
+            reactors = Reactor.load_many_from_file(REACTORS_PATH)
+
+            if can_serve_from_memory(start, aggregate_every):
+                source = "memory"
+                series_by_block = read_series_from_memory(reactors, start, stop)
+            else:
+                source = "influx"
+                # Fetched for all reactors in one query
+                try:
+                    series = await run_query(
+                        read_many_from_influx_async(
+                            REACTOR_OPERATING_DATA_BUCKET,
+                            REACTOR_OPERATING_DATA_MEASUREMENT,
+                            "MW",
+                            tag_key="block",
+                            tag_values=[reactor.reactor_label for reactor in reactors],
+                            start=start,
+                            stop=stop,
+                            aggregate_every=aggregate_every,
+                            aggregate_fn="last",
+                            columnar=True,
+                        )
+                    )
+                except asyncio.TimeoutError:
+                    ui.label("Timed out loading reactor operating data, try a shorter period.").classes(
+                        "text-xs text-red-400 font-mono"
+                    )
+                    return "timeout"
+                series_by_block = {block: (s.times, s.values) for block, s in series.items()}
 
-                if len(records) == 0:
+            payload = build_dashboard_payload(
+                reactors, series_by_block, umm_index, start, stop, browser_timezone, aggregate_every
+            )
+
+        with ui.row():
+            for panel in payload.panels:
+                if panel.x is None:
                     with ui.card():
                         with ui.row().classes("w-full"):
                             with ui.row().classes("items-baseline"):
-                                ui.label(reactor.reactor_name).classes("text-lg font-bold font-mono")
-                                ui.label(reactor.reactor_type).classes("text-xs font-mono")
+                                ui.label(panel.reactor_name).classes("text-lg font-bold font-mono")
+                                ui.label(panel.reactor_type).classes("text-xs font-mono")
                         ui.label("No data")
                     continue
 
-                x = [utc_to_local(record.get_time(), browser_timezone) for record in records]
-                y = [record.get_value() for record in records]
-
-                # Sort the rated reactor powers by start date, reverse order
-                reactor.rated_reactor_powers.sort(key=lambda x: x.start, reverse=True)
-
-                # Normalize each y value using the rated reactor power, using each datapoints datetime as a reference
-                assert (
-                    len(reactor.rated_reactor_powers) > 0
-                ), f"Reactor {reactor.reactor_name} has no rated reactor power"
-                for idx, (x_value, y_value) in enumerate(zip(x, y, strict=True)):
-                    # Get the rated reactor power for the given x value
-
-                    rated_reactor_power = next(
-                        (r.power for r in reactor.rated_reactor_powers if r.start <= x_value),
-                        None,
-                    )
-                    if rated_reactor_power is None:
-                        raise ValueError(f"Reactor {reactor.reactor_name} has no rated reactor power for {x_value}")
-
-                    y[idx] = y_value / rated_reactor_power * 100
-
-                # Time window to allow values to not exist over before inserting null values
-                time_window_minutes = max(180, aggregate_every_minutes)
-
-                # Loop over all x values. If there is more than time_window minutes between two x values, insert that time in x and a None value in y. This breaks the plot line if data is missing. Updates are expected every 10 minutes.
-                i = 0
-                while i < len(x) - 1:
-                    if y[i] != None and x[i] + timedelta(minutes=time_window_minutes) < x[i + 1]:
-                        x.insert(i + 1, x[i] + timedelta(minutes=time_window_minutes))
-                        y.insert(i + 1, None)
-                    i += 1
-
-                # As we might have None values
-                max_of_non_none_y = max([y for y in y if y is not None], default=0)
-
-                max_y_axis = max(100, max_of_non_none_y) + 10
                 fig = go.Figure(
                     go.Scatter(
-                        x=x,
-                        y=y,
+                        x=panel.x,
+                        y=panel.y,
                         name="",
                         hovertemplate="%{y:.1f} %<br>%{x}<extra></extra>",
                     ),
                     layout=go.Layout(
-                        yaxis=dict(range=[0, max_y_axis]),
+                        yaxis=dict(range=[0, panel.max_y_axis]),
                         template="plotly_dark",
                     ),
                 )
 
                 # Overlay Nord Pool UMM unavailability as shaded time windows
-                try:
-                    range_start = (
-                        browser_timezone.localize(start_earliest_on_local_day)
-                        if start_earliest_on_local_day.tzinfo is None
-                        else start_earliest_on_local_day
-                    )
-                    range_stop = (
-                        browser_timezone.localize(stop_latest_on_local_day)
-                        if stop_latest_on_local_day.tzinfo is None
-                        else stop_latest_on_local_day
+                for overlay in panel.overlays:
+                    fig.add_vrect(
+                        x0=overlay.start,
+                        x1=overlay.stop,
+                        fillcolor=overlay.fill,
+                        opacity=0.18,
+                        line_width=0,
+                        layer="below",
                     )
 
-                    for ev in umm_events:
-                        if ev.unit_label != reactor.reactor_label:
-                            continue
-
-                        ev_start = ev.start.astimezone(browser_timezone)
-                        ev_stop = ev.stop.astimezone(browser_timezone)
-
-                        # Only show if overlapping current interval
-                        if ev_stop < range_start or ev_start > range_stop:
-                            continue
-
-                        label = "UMM"
-                        if ev.unavailable_mw is not None:
-                            label = f"-{int(round(ev.unavailable_mw))} MW"
-
-                        # Orange for partial reductions, red for full outage (available == 0)
-                        fill = "orange"
-                        if ev.available_mw is not None and float(ev.available_mw) == 0.0:
-                            # Only apply this if there is no suffix (eg G31, G42, etc... which would mean that its only a partial outage)
-                            if ev.unit_suffix is None:
-                                fill = "red"
-
-                        fig.add_vrect(
-                            x0=ev_start,
-                            x1=ev_stop,
-                            fillcolor=fill,
-                            opacity=0.18,
-                            line_width=0,
-                            layer="below",
-                        )
-
-                        hover = "UMM"
-                        if ev.unavailable_mw is not None:
-                            hover = f"Unavailable: {int(round(ev.unavailable_mw))} MW"
-                        if ev.available_mw is not None:
-                            hover += f"<br>Available: {int(round(ev.available_mw))} MW"
-                        hover += f"<br>{ev_start.strftime('%Y-%m-%d %H:%M')} → {ev_stop.strftime('%Y-%m-%d %H:%M')}"
-
-                        # Hover support for the UMM window.
-                        #
-                        # Do NOT use a full-height transparent fill polygon here: it captures the hover
-                        # and prevents hovering the actual reactor operating data inside the interval.
-                        #
-                        # Instead, expose the UMM hover on thin (but easy-to-hit) invisible lines at the
-                        # bottom and top of the plot.
-                        for y_hover in (0, max_y_axis):
-                            fig.add_trace(
-                                go.Scatter(
-                                    x=[ev_start, ev_stop],
-                                    y=[y_hover, y_hover],
-                                    mode="lines",
-                                    line=dict(width=30, color="rgba(0,0,0,0.001)"),
-                                    hovertemplate=hover + "<extra></extra>",
-                                    showlegend=False,
-                                    name="",
-                                )
+                    # Hover support for the UMM window.
+                    #
+                    # Do NOT use a full-height transparent fill polygon here: it captures the hover
+                    # and prevents hovering the actual reactor operating data inside the interval.
+                    #
+                    # Instead, expose the UMM hover on thin (but easy-to-hit) invisible lines at the
+                    # bottom and top of the plot.
+                    for y_hover in (0, panel.max_y_axis):
+                        fig.add_trace(
+                            go.Scatter(
+                                x=[overlay.start, overlay.stop],
+                                y=[y_hover, y_hover],
+                                mode="lines",
+                                line=dict(width=30, color="rgba(0,0,0,0.001)"),
+                                hovertemplate=overlay.hover + "<extra></extra>",
+                                showlegend=False,
+                                name="",
                             )
+                        )
 
-                        xmin = min(x)
-                        xmax = max(x)
-                        fig.update_xaxes(range=[xmin, xmax])
-                except Exception:
-                    # Never break plotting because of UMM parsing/overlay issues
-                    pass
+                if panel.overlays:
+                    fig.update_xaxes(range=[panel.x[0], panel.x[-1]])
 
                 fig.update_layout(margin=dict(l=0, r=0, t=0, b=0), showlegend=False)
                 with ui.card():
                     with ui.row().classes("w-full"):
                         with ui.row().classes("items-baseline"):
-                            ui.label(reactor.reactor_name).classes("text-lg font-bold font-mono")
-                            ui.label(reactor.reactor_type).classes("text-xs font-mono")
+                            ui.label(panel.reactor_name).classes("text-lg font-bold font-mono")
+                            ui.label(panel.reactor_type).classes("text-xs font-mono")
                         ui.space()
                         ui.circular_progress(
-                            round(y[-1]),
+                            round(panel.y[-1]),
                             min=0,
                             max=100,
                             size="md",
@@ -291,43 +265,13 @@ async def reactor_operating_data():
             "text-sm font-mono text-slate-200"
         )
 
-        try:
-            range_start = (
-                browser_timezone.localize(start_earliest_on_local_day)
-                if start_earliest_on_local_day.tzinfo is None
-                else start_earliest_on_local_day
-            )
-            range_stop = (
-                browser_timezone.localize(stop_latest_on_local_day)
-                if stop_latest_on_local_day.tzinfo is None
-                else stop_latest_on_local_day
-            )
-
-            # Map unit label -> human readable name
-            reactors = Reactor.load_many_from_file("data/reactor_operating_data/reactors.yaml")
-            name_by_label = {r.reactor_label: r.reactor_name for r in reactors}
+        if payload.umm_table_error:
+            ui.label(f"UMM table error: {payload.umm_table_error}").classes("text-xs font-mono text-red-400")
+            return source
 
-            rows = []
-            for ev in umm_events:
-                ev_start = ev.start.astimezone(browser_timezone)
-                ev_stop = ev.stop.astimezone(browser_timezone)
-                if ev_stop < range_start or ev_start > range_stop:
-                    continue
-
-                rows.append(
-                    {
-                        "block": name_by_label.get(ev.unit_label, ev.unit_label),
-                        "suffix": ev.unit_suffix or "",
-                        "start": ev_start.strftime("%Y-%m-%d %H:%M"),
-                        "stop": ev_stop.strftime("%Y-%m-%d %H:%M"),
-                        "available_mw": "" if ev.available_mw is None else int(round(ev.available_mw)),
-                        "unavailable_mw": "" if ev.unavailable_mw is None else int(round(ev.unavailable_mw)),
-                        "link": ev.link or "",
-                        "_id": f"{ev.unit_label}-{ev.start.isoformat()}-{ev.stop.isoformat()}",
-                    }
-                )
-
-            rows.sort(key=lambda r: (r["block"], r["start"]))
+        try:
+            # The payload may be shared by many clients, give the table its own rows
+            rows = [dict(row) for row in payload.umm_rows]
 
             columns = [
                 {"name": "block", "label": "Block", "field": "block", "align": "left"},
@@ -368,6 +312,8 @@ async def reactor_operating_data():
         except Exception as e:
             ui.label(f"UMM table error: {e}").classes("text-xs font-mono text-red-400")
 
+        return source
+
     # with theme.frame():
     # Dates picker
     with ui.row():
@@ -414,4 +360,4 @@ async def reactor_operating_data():
                 with ui.row().classes("justify-end"):
                     ui.button("Close", on_click=date_range_menu.close).props("flat")
 
-    plot_cards()
+    await plot_cards()
@@ -0,0 +1,123 @@
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PARQUET_EXPORT_SCHEMA = pa.schema(
+    [
+        ("time", pa.timestamp("ns", tz="UTC")),
+        ("MW", pa.float64()),
+        ("percent", pa.float64()),
+    ]
+)
+
+
+# A month is closed, and its partitions never written again, this long after it is over, so
+# points that arrive a little late are still exported
+PARQUET_EXPORT_SETTLE = timedelta(hours=1)
+
+
+def month_start_of(time: datetime) -> datetime:
+    """Start of the month of `time`, in UTC."""
+    return time.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def iter_months(start: datetime, stop: datetime) -> Iterator[tuple[datetime, datetime]]:
+    """(month start, next month start) in UTC for every month from `start` up to and including `stop`."""
+
+    month_start = month_start_of(start)
+    while month_start <= stop:
+        next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+        yield month_start, next_month_start
+        month_start = next_month_start
+
+
+def partition_path(root: Path, block: str, month_start: datetime) -> Path:
+    """Hive-style partition, e.g. "<root>/block=F1/month=2024-05/data.parquet"."""
+    return root / f"block={block}" / f"month={month_start:%Y-%m}" / "data.parquet"
+
+
+@dataclass
+class ParquetExportState:
+    """Progress of the export, kept next to the partitions in "<root>/_export_state.json".
+
+    Parquet readers skip files starting with "_", so the state is not mistaken for data.
+    """
+
+    first: datetime  # Time of the first point, the first month to export
+    # Start of the first month per block whose partition can still change. The partitions of
+    # the months before it were written after their month was over, and are never written again.
+    # A block starts at the month of its first point, earlier months have no partition.
+    final_until: dict[str, datetime] = field(default_factory=dict)
+
+    @staticmethod
+    def path(root: Path) -> Path:
+        return root / "_export_state.json"
+
+    @classmethod
+    def load(cls, root: Path) -> "ParquetExportState | None":
+        path = cls.path(root)
+        if not path.exists():
+            return None
+        state = json.loads(path.read_text())
+        return cls(
+            first=datetime.fromisoformat(state["first"]),
+            final_until={block: datetime.fromisoformat(value) for block, value in state["final_until"].items()},
+        )
+
+    def save(self, root: Path):
+        root.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=root, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                {
+                    "first": self.first.isoformat(),
+                    "final_until": {block: value.isoformat() for block, value in self.final_until.items()},
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path(root))
+
+
+def align_fields(
+    mw: tuple[np.ndarray, np.ndarray], percent: tuple[np.ndarray, np.ndarray]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Join the (times, values) of both fields on time. A value missing from one field becomes NaN."""
+
+    times = np.union1d(mw[0], percent[0])
+    columns = []
+    for field_times, field_values in (mw, percent):
+        column = np.full(len(times), np.nan)
+        column[np.searchsorted(times, field_times)] = field_values
+        columns.append(column)
+    return times, columns[0], columns[1]
+
+
+def write_partition(path: Path, times_ns: np.ndarray, mw: np.ndarray, percent: np.ndarray):
+    """Write one partition atomically, readers see either the previous or the new file."""
+
+    table = pa.Table.from_arrays(
+        [
+            pa.array(np.asarray(times_ns, dtype="datetime64[ns]"), type=PARQUET_EXPORT_SCHEMA.field("time").type),
+            pa.array(np.asarray(mw, dtype=np.float64)),
+            pa.array(np.asarray(percent, dtype=np.float64)),
+        ],
+        schema=PARQUET_EXPORT_SCHEMA,
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from models.reactor import Reactor
+from timestamps import datetime_to_ns
+
+
+def normalize_to_rated_power(reactor: Reactor, times_ns: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Convert MW values to percent of the rated reactor power in effect at each timestamp."""
+
+    assert len(reactor.rated_reactor_powers) > 0, f"Reactor {reactor.reactor_name} has no rated reactor power"
+
+    rated_reactor_powers = sorted(reactor.rated_reactor_powers, key=lambda r: r.start)
+    starts_ns = np.array([datetime_to_ns(r.start) for r in rated_reactor_powers], dtype=np.int64)
+    powers = np.array([r.power for r in rated_reactor_powers], dtype=np.float64)
+
+    # Index of the last rated power whose start is at or before each timestamp
+    power_idx = np.searchsorted(starts_ns, times_ns, side="right") - 1
+    if len(power_idx) > 0 and power_idx[0] < 0:
+        first_missing = datetime.fromtimestamp(times_ns[power_idx < 0][0] / 1e9, tz=timezone.utc)
+        raise ValueError(f"Reactor {reactor.reactor_name} has no rated reactor power for {first_missing}")
+
+    return np.asarray(values, dtype=np.float64) / powers[power_idx] * 100
+
+
+def insert_gaps(times_ns: np.ndarray, values: np.ndarray, max_gap: timedelta) -> tuple[np.ndarray, np.ndarray]:
+    """Break the plot line where data is missing.
+
+    Wherever two consecutive timestamps are more than `max_gap` apart, a NaN value is inserted
+    at `max_gap` after the earlier one.
+    """
+
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    max_gap_ns = max_gap // timedelta(microseconds=1) * 1000
+
+    gap_idx = np.flatnonzero(np.diff(times_ns) > max_gap_ns)
+    if len(gap_idx) == 0:
+        return times_ns, values
+
+    return (
+        np.insert(times_ns, gap_idx + 1, times_ns[gap_idx] + max_gap_ns),
+        np.insert(values, gap_idx + 1, np.nan),
+    )
@@ -0,0 +1,166 @@
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from timestamps import datetime_to_ns
+
+# Keep enough history in memory to serve every non-aggregated page view (spans up to ~30 days)
+SERIES_STORE_RETENTION = timedelta(days=31)
+# A point every 3 minutes over the retention period fits comfortably
+SERIES_STORE_CAPACITY = 16384
+
+
+class BlockRingBuffer:
+    """Fixed-size ring buffer of (time, MW, percent) for one block.
+
+    Timestamps are epoch nanoseconds (UTC). Appends older than or equal to the newest
+    stored timestamp are ignored, so the buffer always stays sorted. Older points can only
+    be added with `merge`.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.mw = np.zeros(capacity, dtype=np.float64)
+        self.percent = np.zeros(capacity, dtype=np.float64)
+        self._head = 0  # Index of the next write
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def oldest_ns(self) -> int | None:
+        if self._count == 0:
+            return None
+        return int(self.times[(self._head - self._count) % self.capacity])
+
+    @property
+    def newest_ns(self) -> int | None:
+        if self._count == 0:
+            return None
+        return int(self.times[(self._head - 1) % self.capacity])
+
+    def append(self, time_ns: int, mw: float, percent: float) -> bool:
+        newest = self.newest_ns
+        if newest is not None and time_ns <= newest:
+            return False
+        self.times[self._head] = time_ns
+        self.mw[self._head] = mw
+        self.percent[self._head] = percent
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        return True
+
+    def merge(self, times: np.ndarray, mw: np.ndarray, percent: np.ndarray) -> int:
+        """Merge points of any age into the buffer, keeping the newest `capacity` of them.
+
+        Points at an already stored timestamp are ignored. Returns the number of points added.
+        """
+
+        count = self._count
+        # Stored points first, so the stable sort keeps them over new points at the same time
+        all_times = np.concatenate((self._ordered(self.times), times))
+        all_mw = np.concatenate((self._ordered(self.mw), mw))
+        all_percent = np.concatenate((self._ordered(self.percent), percent))
+        order = np.argsort(all_times, kind="stable")
+        unique = np.ones(len(order), dtype=bool)
+        unique[1:] = all_times[order][1:] != all_times[order][:-1]
+        order = order[unique][-self.capacity :]
+
+        merged = len(order)
+        self.times[:merged] = all_times[order]
+        self.mw[:merged] = all_mw[order]
+        self.percent[:merged] = all_percent[order]
+        self._head = merged % self.capacity
+        self._count = merged
+        return int(unique.sum()) - count
+
+    def _ordered(self, array: np.ndarray) -> np.ndarray:
+        start = (self._head - self._count) % self.capacity
+        if start + self._count <= self.capacity:
+            return array[start : start + self._count]
+        return np.concatenate((array[start:], array[: self._head]))
+
+    def read(self, start_ns: int, stop_ns: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return copies of (times, mw, percent) with start_ns <= time < stop_ns."""
+        times = self._ordered(self.times)
+        lo, hi = np.searchsorted(times, [start_ns, stop_ns], side="left")
+        return (
+            times[lo:hi].copy(),
+            self._ordered(self.mw)[lo:hi].copy(),
+            self._ordered(self.percent)[lo:hi].copy(),
+        )
+
+
+class SeriesStore:
+    """In-process store of recent reactor operating data, one ring buffer per block.
+
+    Warmed once from InfluxDB at startup and then fed by the ingestion job, so recent-window
+    page loads can be served without a Flux query. Points appended before the store is warm
+    are kept, and merged with the warmed ones.
+    """
+
+    def __init__(self, capacity: int = SERIES_STORE_CAPACITY):
+        self.capacity = capacity
+        self._buffers: dict[str, BlockRingBuffer] = {}
+        self._covered_from_ns: int | None = None  # None until warmed
+        self._lock = threading.Lock()
+
+    @property
+    def is_warm(self) -> bool:
+        return self._covered_from_ns is not None
+
+    def _buffer(self, block: str) -> BlockRingBuffer:
+        buffer = self._buffers.get(block)
+        if buffer is None:
+            buffer = self._buffers[block] = BlockRingBuffer(self.capacity)
+        return buffer
+
+    def append(self, block: str, time: datetime, mw: float, percent: float) -> bool:
+        with self._lock:
+            buffer = self._buffer(block)
+            appended = buffer.append(datetime_to_ns(time), mw, percent)
+            # Once the ring wraps around, the oldest data is gone and coverage shrinks
+            if appended and self._covered_from_ns is not None and len(buffer) == buffer.capacity:
+                self._covered_from_ns = max(self._covered_from_ns, buffer.oldest_ns)
+            return appended
+
+    def warm(
+        self, points_by_block: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]], covered_from: datetime
+    ) -> int:
+        """Merge (times, mw, percent) per block into the store, which then covers everything
+        from `covered_from` on. `points_by_block` has to hold every stored point since then.
+
+        Returns the number of points added.
+        """
+
+        with self._lock:
+            count = 0
+            for block, (times, mw, percent) in points_by_block.items():
+                count += self._buffer(block).merge(times, mw, percent)
+
+            covered_from_ns = datetime_to_ns(covered_from)
+            for buffer in self._buffers.values():
+                # A full buffer has dropped its oldest points, it only covers what it still holds
+                if len(buffer) == buffer.capacity:
+                    covered_from_ns = max(covered_from_ns, buffer.oldest_ns)
+            self._covered_from_ns = covered_from_ns
+            return count
+
+    def covers(self, start: datetime) -> bool:
+        """True if every stored point at or after `start` is guaranteed to be in memory."""
+        with self._lock:
+            return self._covered_from_ns is not None and datetime_to_ns(start) >= self._covered_from_ns
+
+    def read(self, block: str, start: datetime, stop: datetime) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        with self._lock:
+            buffer = self._buffers.get(block)
+            if buffer is None:
+                empty = np.zeros(0, dtype=np.float64)
+                return np.zeros(0, dtype=np.int64), empty, empty.copy()
+            return buffer.read(datetime_to_ns(start), datetime_to_ns(stop))
+
+
+series_store = SeriesStore()
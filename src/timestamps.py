@@ -0,0 +1,13 @@
+from datetime import datetime, timedelta, timezone
+
+_EPOCH = datetime.fromtimestamp(0, tz=timezone.utc)
+
+
+def datetime_to_ns(dt: datetime) -> int:
+    """Epoch nanoseconds (UTC) of an aware datetime, exact to the microsecond."""
+    return (dt.astimezone(timezone.utc) - _EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def ns_to_datetime(ns: int) -> datetime:
+    """Aware UTC datetime of epoch nanoseconds, truncated to the microsecond."""
+    return _EPOCH + timedelta(microseconds=ns // 1000)
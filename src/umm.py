@@ -1,21 +1,46 @@
 from __future__ import annotations
 
+import hashlib
 import re
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
 from html import unescape
-from typing import Iterable
+from typing import IO, Iterable, Iterator
 from xml.etree import ElementTree
 
 import pytz
 import requests
 from bs4 import BeautifulSoup
+from mashumaro.mixins.json import DataClassJSONMixin
+from requests.adapters import HTTPAdapter
+
+from cache import LRUCache
+from http_cache import CachedResponse, http_cache
+from metrics import umm_fetch_seconds
+
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
 
 STOCKHOLM_TZ = pytz.timezone("Europe/Stockholm")
 
+# Fallback lookups to the UMM message API share one pooled session and run concurrently
+UMM_API_MAX_WORKERS = 8
+
+_umm_api_session = requests.Session()
+_umm_api_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=UMM_API_MAX_WORKERS))
+_umm_api_pool = ThreadPoolExecutor(max_workers=UMM_API_MAX_WORKERS, thread_name_prefix="umm-api")
+# Published UMM message versions never change, so their events can be kept for the lifetime of the process
+_umm_api_cache = LRUCache("umm_api_message", 10000)
+
 
 @dataclass(frozen=True)
-class UmmEvent:
+class UmmEvent(DataClassJSONMixin):
     unit_label: str  # e.g. F1, F2, F3, R3, R4
     unit_suffix: str | None  # e.g. "G31" for Ringhals 3 generator 1, or None for the whole block
     start: datetime
@@ -27,6 +52,15 @@ class UmmEvent:
     link: str | None
 
 
+@dataclass(frozen=True)
+class UmmMessage:
+    """All events extracted from one version of one UMM message (one feed entry)."""
+
+    message_id: str  # Falls back to the entry guid/link if the message id cannot be extracted
+    version: int | None
+    events: tuple[UmmEvent, ...]
+
+
 _UNIT_NAME_PATTERNS: list[tuple[str, str]] = [
     ("F1", r"forsmark\s*block\s*1"),
     ("F2", r"forsmark\s*block\s*2"),
@@ -130,6 +164,25 @@ def _extract_events_from_message_api(message: dict) -> list[UmmEvent]:
     return events
 
 
+def _fetch_events_from_message_api(message_id: str, version: int | None) -> tuple[UmmEvent, ...]:
+    def fetch() -> tuple[UmmEvent, ...]:
+        api_resp = _umm_api_session.get(f"https://ummapi.nordpoolgroup.com/messages/{message_id}", timeout=20)
+        api_resp.raise_for_status()
+        events: list[UmmEvent] = []
+        for message in api_resp.json():
+            if version is not None and message.get("version") != version:
+                continue
+            events.extend(_extract_events_from_message_api(message))
+            if version is not None:
+                break
+        return tuple(events)
+
+    if version is None:
+        # Without a version we get whatever is latest, which may still change
+        return fetch()
+    return _umm_api_cache.get_or_compute((message_id, version), fetch)
+
+
 def _extract_message_reference(link: str | None, guid: str | None) -> tuple[str | None, int | None]:
     candidates = [link or "", guid or ""]
     for candidate in candidates:
@@ -141,13 +194,8 @@ def _extract_message_reference(link: str | None, guid: str | None) -> tuple[str
     return None, None
 
 
-def _extract_event_from_description_html(description_html: str) -> Iterable[UmmEvent]:
-    """Extract one or more UmmEvent from the item description.
-
-    Notes:
-    - A single UMM message can list multiple production units.
-    - We only care about the nuclear blocks (Forsmark Block1-3, Ringhals block 3-4).
-    """
+def _parse_description_tables_bs4(description_html: str) -> tuple[str | None, list[list[str]] | None]:
+    """Find the status and the "Production Units" table rows (cell texts) using BeautifulSoup."""
 
     soup = BeautifulSoup(description_html or "", "html.parser")
 
@@ -164,7 +212,7 @@ def _extract_event_from_description_html(description_html: str) -> Iterable[UmmE
                 status = td.get_text(strip=True)
 
     if _looks_cancelled(status):
-        return []
+        return status, None
 
     # Find the "Production Units" table. The feed may insert another heading
     # (for example "Market participants") before the actual table, so look for
@@ -183,14 +231,109 @@ def _extract_event_from_description_html(description_html: str) -> Iterable[UmmE
                 break
 
     if not prod_table:
-        return []
+        return status, None
+
+    rows = [[c.get_text(" ", strip=True) for c in r.find_all(["td", "th"])] for r in prod_table.find_all("tr")]
+    return status, rows
+
+
+# BeautifulSoup's get_text leaves out the contents of these, like it does comments
+_LXML_SKIPPED_TAGS = {"script", "style", "template"}
+
+
+def _lxml_text(element, separator: str) -> str:
+    """Same as BeautifulSoup's get_text(separator, strip=True), skipping comments, scripts and styles."""
+
+    parts: list[str] = []
+
+    def walk(node):
+        if node.text and isinstance(node.tag, str):
+            parts.append(node.text)
+        for child in node:
+            if isinstance(child.tag, str) and child.tag not in _LXML_SKIPPED_TAGS:
+                walk(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(element)
+    return separator.join(part.strip() for part in parts if part.strip())
+
+
+def _parse_description_tables_lxml(description_html: str) -> tuple[str | None, list[list[str]] | None]:
+    """Same as _parse_description_tables_bs4, but on lxml's much faster C parser."""
+
+    if not (description_html or "").strip():
+        return None, None
 
-    rows = prod_table.find_all("tr")
-    if len(rows) < 2:
-        return []
+    root = lxml_html.fragment_fromstring(description_html, create_parent="div")
+
+    status: str | None = None
+    first_table = next(root.iter("table"), None)
+    if first_table is not None:
+        for tr in first_table.iter("tr"):
+            th = next(tr.iter("th"), None)
+            td = next(tr.iter("td"), None)
+            if th is None or td is None:
+                continue
+            if _lxml_text(th, "").lower() == "status:":
+                status = _lxml_text(td, "")
+
+    if _looks_cancelled(status):
+        return status, None
+
+    prod_h3 = next((h3 for h3 in root.iter("h3") if "production units" in _lxml_text(h3, " ").lower()), None)
+    prod_table = None
+    if prod_h3 is not None:
+        for table in prod_h3.xpath("following::table"):
+            first_row = next(table.iter("tr"), None)
+            if first_row is None:
+                continue
+            header_texts = [_lxml_text(cell, " ").lower() for cell in first_row.iter("th", "td")]
+            if "unit name" in header_texts:
+                prod_table = table
+                break
+
+    if prod_table is None:
+        return status, None
+
+    rows = [[_lxml_text(c, " ") for c in r.iter("td", "th")] for r in prod_table.iter("tr")]
+    return status, rows
+
+
+_HTML_PARSER_BACKENDS = {"bs4": _parse_description_tables_bs4}
+if lxml_html is not None:
+    _HTML_PARSER_BACKENDS["lxml"] = _parse_description_tables_lxml
+
+# Use lxml when it is installed, the BeautifulSoup backend gives identical results but is slower
+UMM_HTML_PARSER = "lxml" if "lxml" in _HTML_PARSER_BACKENDS else "bs4"
+
+# Most entries are unchanged between fetches, never parse the same description twice
+_description_cache = LRUCache("umm_description", 20000)
+
+
+def _extract_event_from_description_html(description_html: str, parser: str | None = None) -> Iterable[UmmEvent]:
+    """Extract one or more UmmEvent from the item description.
+
+    Notes:
+    - A single UMM message can list multiple production units.
+    - We only care about the nuclear blocks (Forsmark Block1-3, Ringhals block 3-4).
+    - Results are cached by backend and a hash of the description.
+    """
+
+    parser = parser or UMM_HTML_PARSER
+    parse_tables = _HTML_PARSER_BACKENDS[parser]
+    key = (parser, hashlib.sha1((description_html or "").encode()).digest())
+    return _description_cache.get_or_compute(
+        key, lambda: _events_from_description_tables(*parse_tables(description_html))
+    )
+
+
+def _events_from_description_tables(status: str | None, rows: list[list[str]] | None) -> tuple[UmmEvent, ...]:
+    if not rows or len(rows) < 2:
+        return ()
 
     # Header indices
-    header = [th.get_text(" ", strip=True).lower() for th in rows[0].find_all(["th", "td"])]
+    header = [cell.lower() for cell in rows[0]]
 
     def idx(col: str) -> int | None:
         try:
@@ -205,11 +348,10 @@ def _extract_event_from_description_html(description_html: str) -> Iterable[UmmE
     i_to = idx("to")
 
     if i_unit is None:
-        return []
+        return ()
 
     events: list[UmmEvent] = []
-    for r in rows[1:]:
-        cols = [c.get_text(" ", strip=True) for c in r.find_all(["td", "th"])]
+    for cols in rows[1:]:
         if len(cols) <= i_unit:
             continue
 
@@ -253,15 +395,20 @@ def _extract_event_from_description_html(description_html: str) -> Iterable[UmmE
             )
         )
 
-    return events
+    return tuple(events)
 
 
-def build_umm_rss_url(*, event_stop_utc: datetime, limit: int = 10000) -> str:
+def build_umm_rss_url(
+    *, event_stop_utc: datetime, limit: int = 10000, publication_start_utc: datetime | None = None
+) -> str:
     """Build Nord Pool UMM RSS URL.
 
     NOTE: Sigge requested eventStartDate to be hardcoded to the earliest date the
     site has data for (2024-04-09), and to keep that exact value (as in the
     example URL).
+
+    `publication_start_utc` restricts the feed to messages published since then (used for
+    incremental syncs). Without it the publicationStartDate of the example URL is kept.
     """
 
     assert event_stop_utc.tzinfo is not None
@@ -275,6 +422,10 @@ def build_umm_rss_url(*, event_stop_utc: datetime, limit: int = 10000) -> str:
 
     # Keep publicationStartDate exactly as in the example URL too
     publication_start_encoded = "1969-12-31T23%3A00%3A00.000Z"
+    if publication_start_utc is not None:
+        assert publication_start_utc.tzinfo is not None
+        publication_start = publication_start_utc.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%S") + ".000Z"
+        publication_start_encoded = requests.utils.quote(publication_start, safe="")
 
     return (
         "https://ummrss.nordpoolgroup.com/messages/"
@@ -290,6 +441,187 @@ def build_umm_rss_url(*, event_stop_utc: datetime, limit: int = 10000) -> str:
     )
 
 
+def _iter_feed_entries(source: IO[bytes]) -> Iterator[ElementTree.Element]:
+    """Stream the feed and yield each complete Atom <entry> / RSS <item>.
+
+    Every entry is removed from the tree once the caller is done with it, so memory use is
+    bounded by a single entry rather than the whole feed.
+    """
+
+    parents: list[ElementTree.Element] = []
+    for event, element in ElementTree.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+
+        parents.pop()
+        # Nord Pool UMM endpoint may return either Atom (<feed><entry>...) or
+        # RSS (<rss><item>...) depending on parameters. Handle both formats.
+        if element.tag.rsplit("}", 1)[-1] in ("entry", "item"):
+            yield element
+            element.clear()
+            if parents:
+                parents[-1].remove(element)
+
+
+def _parse_feed_entry(
+    entry: ElementTree.Element,
+) -> tuple[str | None, str | None, str, int | None, tuple[UmmEvent, ...] | Future]:
+    """Returns (title, link, message_id, version, events or a pending UMM API lookup)."""
+
+    title = (entry.findtext("{*}title") or "").strip() or None
+    guid = (entry.findtext("{*}guid") or "").strip() or None
+
+    link = None
+    # Atom: <link rel="alternate" href="..." /> (attribute)
+    # RSS: <link>https://...</link> (text)
+    # Try Atom-style first, then fallback to RSS-style text.
+    for link_el in entry.findall("{*}link"):
+        # Atom link element has href attribute
+        href = (link_el.attrib.get("href") or "").strip()
+        if href:
+            rel = (link_el.attrib.get("rel") or "").strip().lower()
+            if not rel or rel == "alternate":
+                link = href
+                break
+
+    if not link:
+        # RSS-style link as element text
+        link = (entry.findtext("{*}link") or "").strip() or None
+
+    # Atom uses <content>, RSS uses <description>
+    content = entry.findtext("{*}content")
+    if content is None:
+        content = entry.findtext("{*}description") or ""
+
+    # Content is HTML-escaped (e.g. &lt;table&gt;...), so unescape before parsing.
+    content_html = unescape(content)
+
+    message_id, version = _extract_message_reference(link, guid)
+    extracted_events = tuple(_extract_event_from_description_html(content_html))
+
+    if not extracted_events and message_id:
+        # Nothing usable in the feed entry itself, look the message up in the UMM API instead.
+        # Lookups run concurrently, so a cold fetch takes as long as the slowest one.
+        extracted_events = _umm_api_pool.submit(_fetch_events_from_message_api, message_id, version)
+
+    return title, link, message_id or guid or link or title or "", version, extracted_events
+
+
+def _build_umm_message(
+    title: str | None,
+    link: str | None,
+    message_id: str,
+    version: int | None,
+    extracted_events: tuple[UmmEvent, ...] | Future,
+) -> UmmMessage:
+    if isinstance(extracted_events, Future):
+        extracted_events = extracted_events.result()
+
+    return UmmMessage(
+        message_id=message_id,
+        version=version,
+        events=tuple(
+            UmmEvent(
+                unit_label=ev.unit_label,
+                unit_suffix=ev.unit_suffix,
+                start=ev.start,
+                stop=ev.stop,
+                available_mw=ev.available_mw,
+                unavailable_mw=ev.unavailable_mw,
+                status=ev.status,
+                title=title,
+                link=link,
+            )
+            for ev in extracted_events
+        ),
+    )
+
+
+def _iter_umm_messages_from_source(source: IO[bytes]) -> Iterator[UmmMessage]:
+    # Entries waiting for their UMM API lookup. Messages are yielded in feed order as soon as
+    # every entry before them is done.
+    pending: deque[tuple] = deque()
+    for entry in _iter_feed_entries(source):
+        pending.append(_parse_feed_entry(entry))
+        while pending and not (isinstance(pending[0][-1], Future) and not pending[0][-1].done()):
+            yield _build_umm_message(*pending.popleft())
+
+    while pending:
+        yield _build_umm_message(*pending.popleft())
+
+
+def _iter_umm_messages_from_url(url: str) -> Iterator[UmmMessage]:
+    with requests.get(url, timeout=20, stream=True) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        yield from _iter_umm_messages_from_source(resp.raw)
+
+
+def iter_umm_messages(
+    *,
+    event_stop_utc: datetime,
+    limit: int = 2000,
+    publication_start_utc: datetime | None = None,
+) -> Iterator[UmmMessage]:
+    """Stream the Nord Pool UMM RSS feed, yielding each message as soon as it is parsed."""
+
+    url = build_umm_rss_url(event_stop_utc=event_stop_utc, limit=limit, publication_start_utc=publication_start_utc)
+    return _iter_umm_messages_from_url(url)
+
+
+def iter_umm_events(*, event_stop_utc: datetime, limit: int = 2000) -> Iterator[UmmEvent]:
+    """Stream the Nord Pool UMM RSS feed, yielding unavailability events in feed order."""
+
+    for message in iter_umm_messages(event_stop_utc=event_stop_utc, limit=limit):
+        yield from message.events
+
+
+def fetch_umm_messages(
+    *,
+    event_stop_utc: datetime,
+    limit: int = 2000,
+    publication_start_utc: datetime | None = None,
+) -> tuple[list[UmmMessage], str]:
+    """Fetch Nord Pool UMM RSS feed and extract the unavailability events of each message.
+
+    Returns: (messages, rss_url_used)
+    """
+
+    url = build_umm_rss_url(event_stop_utc=event_stop_utc, limit=limit, publication_start_utc=publication_start_utc)
+    with umm_fetch_seconds.time(kind="uncached"):
+        return list(_iter_umm_messages_from_url(url)), url
+
+
+@contextmanager
+def fetch_changed_umm_messages(
+    *,
+    cache_key: str,
+    event_stop_utc: datetime,
+    limit: int = 2000,
+    publication_start_utc: datetime | None = None,
+) -> Iterator[tuple[list[UmmMessage] | None, str, CachedResponse]]:
+    """fetch_umm_messages through the HTTP cache, yielding None instead of the messages if the
+    feed did not change since the last committed fetch with the same `cache_key`.
+
+    The URL embeds the current time, so the key has to be stable across calls. Commit the
+    yielded response once the messages are stored.
+
+    Yields: (messages, rss_url_used, response)
+    """
+
+    url = build_umm_rss_url(event_stop_utc=event_stop_utc, limit=limit, publication_start_utc=publication_start_utc)
+    started = time.perf_counter()
+    with http_cache.fetch(url, cache_key=cache_key) as response:
+        messages = None
+        if response.changed:
+            with response.open() as f:
+                messages = list(_iter_umm_messages_from_source(f))
+        # Timed up to the messages, the caller stores them inside the block
+        umm_fetch_seconds.observe(time.perf_counter() - started, kind=cache_key)
+        yield messages, url, response
+
+
 def fetch_umm_events(
     *,
     event_stop_utc: datetime,
@@ -300,78 +632,9 @@ def fetch_umm_events(
     Returns: (events, rss_url_used)
     """
 
-    url = build_umm_rss_url(event_stop_utc=event_stop_utc, limit=limit)
-
-    resp = requests.get(url, timeout=20)
-    resp.raise_for_status()
+    messages, url = fetch_umm_messages(event_stop_utc=event_stop_utc, limit=limit)
 
-    root = ElementTree.fromstring(resp.content)
-
-    events: list[UmmEvent] = []
-
-    # Nord Pool UMM endpoint may return either Atom (<feed><entry>...) or
-    # RSS (<rss><item>...) depending on parameters. Handle both formats.
-    entries = []
-    entries.extend(root.findall(".//{*}entry"))
-    entries.extend(root.findall(".//{*}item"))
-
-    for entry in entries:
-        title = (entry.findtext("{*}title") or "").strip() or None
-        guid = (entry.findtext("{*}guid") or "").strip() or None
-
-        link = None
-        # Atom: <link rel="alternate" href="..." /> (attribute)
-        # RSS: <link>https://...</link> (text)
-        # Try Atom-style first, then fallback to RSS-style text.
-        for link_el in entry.findall("{*}link"):
-            # Atom link element has href attribute
-            href = (link_el.attrib.get("href") or "").strip()
-            if href:
-                rel = (link_el.attrib.get("rel") or "").strip().lower()
-                if not rel or rel == "alternate":
-                    link = href
-                    break
-
-        if not link:
-            # RSS-style link as element text
-            link = (entry.findtext("{*}link") or "").strip() or None
-
-        # Atom uses <content>, RSS uses <description>
-        content = entry.findtext("{*}content")
-        if content is None:
-            content = entry.findtext("{*}description") or ""
-
-        # Content is HTML-escaped (e.g. &lt;table&gt;...), so unescape before parsing.
-        content_html = unescape(content)
-
-        extracted_events = list(_extract_event_from_description_html(content_html))
-
-        if not extracted_events:
-            message_id, version = _extract_message_reference(link, guid)
-            if message_id:
-                api_resp = requests.get(f"https://ummapi.nordpoolgroup.com/messages/{message_id}", timeout=20)
-                api_resp.raise_for_status()
-                for message in api_resp.json():
-                    if version is not None and message.get("version") != version:
-                        continue
-                    extracted_events.extend(_extract_events_from_message_api(message))
-                    if version is not None:
-                        break
-
-        for ev in extracted_events:
-            events.append(
-                UmmEvent(
-                    unit_label=ev.unit_label,
-                    unit_suffix=ev.unit_suffix,
-                    start=ev.start,
-                    stop=ev.stop,
-                    available_mw=ev.available_mw,
-                    unavailable_mw=ev.unavailable_mw,
-                    status=ev.status,
-                    title=title,
-                    link=link,
-                )
-            )
+    events = [ev for message in messages for ev in message.events]
 
     # Sort for stable output
     events.sort(key=lambda e: (e.unit_label, e.start))
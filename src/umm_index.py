@@ -0,0 +1,52 @@
+from typing import Iterable
+
+import numpy as np
+
+from timestamps import datetime_to_ns
+from umm import UmmEvent
+
+
+class _IntervalArrays:
+    def __init__(self, events: list[UmmEvent]):
+        self.events = sorted(events, key=lambda ev: ev.start)
+        self.starts = np.array([datetime_to_ns(ev.start) for ev in self.events], dtype=np.int64)
+        self.stops = np.array([datetime_to_ns(ev.stop) for ev in self.events], dtype=np.int64)
+        # Running maximum of the stops, so everything before the first position where it reaches
+        # the query start is known to end before the query
+        self.max_stops = np.maximum.accumulate(self.stops) if len(self.stops) else self.stops
+
+    def overlapping(self, start_ns: int, stop_ns: int) -> list[UmmEvent]:
+        lo = np.searchsorted(self.max_stops, start_ns, side="left")
+        hi = np.searchsorted(self.starts, stop_ns, side="right")
+        if lo >= hi:
+            return []
+        candidates = lo + np.flatnonzero(self.stops[lo:hi] >= start_ns)
+        return [self.events[i] for i in candidates]
+
+
+class UmmIntervalIndex:
+    """Index over UMM events for "which events overlap [start, stop]" queries, per unit and overall.
+
+    Events are sorted by start once, so a query is a binary search plus a scan of the events that
+    can possibly overlap, instead of a pass over the whole UMM history.
+    """
+
+    def __init__(self, events: Iterable[UmmEvent]):
+        events = list(events)
+        events_by_unit: dict[str, list[UmmEvent]] = {}
+        for ev in events:
+            events_by_unit.setdefault(ev.unit_label, []).append(ev)
+
+        self._all = _IntervalArrays(events)
+        self._by_unit = {unit_label: _IntervalArrays(unit_events) for unit_label, unit_events in events_by_unit.items()}
+
+    def overlapping(self, start, stop, unit_label: str | None = None) -> list[UmmEvent]:
+        """Events with ev.stop >= start and ev.start <= stop, sorted by start.
+
+        Only events of `unit_label` if given, otherwise of all units.
+        """
+
+        arrays = self._all if unit_label is None else self._by_unit.get(unit_label)
+        if arrays is None:
+            return []
+        return arrays.overlapping(datetime_to_ns(start), datetime_to_ns(stop))
@@ -0,0 +1,179 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable
+
+from umm import UmmEvent, fetch_changed_umm_messages
+from umm_index import UmmIntervalIndex
+
+UMM_STORE_PATH = Path(os.getenv("UMM_STORE_PATH", "data_cache/umm.sqlite3"))
+UMM_FETCH_LIMIT = 10000
+# Re-fetch a little of the already synced period, in case messages are published late
+UMM_SYNC_OVERLAP = timedelta(hours=1)
+# The feed only lists active messages, so a cancelled message simply disappears from it.
+# A periodic full sync drops those from the store.
+UMM_FULL_SYNC_INTERVAL = timedelta(days=1)
+
+
+class UmmStore:
+    """Persistent local store of UMM messages, keyed by message id and version.
+
+    The feed is synced incrementally: only messages published since the previous sync are
+    fetched. Readers get the events of the latest version of every message.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()  # Held for database access only
+        self._sync_lock = threading.Lock()  # One sync at a time
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection for one transaction, creating the schema on first use."""
+
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                if not self._initialized:
+                    connection.executescript(
+                        """
+                        CREATE TABLE IF NOT EXISTS messages (
+                            message_id TEXT NOT NULL,
+                            version INTEGER NOT NULL,
+                            events TEXT NOT NULL,
+                            PRIMARY KEY (message_id, version)
+                        );
+                        CREATE TABLE IF NOT EXISTS sync_state (
+                            key TEXT PRIMARY KEY,
+                            value TEXT NOT NULL
+                        );
+                        """
+                    )
+                    self._initialized = True
+                yield connection
+        finally:
+            connection.close()
+
+    def _get_state(self, connection: sqlite3.Connection, key: str) -> datetime | None:
+        row = connection.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    @property
+    def last_sync(self) -> datetime | None:
+        with self._lock, self._connect() as connection:
+            return self._get_state(connection, "last_sync")
+
+    def sync(self, full: bool = False) -> int:
+        """Fetch new messages from the feed into the store. Returns the number of messages fetched.
+
+        A full sync is done when forced, on the first sync, or when the last one is older than
+        UMM_FULL_SYNC_INTERVAL. The feed is fetched without holding the store lock, so readers
+        only ever wait for the upsert.
+        """
+
+        with self._sync_lock:
+            now = datetime.now(timezone.utc)
+            with self._lock, self._connect() as connection:
+                last_sync = self._get_state(connection, "last_sync")
+                last_full_sync = self._get_state(connection, "last_full_sync")
+
+            full = (
+                full or last_sync is None or last_full_sync is None or now - last_full_sync > UMM_FULL_SYNC_INTERVAL
+            )
+            publication_start_utc = None if full else last_sync - UMM_SYNC_OVERLAP
+
+            with fetch_changed_umm_messages(
+                cache_key="umm_rss_full" if full else "umm_rss_incremental",
+                event_stop_utc=now,
+                limit=UMM_FETCH_LIMIT,
+                publication_start_utc=publication_start_utc,
+            ) as (messages, url, response):
+                print(f"UMM RSS URL: {url}")
+                # An unchanged feed is already stored, and must not wipe the store on a full sync
+                unchanged = messages is None
+                if unchanged:
+                    print("UMM feed unchanged since the previous sync 🔵")
+                    messages = []
+
+                rows = [
+                    (
+                        message.message_id,
+                        message.version if message.version is not None else 0,
+                        json.dumps([ev.to_dict() for ev in message.events]),
+                    )
+                    for message in messages
+                ]
+
+                with self._lock, self._connect() as connection:
+                    if full and not unchanged:
+                        connection.execute("DELETE FROM messages")
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO messages (message_id, version, events) VALUES (?, ?, ?)", rows
+                    )
+                    connection.execute(
+                        "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('last_sync', ?)", (now.isoformat(),)
+                    )
+                    if full:
+                        connection.execute(
+                            "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('last_full_sync', ?)",
+                            (now.isoformat(),),
+                        )
+                # Only a stored feed counts as seen, so a failed upsert is retried with the next fetch
+                response.commit()
+
+            return len(messages)
+
+    def load_events(self) -> list[UmmEvent]:
+        """Events of the latest stored version of every message, sorted by unit and start."""
+
+        with self._lock, self._connect() as connection:
+            rows = connection.execute(
+                """
+                SELECT m.events FROM messages m
+                JOIN (SELECT message_id, MAX(version) AS version FROM messages GROUP BY message_id) latest
+                ON m.message_id = latest.message_id AND m.version = latest.version
+                """
+            ).fetchall()
+
+        events = [UmmEvent.from_dict(ev) for (events_json,) in rows for ev in json.loads(events_json)]
+        events.sort(key=lambda e: (e.unit_label, e.start))
+        return events
+
+
+umm_store = UmmStore(UMM_STORE_PATH)
+
+
+@dataclass(frozen=True)
+class UmmSnapshot:
+    """Immutable view of the UMM events, published by the UMM job and shared by all page handlers."""
+
+    events: tuple[UmmEvent, ...]
+    index: UmmIntervalIndex  # Built once per snapshot from `events`
+    last_success: datetime | None  # When the events were last refreshed successfully
+    error: str | None  # Error of the latest refresh, None if it succeeded
+
+    @classmethod
+    def from_events(cls, events: Iterable[UmmEvent], last_success: datetime | None, error: str | None = None):
+        events = tuple(events)
+        return cls(events=events, index=UmmIntervalIndex(events), last_success=last_success, error=error)
+
+
+_umm_snapshot = UmmSnapshot.from_events((), last_success=None)
+
+
+def get_umm_snapshot() -> UmmSnapshot:
+    return _umm_snapshot
+
+
+def publish_umm_snapshot(snapshot: UmmSnapshot):
+    global _umm_snapshot
+    # Replacing the reference is atomic, readers always see either the old or the new snapshot
+    _umm_snapshot = snapshot
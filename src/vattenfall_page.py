@@ -0,0 +1,46 @@
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library decoder gives the same result
+    orjson = None
+
+from models.reactor_operating_data import PowerPlantData
+
+# The production data is embedded in the page as <script type="application/json"> blobs. Script
+# contents are raw text in HTML (no nested tags or entities), so the blob ends at the first </script>.
+# The type attribute may be unquoted, and must not be the tail of another attribute like data-type.
+_JSON_SCRIPT_RE = re.compile(
+    rb"<script\b[^>]*\stype\s*=\s*[\"']?application/json(?=[\"'\s/>])[^>]*>(.*?)</script\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _loads(content: bytes):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def iter_json_scripts(page: bytes):
+    """Yield the raw contents of every non-empty JSON script tag in the page, in page order."""
+
+    for match in _JSON_SCRIPT_RE.finditer(page):
+        content = match.group(1).strip()
+        if content:
+            yield content
+
+
+def extract_power_plant_data(page: bytes) -> list[PowerPlantData]:
+    """Extract the production data from the raw bytes of the Vattenfall page, without building a DOM."""
+
+    power_plant_data_list: list[PowerPlantData] = []
+    for content in iter_json_scripts(page):
+        parsed_json = _loads(content)
+        if isinstance(parsed_json, list):
+            power_plant_data_list.extend(PowerPlantData.from_dict(item) for item in parsed_json)
+        else:
+            power_plant_data_list.append(PowerPlantData.from_dict(parsed_json))
+
+    return power_plant_data_list
@@ -0,0 +1,100 @@
+import csv
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import influxdb
+from timestamps import datetime_to_ns
+
+BUCKET = "reactor_operating_data"
+HEADER = ["", "result", "table", "_start", "_stop", "_time", "_value", "_field", "_measurement", "block"]
+
+
+class _InfluxDB:
+    """Answers the export query with the stored points in its range, as InfluxDB's CSV rows."""
+
+    def __init__(self):
+        self.points: list[tuple[int, float, str]] = []  # (time ns, MW, block)
+
+    def query_api(self):
+        return self
+
+    def query_csv(self, flux: str, dialect=None):
+        start_ns, stop_ns = map(int, re.search(r"start: time\(v: (\d+)\), stop: time\(v: (\d+)\)", flux).groups())
+        yield HEADER
+        for time_ns, mw, block in sorted(self.points):
+            if start_ns <= time_ns < stop_ns:
+                time = datetime.fromtimestamp(time_ns / 1e9, tz=timezone.utc).isoformat()
+                yield ["", "_result", "0", "", "", time, repr(mw), "MW", "reactor_power", block]
+
+
+@pytest.fixture
+def influx(monkeypatch, tmp_path) -> _InfluxDB:
+    influx = _InfluxDB()
+    monkeypatch.setattr(influxdb, "get_influx_client", lambda: influx)
+    monkeypatch.setattr(influxdb, "ensure_bucket_exists", lambda client, bucket: None)
+    monkeypatch.setattr(influxdb, "influx_writer", influxdb.BatchingWriter(tmp_path / "queue", 500, 3600, 3600))
+    return influx
+
+
+def hours_ago(hours: float) -> int:
+    return datetime_to_ns(datetime.now(timezone.utc) - timedelta(hours=hours))
+
+
+def export(filename, settle_hours: float = 1) -> int:
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(influxdb, "CSV_EXPORT_SETTLE", timedelta(hours=settle_hours))
+        return influxdb.export_influx_data_to_csv(BUCKET, "reactor_power", "MW", filename)
+
+
+def read_rows(filename) -> list[list[str]]:
+    with open(filename, newline="") as f:
+        return list(csv.reader(f))
+
+
+def test_appends_new_points(influx, tmp_path):
+    filename = tmp_path / "export.csv"
+    influx.points = [(hours_ago(5), 1000.0, "F1"), (hours_ago(4), 1001.0, "F1"), (hours_ago(3), 1002.0, "F2")]
+    assert export(filename, settle_hours=3.5) == 2
+    assert export(filename) == 1
+    assert export(filename) == 0
+
+    rows = read_rows(filename)
+    assert rows[0] == ["_time", "_value", "_field", "_measurement", "block"]
+    assert [row[1] for row in rows[1:]] == ["1000.0", "1001.0", "1002.0"]
+    state = json.loads((tmp_path / "export.csv.state.json").read_text())
+    assert state["rows"] == 3
+    assert state["size"] == filename.stat().st_size
+
+
+def test_rows_of_an_export_that_did_not_save_its_state_are_cut_off(influx, tmp_path):
+    filename = tmp_path / "export.csv"
+    influx.points = [(hours_ago(5), 1000.0, "F1"), (hours_ago(3), 1002.0, "F1")]
+    export(filename, settle_hours=3.5)
+
+    # Appended by an export that crashed before saving its state
+    with open(filename, "a") as f:
+        f.write("2025-05-01T12:00:00+00:00,999.0,MW,reactor_power,F1\n")
+    export(filename)
+
+    assert [row[1] for row in read_rows(filename)[1:]] == ["1000.0", "1002.0"]
+
+
+def test_points_still_queued_are_exported_later(influx, tmp_path):
+    filename = tmp_path / "export.csv"
+    late_ns = hours_ago(4)
+    # Queued in the writer while InfluxDB was down
+    queue_path = influxdb.influx_writer.spill_dir / f"{BUCKET}.lp"
+    queue_path.parent.mkdir(parents=True)
+    queue_path.write_text(f"reactor_power,block=F2 MW=1100.0 {late_ns}\n")
+    influx.points = [(hours_ago(5), 1000.0, "F1"), (hours_ago(3), 1002.0, "F1")]
+    assert export(filename) == 1
+
+    # Written at last
+    queue_path.unlink()
+    influx.points.append((late_ns, 1100.0, "F2"))
+    assert export(filename) == 2
+
+    assert [row[1] for row in read_rows(filename)[1:]] == ["1000.0", "1100.0", "1002.0"]
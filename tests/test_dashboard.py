@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import dashboard
+from high_water_marks import HighWaterMarks
+
+FIRST = datetime(2024, 5, 1, tzinfo=timezone.utc)
+LAST = datetime(2025, 5, 1, 12, 3, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def extreme_queries(monkeypatch, tmp_path) -> list[str]:
+    queries = []
+
+    def get_datetime_of_extreme(bucket, measurement, extreme):
+        queries.append(extreme)
+        return FIRST
+
+    marks = HighWaterMarks(tmp_path / "high_water_marks.json")
+    marks.load(lambda: {"F1": LAST.replace(hour=11), "R4": LAST})
+    monkeypatch.setattr(dashboard, "ingest_high_water_marks", marks)
+    monkeypatch.setattr(dashboard, "get_datetime_of_extreme", get_datetime_of_extreme)
+    dashboard._data_first.clear()
+    yield queries
+    dashboard._data_first.clear()
+
+
+def test_data_range_queries_the_first_point_once(extreme_queries):
+    assert dashboard.get_data_range() == (FIRST, LAST)
+    assert dashboard.get_data_range() == (FIRST, LAST)
+    assert extreme_queries == ["first"]
+
+
+def test_precomputed_payloads_carry_the_data_range(monkeypatch, extreme_queries):
+    payload = dashboard.DashboardPayload(start=FIRST, stop=LAST, panels=(), umm_rows=(), umm_table_error=None)
+    monkeypatch.setattr(dashboard, "compute_dashboard_payload", lambda tz, start_local, stop_local: payload)
+    monkeypatch.setattr(dashboard, "dashboard_payloads", dashboard.LRUCache("test_dashboard_payloads", 64))
+
+    dashboard.precompute_dashboard_payloads()
+
+    key = dashboard.dashboard_payload_key(dashboard.pytz.timezone("UTC"), FIRST, LAST)
+    assert dashboard.dashboard_payloads.get(key).data_range == (FIRST, LAST)
+    assert extreme_queries == ["first"]
@@ -0,0 +1,103 @@
+import io
+
+import pytest
+
+from http_cache import HttpCache
+
+URL = "https://example.com/feed"
+
+
+class _Response:
+    def __init__(self, status_code: int, body: bytes = b"", headers: dict | None = None):
+        self.status_code = status_code
+        self.raw = io.BytesIO(body)
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        assert self.status_code == 200
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Server:
+    """Serves one body with an ETag, answering 304 to a matching If-None-Match."""
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+
+    def get(self, url, headers, timeout, stream):
+        if headers.get("If-None-Match") == self.etag:
+            return _Response(304)
+        return _Response(200, self.body, {"ETag": self.etag})
+
+    def mount(self, prefix, adapter):
+        pass
+
+
+@pytest.fixture
+def server() -> _Server:
+    return _Server(b"<feed>1</feed>", '"v1"')
+
+
+@pytest.fixture
+def cache(tmp_path, server) -> HttpCache:
+    return HttpCache(tmp_path, session=server)
+
+
+def test_committed_body_is_not_modified(cache):
+    with cache.fetch(URL) as response:
+        assert response.changed
+        assert response.read_bytes() == b"<feed>1</feed>"
+        response.commit()
+
+    with cache.fetch(URL) as response:
+        assert not response.changed
+        assert response.read_bytes() == b"<feed>1</feed>"
+
+
+def test_uncommitted_body_is_fetched_again(cache):
+    with cache.fetch(URL) as response:
+        assert response.changed
+
+    with pytest.raises(RuntimeError):
+        with cache.fetch(URL) as response:
+            assert response.changed
+            raise RuntimeError("store write failed")
+
+    with cache.fetch(URL) as response:
+        assert response.changed
+        assert response.read_bytes() == b"<feed>1</feed>"
+
+
+def test_changed_body_replaces_the_committed_one(cache, server):
+    with cache.fetch(URL) as response:
+        response.commit()
+
+    server.body, server.etag = b"<feed>2</feed>", '"v2"'
+    with cache.fetch(URL) as response:
+        assert response.changed
+        assert response.read_bytes() == b"<feed>2</feed>"
+
+    # Not committed, the cache still holds the first body
+    server.etag = '"v1"'
+    with cache.fetch(URL) as response:
+        assert not response.changed
+        assert response.read_bytes() == b"<feed>1</feed>"
+
+
+def test_identical_body_is_unchanged(cache, server):
+    with cache.fetch(URL) as response:
+        response.commit()
+
+    # New validators, same body
+    server.etag = '"v1-gzip"'
+    with cache.fetch(URL) as response:
+        assert not response.changed
+        response.commit()
+
+    assert list(cache.directory.glob("*.tmp")) == []
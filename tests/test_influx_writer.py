@@ -0,0 +1,143 @@
+from datetime import datetime, timezone
+
+import pytest
+from influxdb_client import Point
+from influxdb_client.rest import ApiException
+
+from influxdb import BatchingWriter
+
+BUCKET = "reactor_operating_data"
+
+
+class _InfluxDB:
+    """Stands in for the write API: stores written lines, is down when asked, rejects lines with "bad"."""
+
+    def __init__(self):
+        self.lines: list[str] = []
+        self.up = True
+
+    def write_lines(self, bucket: str, lines: list[str]):
+        if not self.up:
+            raise ConnectionError("InfluxDB is down")
+        if any("bad" in line for line in lines):
+            raise ApiException(status=400)
+        self.lines.extend(lines)
+
+
+@pytest.fixture
+def influx() -> _InfluxDB:
+    return _InfluxDB()
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch, influx):
+    # Flushed by the tests, the background thread only waits
+    writer = BatchingWriter(tmp_path, batch_size=10**6, flush_interval=3600, max_backoff=3600)
+    monkeypatch.setattr(writer, "_write_lines", influx.write_lines)
+    yield writer
+    influx.up = True
+    writer.close()
+
+
+def point(block: str, minute: int) -> Point:
+    time = datetime(2025, 5, 1, 12, minute, tzinfo=timezone.utc)
+    return Point("reactor_power").tag("block", block).field("MW", 1000.0).time(time)
+
+
+def test_points_are_on_disk_when_write_returns(writer, influx, tmp_path):
+    writer.write([point("F1", 0), point("F2", 0)], BUCKET)
+
+    assert len((tmp_path / f"{BUCKET}.lp").read_text().splitlines()) == 2
+    assert influx.lines == []
+
+
+def test_flush_removes_written_lines(writer, influx, tmp_path):
+    writer.write([point("F1", 0), point("F2", 0)], BUCKET)
+
+    assert writer.flush()
+    assert len(influx.lines) == 2
+    assert not (tmp_path / f"{BUCKET}.lp").exists()
+
+
+def test_lines_stay_queued_while_influx_is_down(writer, influx):
+    influx.up = False
+    writer.write(point("F1", 0), BUCKET)
+    assert not writer.flush()
+    writer.write(point("F1", 3), BUCKET)
+
+    influx.up = True
+    assert writer.flush()
+    assert [line.split()[-1] for line in influx.lines] == [
+        str(int(datetime(2025, 5, 1, 12, minute, tzinfo=timezone.utc).timestamp()) * 10**9) for minute in (0, 3)
+    ]
+
+
+def test_line_cut_short_by_a_crash(writer, influx, tmp_path):
+    (tmp_path / f"{BUCKET}.lp").write_text("reactor_power,block=F1 MW=1000")
+
+    writer.write(point("F2", 0), BUCKET)
+
+    lines = (tmp_path / f"{BUCKET}.lp").read_text().splitlines()
+    assert lines[0] == "reactor_power,block=F1 MW=1000"
+    assert lines[1].startswith("reactor_power,block=F2 ")
+
+
+def test_rejected_lines_are_set_aside_and_the_rest_written(writer, influx, tmp_path):
+    for flush in range(2):
+        writer.write([point("F1", flush), point("bad", flush), point("F2", flush)], BUCKET)
+        assert writer.flush()
+
+    assert [line.split(",")[1].split()[0] for line in influx.lines] == ["block=F1", "block=F2"] * 2
+    rejected = sorted(tmp_path.glob(f"{BUCKET}.*.rejected"))
+    # One file per flush, none overwritten
+    assert len(rejected) == 2
+    assert all(path.read_text().count("block=bad") == 1 for path in rejected)
+    assert not (tmp_path / f"{BUCKET}.lp").exists()
+
+
+def test_oldest_queued_point(writer, influx):
+    assert writer.oldest_queued_ns(BUCKET) is None
+
+    influx.up = False
+    writer.write([point("F1", 5), point("F2", 2)], BUCKET)
+    writer.flush()
+    assert writer.oldest_queued_ns(BUCKET) == int(datetime(2025, 5, 1, 12, 2, tzinfo=timezone.utc).timestamp()) * 10**9
+
+    influx.up = True
+    writer.flush()
+    assert writer.oldest_queued_ns(BUCKET) is None
+
+
+def test_queue_depth_gauge(writer, influx):
+    from metrics import influx_points_queued
+
+    def queued() -> float:
+        return dict((labels, value) for _, labels, value in influx_points_queued._samples())[(("bucket", BUCKET),)]
+
+    influx.up = False
+    writer.write([point("F1", 0), point("F2", 0)], BUCKET)
+    writer.flush()
+    writer.write(point("F1", 3), BUCKET)
+    assert queued() == 3
+
+    influx.up = True
+    writer.flush()
+    assert queued() == 0
+
+
+def test_lines_left_by_a_previous_run_are_written(tmp_path, influx):
+    (tmp_path / f"{BUCKET}.lp").write_text("reactor_power,block=F1 MW=1000 1746100800000000000\n")
+
+    writer = BatchingWriter(tmp_path, batch_size=10**6, flush_interval=3600, max_backoff=3600)
+    writer._write_lines = influx.write_lines
+    # Flushed by the background thread on close, without any new write
+    writer.close()
+
+    assert influx.lines == ["reactor_power,block=F1 MW=1000 1746100800000000000"]
+
+
+def test_write_after_close(writer):
+    writer.close()
+
+    with pytest.raises(RuntimeError):
+        writer.write(point("F1", 0), BUCKET)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import lekstuga_engine
+from lekstuga_engine import BURNUP_STEP_SIZE, NUMBER_OF_STEPS, power_kernel
+
+# Fuel ages of a small core, None where there is no fuel
+FUEL_AGE_MAP = np.array(
+    [
+        [None, 1, 2, 3, None],
+        [4, 0, 1, 2, 3],
+        [0, 1, None, 3, 4],
+        [1, 2, 3, 4, 0],
+        [None, 3, 4, 0, None],
+    ]
+)
+
+
+def convolve_same(values: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    """scipy's convolve2d(values, kernel, mode="same", boundary="fill", fillvalue=0) for a 3x3 kernel."""
+
+    padded = np.pad(values, 1)
+    rows, cols = values.shape
+    result = np.zeros(values.shape)
+    for i in range(3):
+        for j in range(3):
+            result += kernel[i, j] * padded[2 - i : 2 - i + rows, 2 - j : 2 - j + cols]
+    return result
+
+
+def calculate_steps_on_maps(fuel_age_map: np.ndarray) -> list[tuple[np.ndarray, np.ndarray, np.ndarray, float]]:
+    """The burnup steps as the page calculated them before the engine, on whole maps. Returns
+    (burnup, kinf, power, leakage) per step."""
+
+    steps = []
+    burnup_map = np.array(fuel_age_map, dtype=float)
+    for _ in range(NUMBER_OF_STEPS):
+        if steps:
+            burnup_map = steps[-1][0] + BURNUP_STEP_SIZE * steps[-1][2]
+        kinf_map = -0.4 * np.sqrt((np.exp(-burnup_map / 0.4))) + 1.45 - burnup_map * 0.15
+        power_map = convolve_same(np.where(np.isnan(kinf_map), 0, kinf_map), power_kernel)
+        power_map = np.where(np.isnan(burnup_map), np.nan, power_map)
+        power_map = power_map / np.nanmean(power_map)
+
+        total_power = np.nansum(power_map)
+        outer_ring_power = np.nansum(
+            np.concatenate([power_map[0, :], power_map[-1, :], power_map[1:-1, 0], power_map[1:-1, -1]])
+        )
+        steps.append((burnup_map, kinf_map, power_map, (outer_ring_power / total_power) * 100))
+    return steps
+
+
+@pytest.mark.parametrize("backend", ["numpy", "numba"])
+def test_backends_match_the_map_calculation(monkeypatch, backend):
+    if backend not in lekstuga_engine._DEPLETION_BACKENDS:
+        pytest.skip(f"{backend} is not installed")
+    monkeypatch.setattr(lekstuga_engine, "LEKSTUGA_DEPLETION_BACKEND", backend)
+
+    analysis_data = lekstuga_engine.calculate_analysis_data(FUEL_AGE_MAP)
+
+    for step, (burnup_map, kinf_map, power_map, leakage) in zip(
+        analysis_data.burnup_step_data, calculate_steps_on_maps(FUEL_AGE_MAP), strict=True
+    ):
+        np.testing.assert_allclose(step.burnup_map, burnup_map, rtol=1e-12)
+        np.testing.assert_allclose(step.kinf_map, kinf_map, rtol=1e-12)
+        np.testing.assert_allclose(step.power_map, power_map, rtol=1e-12)
+        np.testing.assert_allclose(step.leakage, leakage, rtol=1e-12)
+    assert analysis_data.total_fuel_elements == 20
+
+
+def test_kinf_curve_into_a_buffer():
+    burnup = np.linspace(0, lekstuga_engine.MAX_AGE, 41)
+    out = np.empty_like(burnup)
+
+    assert lekstuga_engine.kinf_curve(burnup, out) is out
+    np.testing.assert_allclose(out, -0.4 * np.sqrt(np.exp(-burnup / 0.4)) + 1.45 - burnup * 0.15, rtol=1e-14)
+    np.testing.assert_array_equal(lekstuga_engine.kinf_curve(burnup), out)
@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from high_water_marks import HighWaterMarks
+from influxdb import BatchingWriter, ColumnarSeries
+from jobs import reactor_operating_data_job
+from parquet_export import ParquetExportState, partition_path
+from timestamps import datetime_to_ns
+
+FIRST = datetime(2025, 1, 10, tzinfo=timezone.utc)
+
+
+class _InfluxDB:
+    """Serves one point per block on the 15th of every month, and counts the months read per block."""
+
+    def __init__(self):
+        self.reads: list[tuple[datetime, tuple[str, ...]]] = []
+        self.first_per_block = {"F1": FIRST, "F4": FIRST}
+
+    def get_datetime_of_extreme_per_tag(self, bucket, measurement, tag_key, extreme):
+        assert extreme == "first"
+        return self.first_per_block
+
+    def read_many_from_influx(self, bucket, measurement, field, tag_key, tag_values, start, stop, columnar):
+        if field == "MW":
+            self.reads.append((start, tuple(tag_values)))
+        time_ns = np.array([datetime_to_ns(start.replace(day=15))], dtype=np.int64)
+        return {block: ColumnarSeries(times=time_ns, values=np.array([1000.0]), tags={}) for block in tag_values}
+
+    def read_months(self) -> dict[str, list[str]]:
+        months: dict[str, list[str]] = {}
+        for start, blocks in self.reads:
+            for block in blocks:
+                months.setdefault(block, []).append(f"{start:%Y-%m}")
+        return months
+
+
+@pytest.fixture
+def influx(monkeypatch, tmp_path) -> _InfluxDB:
+    influx = _InfluxDB()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(reactor_operating_data_job, "read_many_from_influx", influx.read_many_from_influx)
+    monkeypatch.setattr(
+        reactor_operating_data_job, "get_datetime_of_extreme_per_tag", influx.get_datetime_of_extreme_per_tag
+    )
+    monkeypatch.setattr(
+        reactor_operating_data_job, "influx_writer", BatchingWriter(tmp_path / "queue", 500, 3600, 3600)
+    )
+    return influx
+
+
+@pytest.fixture
+def high_water_marks(monkeypatch, tmp_path) -> HighWaterMarks:
+    marks = HighWaterMarks(tmp_path / "high_water_marks.json")
+    marks.load(lambda: {})
+    monkeypatch.setattr(reactor_operating_data_job, "ingest_high_water_marks", marks)
+    return marks
+
+
+def set_now(monkeypatch, now: datetime):
+    class _datetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    monkeypatch.setattr(reactor_operating_data_job, "datetime", _datetime)
+
+
+def test_closed_months_are_written_once(monkeypatch, influx, high_water_marks):
+    high_water_marks.advance([("F1", datetime(2025, 3, 20, tzinfo=timezone.utc))])
+    set_now(monkeypatch, datetime(2025, 3, 20, 12, tzinfo=timezone.utc))
+    reactor_operating_data_job.export_parquet()
+    reactor_operating_data_job.export_parquet()
+
+    # Only the current month is written again
+    assert influx.read_months() == {"F1": ["2025-01", "2025-02", "2025-03", "2025-03"]}
+    root = reactor_operating_data_job.Path("data_export/reactor_operating_data_parquet")
+    assert ParquetExportState.load(root).final_until == {"F1": datetime(2025, 3, 1, tzinfo=timezone.utc)}
+    table = pq.read_table(partition_path(root, "F1", datetime(2025, 2, 1, tzinfo=timezone.utc)))
+    assert table.column("MW").to_pylist() == [1000.0]
+
+
+def test_new_block_does_not_rewrite_closed_months(monkeypatch, influx, high_water_marks):
+    high_water_marks.advance([("F1", datetime(2025, 3, 20, tzinfo=timezone.utc))])
+    set_now(monkeypatch, datetime(2025, 3, 20, 12, tzinfo=timezone.utc))
+    reactor_operating_data_job.export_parquet()
+    influx.reads.clear()
+
+    new_points = datetime(2025, 3, 21, tzinfo=timezone.utc)
+    high_water_marks.advance([("F1", new_points), ("F4", new_points)])
+    reactor_operating_data_job.export_parquet()
+
+    assert influx.read_months() == {"F1": ["2025-03"], "F4": ["2025-01", "2025-02", "2025-03"]}
+
+
+def test_new_block_starts_at_its_first_month(monkeypatch, influx, high_water_marks):
+    influx.first_per_block["F4"] = datetime(2025, 3, 2, tzinfo=timezone.utc)
+    high_water_marks.advance([("F1", datetime(2025, 3, 20, tzinfo=timezone.utc))])
+    set_now(monkeypatch, datetime(2025, 3, 20, 12, tzinfo=timezone.utc))
+    reactor_operating_data_job.export_parquet()
+    influx.reads.clear()
+
+    high_water_marks.advance([("F4", datetime(2025, 3, 21, tzinfo=timezone.utc))])
+    reactor_operating_data_job.export_parquet()
+
+    assert influx.read_months() == {"F1": ["2025-03"], "F4": ["2025-03"]}
+    root = reactor_operating_data_job.Path("data_export/reactor_operating_data_parquet")
+    assert not partition_path(root, "F4", datetime(2025, 2, 1, tzinfo=timezone.utc)).exists()
+
+
+def test_months_with_queued_points_stay_open(monkeypatch, influx, high_water_marks, tmp_path):
+    high_water_marks.advance([("F1", datetime(2025, 3, 20, tzinfo=timezone.utc))])
+    set_now(monkeypatch, datetime(2025, 3, 20, 12, tzinfo=timezone.utc))
+    # A February point still waiting for InfluxDB
+    queue_path = tmp_path / "queue" / "reactor_operating_data.lp"
+    queue_path.parent.mkdir()
+    queued_ns = datetime_to_ns(datetime(2025, 2, 27, tzinfo=timezone.utc))
+    queue_path.write_text(f"reactor_power,block=F1 MW=1000 {queued_ns}\n")
+    reactor_operating_data_job.export_parquet()
+
+    root = reactor_operating_data_job.Path("data_export/reactor_operating_data_parquet")
+    assert ParquetExportState.load(root).final_until == {"F1": datetime(2025, 2, 1, tzinfo=timezone.utc)}
+
+    queue_path.unlink()
+    influx.reads.clear()
+    reactor_operating_data_job.export_parquet()
+    assert influx.read_months() == {"F1": ["2025-02", "2025-03"]}
+
+
+def test_export_state_round_trip(tmp_path):
+    state = ParquetExportState(first=FIRST, final_until={"F1": datetime(2025, 3, 1, tzinfo=timezone.utc)})
+    state.save(tmp_path)
+
+    assert ParquetExportState.load(tmp_path) == state
+    assert ParquetExportState.load(tmp_path / "missing") is None
@@ -0,0 +1,57 @@
+import re
+from datetime import datetime, timezone
+
+import pytest
+from influxdb_client import Point
+
+import influxdb
+
+BUCKET = "reactor_operating_data"
+NOW = datetime(2025, 5, 1, 12, 40, tzinfo=timezone.utc)
+
+
+class _InfluxDB:
+    """Records the range of every rollup query."""
+
+    def __init__(self):
+        self.ranges: list[tuple[str, str]] = []
+
+    def query_api(self):
+        return self
+
+    def query(self, flux: str):
+        self.ranges.append(re.search(r"range\(start: (\S+), stop: (\S+)\)", flux).groups())
+
+
+@pytest.fixture
+def influx(monkeypatch, tmp_path) -> _InfluxDB:
+    class _datetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return NOW
+
+    influx = _InfluxDB()
+    monkeypatch.setattr(influxdb, "datetime", _datetime)
+    monkeypatch.setattr(influxdb, "get_influx_client", lambda: influx)
+    monkeypatch.setattr(influxdb, "ensure_bucket_exists", lambda client, bucket: None)
+    # The rollup bucket has windows up to 12:00
+    last_window = datetime(2025, 5, 1, 12, tzinfo=timezone.utc)
+    monkeypatch.setattr(influxdb, "get_datetime_of_extreme", lambda *args: last_window)
+    monkeypatch.setattr(influxdb, "influx_writer", influxdb.BatchingWriter(tmp_path / "queue", 500, 3600, 3600))
+    monkeypatch.setattr(influxdb, "_rollup_boundaries", {})
+    return influx
+
+
+def test_rollup_stops_at_the_oldest_queued_point(influx, tmp_path):
+    # Written late, after InfluxDB was down
+    queued = Point("reactor_power").tag("block", "F1").field("MW", 1000.0)
+    influxdb.influx_writer.write(queued.time(datetime(2025, 5, 1, 11, 10, tzinfo=timezone.utc)), BUCKET)
+
+    assert influxdb.update_rollup(BUCKET, "reactor_power", "30m") == datetime(2025, 5, 1, 11, tzinfo=timezone.utc)
+    # The window of the queued point is rolled up again, even though the rollup bucket has newer windows
+    assert influx.ranges[-1] == ("2025-05-01T10:30:00+00:00", "2025-05-01T11:00:00+00:00")
+
+    # Written to InfluxDB
+    (tmp_path / "queue" / f"{BUCKET}.lp").unlink()
+    assert influxdb.update_rollup(BUCKET, "reactor_power", "30m") == datetime(2025, 5, 1, 12, 30, tzinfo=timezone.utc)
+    assert influx.ranges[-1] == ("2025-05-01T10:30:00+00:00", "2025-05-01T12:30:00+00:00")
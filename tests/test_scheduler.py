@@ -0,0 +1,39 @@
+import threading
+import time
+
+from jobs.scheduler import Scheduler
+
+
+def test_hung_jobs_do_not_hold_up_the_others():
+    scheduler = Scheduler(spare_workers=0)
+    release = threading.Event()
+    ran = threading.Event()
+    for i in range(6):
+        scheduler.add(f"hung_{i}", release.wait, interval=60, timeout=0.1, jitter=0)
+    scheduler.add("quick", ran.set, interval=60, jitter=0)
+
+    scheduler.start()
+    try:
+        assert ran.wait(timeout=5)
+    finally:
+        release.set()
+        scheduler.stop()
+
+
+def test_timed_out_run_is_counted_once():
+    from metrics import job_runs
+
+    scheduler = Scheduler()
+    # Long enough for the dispatcher, which checks every second, to see the timeout
+    scheduler.add("slow_once", lambda: time.sleep(1.5), interval=60, timeout=0.1, jitter=0)
+    scheduler.start()
+    try:
+        time.sleep(0.1)
+        while scheduler.status()[0].running:
+            time.sleep(0.05)
+    finally:
+        scheduler.stop()
+
+    runs = {dict(labels)["status"]: value for _, labels, value in job_runs._samples() if ("job", "slow_once") in labels}
+    assert runs == {"timeout": 1}
+    assert scheduler.status()[0].state == "timeout"
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from models.reactor import RatedReactorPower, Reactor
+from series_processing import insert_gaps, normalize_to_rated_power
+from timestamps import datetime_to_ns
+
+UPRATE = datetime(2025, 4, 1, tzinfo=timezone.utc)
+SECOND_UPRATE = datetime(2025, 10, 1, tzinfo=timezone.utc)
+
+
+def ns(dt: datetime) -> int:
+    return datetime_to_ns(dt)
+
+
+@pytest.fixture
+def reactor() -> Reactor:
+    # Listed out of order on purpose, the breakpoints are sorted by start
+    return Reactor(
+        reactor_label="F1",
+        reactor_name="Forsmark 1",
+        reactor_type="BWR",
+        rated_reactor_powers=[
+            RatedReactorPower(start=SECOND_UPRATE, power=1200.0),
+            RatedReactorPower(start=UPRATE, power=1000.0),
+        ],
+    )
+
+
+def test_datetime_to_ns():
+    assert datetime_to_ns(datetime(1970, 1, 1, tzinfo=timezone.utc)) == 0
+    assert datetime_to_ns(datetime(1970, 1, 1, 0, 0, 1, 5, tzinfo=timezone.utc)) == 1_000_005_000
+    stockholm = timezone(timedelta(hours=2))
+    assert datetime_to_ns(datetime(2025, 4, 1, 2, tzinfo=stockholm)) == datetime_to_ns(UPRATE)
+
+
+def test_normalize_at_and_between_breakpoints(reactor):
+    times = np.array(
+        [
+            ns(UPRATE),  # At the first breakpoint
+            ns(UPRATE + timedelta(days=30)),  # Between the breakpoints
+            ns(SECOND_UPRATE - timedelta(microseconds=1)),  # Just before the second one
+            ns(SECOND_UPRATE),  # At the second breakpoint
+            ns(SECOND_UPRATE + timedelta(days=365)),  # After the last one
+        ],
+        dtype=np.int64,
+    )
+    values = np.array([500.0, 1000.0, 900.0, 600.0, 1200.0])
+
+    np.testing.assert_allclose(normalize_to_rated_power(reactor, times, values), [50, 100, 90, 50, 100])
+
+
+def test_normalize_keeps_nan(reactor):
+    times = np.array([ns(UPRATE), ns(UPRATE + timedelta(minutes=10))], dtype=np.int64)
+    result = normalize_to_rated_power(reactor, times, np.array([np.nan, 1000.0]))
+    assert np.isnan(result[0]) and result[1] == 100
+
+
+def test_normalize_empty(reactor):
+    result = normalize_to_rated_power(reactor, np.zeros(0, dtype=np.int64), np.zeros(0))
+    assert result.shape == (0,)
+
+
+def test_normalize_before_first_breakpoint(reactor):
+    times = np.array([ns(UPRATE - timedelta(minutes=10)), ns(UPRATE)], dtype=np.int64)
+    with pytest.raises(ValueError, match="no rated reactor power"):
+        normalize_to_rated_power(reactor, times, np.array([1000.0, 1000.0]))
+
+
+def test_normalize_without_breakpoints(reactor):
+    reactor.rated_reactor_powers = []
+    with pytest.raises(AssertionError):
+        normalize_to_rated_power(reactor, np.array([ns(UPRATE)], dtype=np.int64), np.array([1000.0]))
+
+
+def test_insert_gaps_without_gaps():
+    times = np.arange(4, dtype=np.int64) * 10 * 60 * 10**9  # Every 10 minutes
+    values = np.array([1.0, 2.0, 3.0, 4.0])
+
+    gapped_times, gapped_values = insert_gaps(times, values, timedelta(hours=3))
+
+    np.testing.assert_array_equal(gapped_times, times)
+    np.testing.assert_array_equal(gapped_values, values)
+
+
+def test_insert_gaps_at_exactly_max_gap():
+    times = np.array([0, 1000], dtype=np.int64)
+    gapped_times, _ = insert_gaps(times, np.array([1.0, 2.0]), timedelta(microseconds=1))
+    np.testing.assert_array_equal(gapped_times, times)
+
+
+def test_insert_gaps_consecutive():
+    max_gap = timedelta(minutes=10)
+    minute = 60 * 10**9
+    times = np.array([0, 30 * minute, 60 * minute, 65 * minute], dtype=np.int64)
+    values = np.array([1.0, 2.0, 3.0, 4.0])
+
+    gapped_times, gapped_values = insert_gaps(times, values, max_gap)
+
+    np.testing.assert_array_equal(gapped_times, [0, 10 * minute, 30 * minute, 40 * minute, 60 * minute, 65 * minute])
+    np.testing.assert_array_equal(gapped_values, [1.0, np.nan, 2.0, np.nan, 3.0, 4.0])
+
+
+def test_insert_gaps_empty_and_single():
+    for times in ([], [0]):
+        gapped_times, gapped_values = insert_gaps(
+            np.array(times, dtype=np.int64), np.ones(len(times)), timedelta(minutes=10)
+        )
+        assert gapped_times.dtype == np.int64 and gapped_values.dtype == np.float64
+        np.testing.assert_array_equal(gapped_times, times)
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from influxdb_client import Point
+
+from high_water_marks import HighWaterMarks
+from influxdb import BatchingWriter
+from jobs import reactor_operating_data_job
+from models.reactor_operating_data import BlockProductionData, PowerPlantData
+from series_store import SeriesStore
+from timestamps import datetime_to_ns
+
+NOW = datetime(2025, 5, 1, 12, tzinfo=timezone.utc)
+
+
+class _Record:
+    def __init__(self, block: str, time: datetime, value: float):
+        self.values = {"block": block}
+        self._time = time
+        self._value = value
+
+    def get_time(self) -> datetime:
+        return self._time
+
+    def get_value(self) -> float:
+        return self._value
+
+
+class _InfluxDB:
+    """Serves one point per block and hour over the last two weeks, or fails while down."""
+
+    def __init__(self):
+        self.up = True
+
+    def read_from_influx(self, bucket, measurement, field, start):
+        if not self.up:
+            raise ConnectionError("InfluxDB is down")
+        times = [NOW - timedelta(hours=hours) for hours in range(14 * 24, 0, -1)]
+        return [_Record("F1", time, 1000.0 if field == "MW" else 100.0) for time in times]
+
+
+@pytest.fixture
+def influx(monkeypatch, tmp_path) -> _InfluxDB:
+    influx = _InfluxDB()
+
+    class _datetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return NOW
+
+    marks = HighWaterMarks(tmp_path / "high_water_marks.json")
+    marks.load(lambda: {})
+    monkeypatch.setattr(reactor_operating_data_job, "datetime", _datetime)
+    monkeypatch.setattr(reactor_operating_data_job, "read_from_influx", influx.read_from_influx)
+    monkeypatch.setattr(reactor_operating_data_job, "ingest_high_water_marks", marks)
+    monkeypatch.setattr(reactor_operating_data_job, "series_store", SeriesStore())
+    monkeypatch.setattr(
+        reactor_operating_data_job, "influx_writer", BatchingWriter(tmp_path / "queue", 500, 3600, 3600)
+    )
+    return influx
+
+
+def power_plant_data(time: datetime) -> list[PowerPlantData]:
+    block = BlockProductionData(name="F1", production=900.0, unit="MW", percent=90.0)
+    return [PowerPlantData(timestamp=time.isoformat(), powerPlant="Forsmark", blockProductionDataList=[block])]
+
+
+def test_points_appended_before_warming_are_merged(influx):
+    store = reactor_operating_data_job.series_store
+
+    influx.up = False
+    with pytest.raises(ConnectionError):
+        reactor_operating_data_job.warm_series_store()
+    reactor_operating_data_job.store_power_plant_data(power_plant_data(NOW))
+    assert not store.is_warm
+
+    influx.up = True
+    reactor_operating_data_job.warm_series_store()
+
+    start = NOW - timedelta(days=14)
+    assert store.covers(start)
+    times_ns, mw, percent = store.read("F1", start, NOW + timedelta(minutes=1))
+    assert len(times_ns) == 14 * 24 + 1
+    assert list(times_ns) == sorted(times_ns)
+    assert (times_ns[-1], mw[-1], percent[-1]) == (datetime_to_ns(NOW), 900.0, 90.0)
+
+
+def test_queued_points_are_loaded_when_warming(influx):
+    # Queued by the previous run, InfluxDB does not have it yet
+    queued = NOW - timedelta(minutes=30)
+    point = Point("reactor_power").tag("block", "F1").field("MW", 950.0).field("percent", 95.0).time(queued)
+    reactor_operating_data_job.influx_writer.write(point, reactor_operating_data_job.REACTOR_OPERATING_DATA_BUCKET)
+
+    reactor_operating_data_job.warm_series_store()
+
+    times_ns, mw, percent = reactor_operating_data_job.series_store.read("F1", queued, NOW)
+    assert (list(times_ns), list(mw), list(percent)) == ([datetime_to_ns(queued)], [950.0], [95.0])
+
+
+def test_full_buffer_only_covers_what_it_holds():
+    store = SeriesStore(capacity=4)
+    times = [NOW - timedelta(hours=hours) for hours in range(6, 0, -1)]
+    times_ns = [datetime_to_ns(time) for time in times]
+    store.append("F1", NOW, 1000.0, 100.0)
+
+    store.warm({"F1": (np.array(times_ns, dtype=np.int64), np.ones(6), np.ones(6))}, NOW - timedelta(days=31))
+
+    assert not store.covers(times[2])
+    assert store.covers(times[3])
+    assert len(store.read("F1", times[3], NOW + timedelta(minutes=1))[0]) == 4
@@ -0,0 +1,101 @@
+from datetime import datetime
+from html import unescape
+from pathlib import Path
+
+import pytest
+
+import umm
+
+FIXTURES = Path(__file__).parent / "fixtures"
+FEEDS = ["umm_feed.atom.xml", "umm_feed.rss.xml"]
+
+pytest.importorskip("lxml", reason="the lxml backend is compared against bs4")
+
+
+def _descriptions(feed: str) -> list[str]:
+    with open(FIXTURES / feed, "rb") as f:
+        return [
+            unescape(entry.findtext("{*}content") or entry.findtext("{*}description") or "")
+            for entry in umm._iter_feed_entries(f)
+        ]
+
+
+@pytest.fixture(autouse=True)
+def empty_description_cache():
+    umm._description_cache.clear()
+    yield
+    umm._description_cache.clear()
+
+
+@pytest.fixture
+def no_umm_api(monkeypatch):
+    """Entries without events in the description are looked up in the UMM API, keep them empty."""
+
+    monkeypatch.setattr(umm, "_fetch_events_from_message_api", lambda message_id, version: ())
+
+
+@pytest.mark.parametrize("feed", FEEDS)
+def test_backends_parse_the_same_tables(feed):
+    for description in _descriptions(feed):
+        assert umm._parse_description_tables_lxml(description) == umm._parse_description_tables_bs4(description)
+
+
+@pytest.mark.parametrize("feed", FEEDS)
+def test_backends_extract_the_same_events(feed):
+    descriptions = _descriptions(feed)
+
+    bs4_events = [umm._extract_event_from_description_html(d, parser="bs4") for d in descriptions]
+    umm._description_cache.clear()
+    lxml_events = [umm._extract_event_from_description_html(d, parser="lxml") for d in descriptions]
+
+    assert lxml_events == bs4_events
+    assert any(bs4_events)
+
+
+def test_markup_inside_cells_is_left_out():
+    # The Forsmark 3 entry has comments, a <script> and a <style> inside its cells
+    description = _descriptions("umm_feed.atom.xml")[4]
+
+    for parser in ("bs4", "lxml"):
+        status, rows = umm._HTML_PARSER_BACKENDS[parser](description)
+        assert status == "Active"
+        assert rows[1][:5] == ["Forsmark Block\xa03", "SE3", "300 MW", "870 MW", "1170 MW"]
+
+
+def test_cache_is_keyed_by_backend(monkeypatch):
+    description = _descriptions("umm_feed.atom.xml")[0]
+    monkeypatch.setitem(umm._HTML_PARSER_BACKENDS, "empty", lambda description_html: (None, None))
+
+    assert umm._extract_event_from_description_html(description, parser="bs4")
+    assert umm._extract_event_from_description_html(description, parser="empty") == ()
+
+
+@pytest.mark.usefixtures("no_umm_api")
+def test_atom_and_rss_feeds_give_the_same_messages():
+    messages = {}
+    for feed in FEEDS:
+        with open(FIXTURES / feed, "rb") as f:
+            messages[feed] = list(umm._iter_umm_messages_from_source(f))
+
+    assert messages["umm_feed.atom.xml"] == messages["umm_feed.rss.xml"]
+
+
+@pytest.mark.usefixtures("no_umm_api")
+def test_feed_events():
+    with open(FIXTURES / "umm_feed.atom.xml", "rb") as f:
+        messages = list(umm._iter_umm_messages_from_source(f))
+
+    assert [m.version for m in messages] == [1, 3, 2, 1, 4, 1, 1]
+    events = {m.message_id[:8]: [(e.unit_label, e.unit_suffix, e.available_mw) for e in m.events] for m in messages}
+    assert events == {
+        "5b0c9f43": [("F1", None, 0.0)],
+        "6a1d0e54": [("R3", "G31", 0.0), ("R3", "G32", 535.0)],
+        "7b2e1f65": [],  # Dismissed
+        "8c3f2076": [("R4", None, 565.0)],
+        "9d403187": [("F3", None, 300.0)],
+        # Oskarshamn is not followed, Forsmark 1 has no end date
+        "ae514298": [("F2", None, 1000.0)],
+        "bf6253a9": [],
+    }
+    assert messages[1].events[0].start == datetime(2025, 5, 1, 0, 0, tzinfo=messages[1].events[0].start.tzinfo)
+    assert messages[1].events[0].title == "Ringhals 3 generator G31 reduced"
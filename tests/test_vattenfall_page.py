@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from vattenfall_page import extract_power_plant_data
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def test_extract_power_plant_data():
+    power_plant_data_list = extract_power_plant_data((FIXTURES / "vattenfall_page.html").read_bytes())
+
+    # Quoted and unquoted type attributes, but not data-type, ld+json or jsonp
+    assert [plant.powerPlant for plant in power_plant_data_list] == ["Forsmark", "Ringhals"]
+    assert [block.name for block in power_plant_data_list[0].blockProductionDataList] == ["F1", "F2", "F3"]
+    assert power_plant_data_list[1].blockProductionDataList[1].production == 1118.5
+
+
+def test_type_attribute_forms():
+    content = b'{"timestamp": "t", "powerPlant": "Forsmark"}'
+    for tag in (
+        b'<script type="application/json">',
+        b"<script type='application/json'>",
+        b"<script type=application/json>",
+        b'<script id="x" type = "application/json" class="y">',
+        b'<script\ntype="application/json">',
+    ):
+        assert len(extract_power_plant_data(tag + content + b"</script>")) == 1, tag
+
+    for tag in (
+        b'<script data-type="application/json">',
+        b'<script type="application/ld+json">',
+        b"<script type=application/jsonp>",
+        b"<script>",
+    ):
+        assert extract_power_plant_data(tag + content + b"</script>") == [], tag